@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from llm_metrics import TOTAL_FIELDS, collect_totals
+from main3 import DATA_FOLDER, OUTPUT_FOLDER, REPORT_TYPES, content_hash, discover_tickers, run_debate
+from report_normalizer import normalize_cached
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+BATCH_CONCURRENCY = 8
+
+# ----------------------------
+# BATCH EXECUTION
+# ----------------------------
+def load_reports(folder: Path) -> dict:
+    """Read the four reports of one ticker folder, normalized like the pipeline does"""
+    reports = {kind: (folder / f"{kind}_report.md").read_text() for kind in REPORT_TYPES}
+    return {kind: normalize_cached(content_hash(text), text) for kind, text in reports.items()}
+
+
+async def run_batch(tickers: dict, concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Debate every ticker with at most ``concurrency`` debates in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {}
+    started = time.perf_counter()
+
+    async def run_one(ticker, folder):
+        async with semaphore:
+            t0 = time.perf_counter()
+            with collect_totals() as totals:
+                try:
+                    await run_debate(ticker=ticker, echo=False, **load_reports(folder))
+                    outcomes[ticker] = {"status": "ok", "seconds": time.perf_counter() - t0}
+                except Exception as e:
+                    outcomes[ticker] = {"status": "error", "seconds": time.perf_counter() - t0, "error": str(e)}
+            outcomes[ticker]["metrics"] = totals
+
+        elapsed = time.perf_counter() - started
+        rate = len(outcomes) / elapsed * 60
+        status = "✅" if outcomes[ticker]["status"] == "ok" else f"❌ {outcomes[ticker]['error']}"
+        print(f"📈 [{len(outcomes)}/{len(tickers)}] {ticker} {status} "
+              f"({outcomes[ticker]['seconds']:.1f}s) | {rate:.1f} debates/min")
+
+    await asyncio.gather(*(run_one(ticker, folder) for ticker, folder in tickers.items()))
+    return build_batch_report(outcomes, time.perf_counter() - started, concurrency)
+
+
+def build_batch_report(outcomes: dict, wall_seconds: float, concurrency: int) -> dict:
+    """Aggregate per-ticker outcomes into a throughput report"""
+    durations = [o["seconds"] for o in outcomes.values() if o["status"] == "ok"]
+    return {
+        "generated": datetime.now().isoformat(),
+        "concurrency": concurrency,
+        "tickers": len(outcomes),
+        "succeeded": len(durations),
+        "failed": len(outcomes) - len(durations),
+        "wall_seconds": round(wall_seconds, 2),
+        "debates_per_minute": round(len(outcomes) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "median_debate_seconds": round(statistics.median(durations), 2) if durations else None,
+        "max_debate_seconds": round(max(durations), 2) if durations else None,
+        "llm_totals": {
+            field: round(sum(o["metrics"][field] for o in outcomes.values()), 6) for field in TOTAL_FIELDS
+        },
+        "outcomes": outcomes,
+    }
+
+
+# ----------------------------
+# MAIN EXECUTION
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Debate every data-source/<TICKER>/ folder in parallel")
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("tickers", nargs="*", help="Restrict the batch to these tickers")
+    args = parser.parse_args()
+
+    tickers = discover_tickers(args.data_folder)
+    if args.tickers:
+        tickers = {t: f for t, f in tickers.items() if t in args.tickers}
+    if not tickers:
+        raise ValueError(f"No complete report sets found under '{args.data_folder}'")
+
+    print("=" * 80)
+    print(f"🚀 BATCH DEBATE: {len(tickers)} tickers, concurrency {args.concurrency}")
+    print("=" * 80)
+
+    report = asyncio.run(run_batch(tickers, args.concurrency))
+
+    report_path = Path(OUTPUT_FOLDER) / "batch_report.json"
+    report_path.write_text(json.dumps(report, indent=2))
+
+    print("\n" + "=" * 80)
+    print("BATCH SUMMARY")
+    print("=" * 80)
+    print(f"✅ Succeeded: {report['succeeded']}  ❌ Failed: {report['failed']}")
+    print(f"⏱️  Wall time: {report['wall_seconds']}s  |  {report['debates_per_minute']} debates/min")
+    print(f"📊 Median debate: {report['median_debate_seconds']}s  |  Slowest: {report['max_debate_seconds']}s")
+    llm = report["llm_totals"]
+    print(f"💰 LLM usage: {llm['calls']} calls, {llm['prompt_tokens']:,} prompt + "
+          f"{llm['completion_tokens']:,} completion tokens, ${llm['cost_usd']:.4f}")
+    print(f"💾 Report saved: {report_path}")
@@ -0,0 +1,79 @@
+"""Per-round prompt size of each debate history strategy.
+
+Run from the repository root:
+
+    python -m benchmarks.history_tokens --rounds 6
+
+Arguments are stand-ins taken from data-source/bull_report.md and
+bear_report.md so their length matches real debate turns; no LLM is called.
+The last column is the rolling strategy with retrieved report excerpts
+(report_retrieval) instead of the full reports. Full history grows every
+round; the rolling digest is capped (DEBATE_DIGEST_MAX_CHARS), so its
+prompts level off once the cap is reached.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from debate_memory import DIGEST_MAX_CHARS, HISTORY_STRATEGIES, estimate_tokens
+from main3 import DATA_FOLDER, REPORT_TYPES, build_turn_prompt
+from report_normalizer import normalize_report
+from report_retrieval import TOP_K, report_index
+
+
+def prompt_tokens(messages: list) -> int:
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def simulate(strategy: str, reports: dict, bull_text: str, bear_text: str, n_rounds: int, retrieval: bool = False) -> list:
+    """Prompt tokens of the bull and bear turn for every round"""
+    index = report_index(**reports) if retrieval else None
+    history = []
+    bear_message = "Let's begin. I believe there are significant risks investors should be aware of."
+    per_round = []
+    for round_num in range(1, n_rounds + 1):
+        bull_reply = f"[Round {round_num}] {bull_text}"
+        bull_tokens = prompt_tokens(build_turn_prompt(
+            "Bull", history=history, opponent_message=bear_message, round_num=round_num, strategy=strategy,
+            context=index.context(bear_message) if index else None, **reports
+        ))
+        bear_tokens = prompt_tokens(build_turn_prompt(
+            "Bear", history=history, opponent_message=bull_reply, round_num=round_num, strategy=strategy,
+            context=index.context(bull_reply) if index else None, **reports
+        ))
+        bear_message = f"[Round {round_num}] {bear_text}"
+        history.append({"round": round_num, "bull": bull_reply, "bear": bear_message})
+        per_round.append(bull_tokens + bear_tokens)
+    return per_round
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    args = parser.parse_args()
+
+    folder = Path(args.data_folder)
+    reports = {kind: normalize_report((folder / f"{kind}_report.md").read_text()) for kind in REPORT_TYPES}
+    bull_text = (folder / "bull_report.md").read_text()
+    bear_text = (folder / "bear_report.md").read_text()
+
+    results = {s: simulate(s, reports, bull_text, bear_text, args.rounds) for s in HISTORY_STRATEGIES}
+    retrieved = f"rolling+top{TOP_K}"
+    results[retrieved] = simulate("rolling", reports, bull_text, bear_text, args.rounds, retrieval=True)
+    columns = list(results)
+
+    print(f"{'round':>5} " + " ".join(f"{s:>14}" for s in columns))
+    for i in range(args.rounds):
+        print(f"{i + 1:>5} " + " ".join(f"{results[s][i]:>14,}" for s in columns))
+    print(f"{'total':>5} " + " ".join(f"{sum(results[s]):>14,}" for s in columns))
+
+    if args.rounds >= 2:
+        growth = ", ".join(f"{s} {results[s][-1] - results[s][-2]:+,}" for s in columns)
+        print(f"\n📈 Growth in the last round: {growth} (digest capped at {DIGEST_MAX_CHARS:,} chars)")
+    full, rolling, top_k = sum(results["full"]), sum(results["rolling"]), sum(results[retrieved])
+    print(f"📉 rolling saves {full - rolling:,} prompt tokens per debate ({(full - rolling) / full:.0%})")
+    print(f"📉 retrieval ({report_index(**reports).backend}) saves another {rolling - top_k:,} "
+          f"({rolling / top_k:.1f}x fewer than rolling)")
@@ -0,0 +1,82 @@
+"""Per-call overhead of the old Pathway round-trip vs the shared llm_client.
+
+Run from the repository root:
+
+    python -m benchmarks.llm_overhead --calls 16 --latency-ms 50
+
+Both paths hit the same local mock endpoint, so anything above the mock's
+fixed latency is client-side overhead.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_llm_server import base_url, start_mock_server
+
+MESSAGES = [
+    {"role": "system", "content": "You are a Bull Analyst."},
+    {"role": "user", "content": "Market Research Report:\n" + "RSI is rising. " * 400},
+]
+
+
+def bench_pathway_roundtrip(n_calls: int, url: str) -> list:
+    """Old main3.py path: one-row table -> OpenAIChat -> table_to_pandas per call"""
+    import pandas as pd
+    import pathway as pw
+    from pathway.xpacks.llm import llms
+
+    chat_model = llms.OpenAIChat(model="gpt-4o-mini", temperature=0.7, api_key="mock", base_url=url)
+    timings = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        table = pw.debug.table_from_pandas(pd.DataFrame({"messages": [MESSAGES]}))
+        response = table.select(reply=chat_model(pw.this.messages))
+        pw.debug.table_to_pandas(response)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_llm_client(n_calls: int) -> list:
+    """New path: blocking call on the shared pooled AsyncOpenAI client"""
+    import llm_client
+
+    timings = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        llm_client.chat(MESSAGES)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list, latency_s: float):
+    # The first call pays for imports / connection setup; report it separately.
+    first, rest = timings[0], timings[1:] or timings
+    median = statistics.median(rest)
+    print(f"{name:<22} first={first * 1000:8.1f} ms  "
+          f"median={median * 1000:8.1f} ms  "
+          f"overhead={max(median - latency_s, 0) * 1000:8.1f} ms/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--skip-pathway", action="store_true", help="Only measure llm_client")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency_ms=args.latency_ms)
+    url = base_url(server)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    latency_s = args.latency_ms / 1000
+
+    print(f"🧪 Mock endpoint {url} ({args.latency_ms:.0f} ms per completion), {args.calls} calls\n")
+    if not args.skip_pathway:
+        report("pathway round-trip", bench_pathway_roundtrip(args.calls, url), latency_s)
+    report("llm_client.chat", bench_llm_client(args.calls), latency_s)
+    server.shutdown()
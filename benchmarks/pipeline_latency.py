@@ -0,0 +1,152 @@
+"""End-to-end latency of the debate -> summaries -> trader pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_latency --debates 20 --concurrency 4 \\
+        --latency-ms 300 --latency-dist lognormal --jitter-ms 150 --tokens-per-s 80
+
+Every debate goes through main3.run_debate against an in-process mock
+endpoint (see mock_llm_server.py for the latency, token-rate, error and
+rate-limit knobs), with the response cache off and distinct reports per
+debate so nothing is served from cache. Output files, debate state
+(checkpoints, processed hashes) and the per-call metrics log land in a
+temp folder.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_llm_server import add_behaviour_args, base_url, behaviour_from_args, start_mock_server
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def latency_summary(seconds: list) -> dict:
+    return {f"p{p}_ms": round(percentile(seconds, p) * 1000, 1) for p in (50, 95, 99)}
+
+
+async def run_pipeline(main3, reports: dict, n_debates: int, concurrency: int) -> dict:
+    """Run n_debates debates, at most ``concurrency`` at a time, timing debates and LLM calls"""
+    import trader_agent
+
+    call_seconds = []
+    achat = main3.achat
+
+    async def timed_achat(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await achat(*args, **kwargs)
+        finally:
+            call_seconds.append(time.perf_counter() - start)
+
+    # The trader's call goes through trader_agent's own reference
+    main3.achat = trader_agent.achat = timed_achat
+    semaphore = asyncio.Semaphore(concurrency)
+    debate_seconds, failures = [], []
+
+    async def run_one(i):
+        # A per-debate suffix keeps prompts distinct, like different tickers would be
+        varied = {kind: f"{text}\n\n(Benchmark debate {i})" for kind, text in reports.items()}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await main3.run_debate(ticker=f"BENCH{i:03d}", echo=False, **varied)
+                debate_seconds.append(time.perf_counter() - start)
+            except Exception as e:
+                failures.append(f"BENCH{i:03d}: {e}")
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_one(i) for i in range(n_debates)))
+    finally:
+        main3.achat = trader_agent.achat = achat
+    return {
+        "wall_seconds": time.perf_counter() - started,
+        "debate_seconds": debate_seconds,
+        "call_seconds": call_seconds,
+        "failures": failures,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--debates", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--data-folder", default="./data-source")
+    parser.add_argument("--json", help="Also write the results to this file")
+    add_behaviour_args(parser)
+    args = parser.parse_args()
+
+    server = start_mock_server(behaviour=behaviour_from_args(args))
+    os.environ["OPENAI_BASE_URL"] = base_url(server)
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["LLM_CACHE"] = "0"
+    bench_folder = tempfile.mkdtemp(prefix="pipeline-bench-")
+    os.environ["LLM_METRICS_PATH"] = f"{bench_folder}/llm_calls.jsonl"
+    # Checkpoints and processed hashes too, so the real ./pathway-state is never touched
+    os.environ["DEBATE_STATE_FOLDER"] = f"{bench_folder}/state"
+
+    import main3
+    from report_normalizer import normalize_cached
+
+    folder = Path(args.data_folder)
+    raw = {kind: (folder / f"{kind}_report.md").read_text() for kind in main3.REPORT_TYPES}
+    # Same cleaning as the pipeline; REPORT_NORMALIZE=0 benchmarks the raw reports
+    reports = {kind: normalize_cached(main3.content_hash(text), text) for kind, text in raw.items()}
+    main3.OUTPUT_FOLDER = bench_folder
+
+    print(f"🧪 Mock endpoint {base_url(server)}: {args.latency_dist} {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"{args.tokens_per_s or '∞'} tok/s, error rate {args.error_rate:.0%}, rpm limit {args.rpm_limit or '∞'}")
+    print(f"🚀 {args.debates} debates, concurrency {args.concurrency}, {main3.N_ROUNDS} rounds each\n")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = asyncio.run(run_pipeline(main3, reports, args.debates, args.concurrency))
+    stats = server.stats.snapshot()
+    server.shutdown()
+
+    completed = len(run["debate_seconds"]) or 1
+    results = {
+        "debates": args.debates,
+        "succeeded": len(run["debate_seconds"]),
+        "failed": len(run["failures"]),
+        "debate_latency": latency_summary(run["debate_seconds"]),
+        "call_latency": latency_summary(run["call_seconds"]),
+        "calls_per_debate": round(len(run["call_seconds"]) / args.debates, 2),
+        "http_requests_per_debate": round(stats["requests"] / args.debates, 2),
+        "prompt_tokens_per_debate": round(stats["prompt_tokens"] / completed),
+        "completion_tokens_per_debate": round(stats["completion_tokens"] / completed),
+        "debates_per_minute": round(len(run["debate_seconds"]) / run["wall_seconds"] * 60, 2),
+        "wall_seconds": round(run["wall_seconds"], 2),
+        "server": stats,
+    }
+
+    debate, call = results["debate_latency"], results["call_latency"]
+    print(f"⏱️  Debate latency  p50={debate['p50_ms']:>9} ms  p95={debate['p95_ms']:>9} ms  p99={debate['p99_ms']:>9} ms")
+    print(f"⏱️  LLM call latency p50={call['p50_ms']:>9} ms  p95={call['p95_ms']:>9} ms  p99={call['p99_ms']:>9} ms")
+    print(f"📞 Calls per debate: {results['calls_per_debate']} "
+          f"({results['http_requests_per_debate']} HTTP requests incl. retries)")
+    print(f"🔤 Tokens per debate: {results['prompt_tokens_per_debate']:,} prompt + "
+          f"{results['completion_tokens_per_debate']:,} completion")
+    print(f"📈 Throughput: {results['debates_per_minute']} debates/min over {results['wall_seconds']}s")
+    print(f"{'✅' if not run['failures'] else '❌'} {results['succeeded']} succeeded, {results['failed']} failed "
+          f"(server: {stats['injected_errors']} injected 500s, {stats['rate_limited']} 429s)")
+    for failure in run["failures"][:5]:
+        print(f"   ❌ {failure}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"💾 Results saved: {args.json}")
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+import time
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# Seconds a ticker's reports must stay unchanged before its debate starts
+QUIET_WINDOW_S = float(os.getenv("DEBATE_QUIET_WINDOW_S", "10"))
+
+
+class Superseded(Exception):
+    """Newer inputs for the same key arrived before or during the run"""
+
+
+class ChangeCoalescer:
+    """Debounces runs per key and cancels runs whose inputs went stale.
+
+    Each change to a key's inputs is submitted with a new version (e.g. the
+    combined report hash). A run for a version starts only once the key has
+    been quiet for ``quiet_window_s``; a newer version cancels the in-flight
+    run, which then raises Superseded. Runs may live on different event
+    loops, so cancellation goes through the run's own loop.
+    """
+
+    def __init__(self, quiet_window_s: float = QUIET_WINDOW_S):
+        self.quiet_window_s = quiet_window_s
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._changed_at = {}
+        self._running = {}
+
+    def submit(self, key, version):
+        """Record ``version`` as the newest input for ``key``, cancelling an older in-flight run"""
+        with self._lock:
+            if self._latest.get(key) == version:
+                return
+            self._latest[key] = version
+            self._changed_at[key] = time.monotonic()
+            running = self._running.get(key)
+        if running is not None and running[0] != version:
+            _, loop, task = running
+            loop.call_soon_threadsafe(task.cancel)
+
+    def is_stale(self, key, version) -> bool:
+        with self._lock:
+            return self._latest.get(key) != version
+
+    async def run(self, key, version, factory):
+        """Await ``factory()`` for this version once the key is quiet; raises Superseded if overtaken"""
+        self.submit(key, version)
+        while True:
+            with self._lock:
+                quiet_for = time.monotonic() - self._changed_at[key]
+            if self.is_stale(key, version):
+                raise Superseded(f"{key}: newer inputs arrived while waiting")
+            if quiet_for >= self.quiet_window_s:
+                break
+            await asyncio.sleep(self.quiet_window_s - quiet_for)
+
+        # The task only starts at the next await, so a stale one never runs
+        task = asyncio.ensure_future(factory())
+        with self._lock:
+            stale = self._latest.get(key) != version
+            if not stale:
+                self._running[key] = (version, asyncio.get_running_loop(), task)
+        if stale:
+            task.cancel()
+            raise Superseded(f"{key}: newer inputs arrived while waiting")
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task.cancelled() and self.is_stale(key, version):
+                raise Superseded(f"{key}: newer inputs arrived mid-run") from None
+            raise
+        finally:
+            with self._lock:
+                if self._running.get(key, (None, None, None))[2] is task:
+                    del self._running[key]
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+CHECKPOINT_TTL_S = int(os.getenv("DEBATE_CHECKPOINT_TTL_S", str(7 * 24 * 3600)))
+
+
+class DebateCheckpoint:
+    """Completed steps of one debate, appended to a JSONL file as they finish.
+
+    Steps are named "round_<n>.bull", "round_<n>.bear", "bear_summary",
+    "bull_summary" and "trader". Each line is fsynced, so a crash loses at
+    most the turn that was in flight; a torn last line is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._steps = {}
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._steps[entry["step"]] = entry["value"]
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def get(self, step: str):
+        with self._lock:
+            return self._steps.get(step)
+
+    def put(self, step: str, value):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"step": step, "value": value, "ts": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._steps[step] = value
+
+    def discard(self):
+        """Drop the checkpoint once the debate's outputs are written"""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self._steps.clear()
+
+
+class CheckpointStore:
+    """One DebateCheckpoint per debate; stale files are pruned on start.
+
+    A debate is a ticker's combined report hash under one debate
+    configuration (rounds, round mode, routing), so changing either starts
+    afresh instead of replaying turns produced under the old one.
+    """
+
+    def __init__(self, folder, ttl_s: int = CHECKPOINT_TTL_S):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - ttl_s
+        for path in self.folder.glob("*.jsonl"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+
+    def open(self, combined_hash: str, ticker: str = "", config: dict = None) -> DebateCheckpoint:
+        key = json.dumps([ticker, combined_hash, config or {}], sort_keys=True)
+        return DebateCheckpoint(self.folder / f"{hashlib.sha256(key.encode()).hexdigest()}.jsonl")
+
+
+async def resume_or_run(checkpoint, step: str, on_token, call):
+    """Return the checkpointed result of ``step``, or await ``call()`` and checkpoint it.
+
+    A resumed step is replayed to ``on_token`` as a single chunk, like a
+    response-cache hit, so streamed transcripts stay complete.
+    """
+    if checkpoint is not None:
+        saved = checkpoint.get(step)
+        if saved is not None:
+            if on_token is not None:
+                on_token(saved)
+            return saved
+    result = await call()
+    if checkpoint is not None:
+        checkpoint.put(step, result)
+    return result
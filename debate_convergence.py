@@ -0,0 +1,107 @@
+import os
+import re
+
+import numpy as np
+
+from report_retrieval import embed_texts
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# "fixed" (default): always run the script's N_ROUNDS
+# "adaptive" (opt-in): stop once both sides stop bringing new claims (between MIN and MAX rounds)
+ROUND_MODE = os.getenv("DEBATE_ROUND_MODE", "fixed")
+ROUND_MODES = ("adaptive", "fixed")
+MIN_ROUNDS = int(os.getenv("DEBATE_MIN_ROUNDS", "2"))
+MAX_ROUNDS = int(os.getenv("DEBATE_MAX_ROUNDS", "0"))  # 0: the script's N_ROUNDS
+# A side has converged when fewer than this share of its claims are new
+NOVELTY_THRESHOLD = float(os.getenv("DEBATE_NOVELTY_THRESHOLD", "0.3"))
+# A claim repeats an earlier one at or above this similarity
+# (cosine with embeddings, share of its content words without)
+REPEAT_SIMILARITY_EMBEDDING = 0.8
+REPEAT_SIMILARITY_LEXICAL = 0.6
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z]{4,}|\d+(?:\.\d+)?")
+
+# ----------------------------
+# NOVELTY
+# ----------------------------
+def split_claims(text: str) -> list:
+    """Sentences of an argument long enough to carry a claim"""
+    return [s.strip() for s in _SENTENCE_END.split(text) if len(_WORD.findall(s.lower())) >= 3]
+
+
+def _lexical_similarity(claims: list, earlier: list) -> np.ndarray:
+    """For each claim, the largest share of its content words found in one earlier claim"""
+    earlier_words = [set(_WORD.findall(c.lower())) for c in earlier]
+    best = np.zeros(len(claims), dtype=np.float32)
+    for i, claim in enumerate(claims):
+        words = set(_WORD.findall(claim.lower()))
+        best[i] = max(len(words & other) / len(words) for other in earlier_words)
+    return best
+
+
+def novelty(claims: list, earlier: list) -> float:
+    """Share of ``claims`` not already made in ``earlier`` (1.0 when nothing came before)"""
+    if not claims:
+        return 0.0
+    if not earlier:
+        return 1.0
+    vectors = embed_texts(claims + earlier)
+    if vectors is not None:
+        similarity = (vectors[:len(claims)] @ vectors[len(claims):].T).max(axis=1)
+        repeated = similarity >= REPEAT_SIMILARITY_EMBEDDING
+    else:
+        repeated = _lexical_similarity(claims, earlier) >= REPEAT_SIMILARITY_LEXICAL
+    return round(float(1 - repeated.mean()), 3)
+
+# ----------------------------
+# ROUND CONTROL
+# ----------------------------
+class ConvergenceTracker:
+    """Decides after each round whether the debate goes on.
+
+    ``observe`` takes one round's bull and bear arguments and returns the
+    novelty of each side against its own earlier claims plus the stop
+    reason: "converged", "max_rounds", "fixed_rounds", or None to continue.
+    """
+
+    def __init__(self, n_rounds: int, mode: str = ROUND_MODE, min_rounds: int = MIN_ROUNDS,
+                 max_rounds: int = MAX_ROUNDS, threshold: float = NOVELTY_THRESHOLD):
+        if mode not in ROUND_MODES:
+            raise ValueError(f"Unknown round mode '{mode}', expected one of {ROUND_MODES}")
+        self.mode = mode
+        self.max_rounds = (max_rounds or n_rounds) if mode == "adaptive" else n_rounds
+        self.min_rounds = min(min_rounds, self.max_rounds)
+        self.threshold = threshold
+        self.rounds = 0
+        self.verdict = None
+        self._claims = {"bull": [], "bear": []}
+
+    @property
+    def stopped(self) -> bool:
+        return self.verdict is not None and self.verdict["stop"] is not None
+
+    def observe(self, bull: str, bear: str) -> dict:
+        self.rounds += 1
+        scores = {}
+        for side, text in (("bull", bull), ("bear", bear)):
+            claims = split_claims(text)
+            scores[side] = novelty(claims, self._claims[side])
+            self._claims[side] += claims
+
+        stop = None
+        if self.rounds >= self.max_rounds:
+            stop = "max_rounds" if self.mode == "adaptive" else "fixed_rounds"
+        elif self.mode == "adaptive" and self.rounds >= self.min_rounds and max(scores.values()) < self.threshold:
+            stop = "converged"
+        self.verdict = {"novelty": scores, "stop": stop}
+        return self.verdict
+
+
+def describe_stop(rounds: int, verdict: dict) -> str:
+    """One-line reason for the results row and logs"""
+    scores = verdict["novelty"]
+    return (f"{verdict['stop']} after {rounds} round(s) "
+            f"(novelty bull {scores['bull']:.2f}, bear {scores['bear']:.2f})")
@@ -0,0 +1,61 @@
+import asyncio
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+MAX_CONCURRENCY = 4
+
+# ----------------------------
+# DAG SCHEDULER
+# ----------------------------
+class DebateGraph:
+    """Dependency graph of async LLM steps.
+
+    Each node is an ``async fn(results) -> value`` where ``results`` maps the
+    names of already finished nodes to their values. ``run`` starts every node
+    whose dependencies are done, so independent steps (e.g. the bull and bear
+    summaries) overlap instead of running back to back.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name: str, fn, deps=()):
+        """Register a node; dependencies must already be registered"""
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node '{name}'")
+        missing = [d for d in deps if d not in self.nodes]
+        if missing:
+            raise ValueError(f"Node '{name}' depends on unknown node(s): {', '.join(missing)}")
+        self.nodes[name] = (tuple(deps), fn)
+        return self
+
+    async def run(self, max_concurrency: int = MAX_CONCURRENCY) -> dict:
+        """Run all nodes, at most ``max_concurrency`` at a time, and return their results"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        results = {}
+        pending = dict(self.nodes)
+        running = {}
+
+        async def run_node(name, fn):
+            async with semaphore:
+                return await fn(results)
+
+        try:
+            while pending or running:
+                ready = [name for name, (deps, _) in pending.items() if all(d in results for d in deps)]
+                for name in ready:
+                    _, fn = pending.pop(name)
+                    running[asyncio.create_task(run_node(name, fn), name=name)] = name
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Propagates the first failure; the finally block cancels the rest.
+                    results[running.pop(task)] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return results
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# "full": every previous argument verbatim (prompt grows with each round)
+# "rolling": last exchange verbatim plus a digest of earlier rounds, updated
+# round by round and capped at DIGEST_MAX_CHARS (prompt stops growing)
+HISTORY_STRATEGY = os.getenv("DEBATE_HISTORY", "rolling")
+HISTORY_STRATEGIES = ("full", "rolling")
+DIGEST_CHARS_PER_ARGUMENT = int(os.getenv("DEBATE_DIGEST_CHARS", "300"))
+DIGEST_MAX_CHARS = int(os.getenv("DEBATE_DIGEST_MAX_CHARS", "1500"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# ----------------------------
+# TOKEN ACCOUNTING
+# ----------------------------
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else the ~4 chars/token rule"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4
+
+# ----------------------------
+# HISTORY RENDERING
+# ----------------------------
+@lru_cache(maxsize=4096)
+def digest_argument(text: str, max_chars: int = DIGEST_CHARS_PER_ARGUMENT) -> str:
+    """Leading sentences of an argument, capped at max_chars (compacted once per argument)"""
+    text = " ".join(text.split())
+    digest = ""
+    for sentence in _SENTENCE_END.split(text):
+        if digest and len(digest) + len(sentence) + 1 > max_chars:
+            break
+        digest = f"{digest} {sentence}".strip()
+    return digest[:max_chars]
+
+
+_DIGEST_LINE = re.compile(r"^Round (\d+) - Bull: (.*) \| Bear: (.*)$")
+
+
+def _squeeze(line: str) -> str:
+    """A digest line with both arguments cut to about half"""
+    match = _DIGEST_LINE.match(line)
+    if match is None:
+        return line
+    round_num, bull, bear = match.groups()
+    return f"Round {round_num} - Bull: {digest_argument(bull, len(bull) // 2)} | Bear: {digest_argument(bear, len(bear) // 2)}"
+
+
+@lru_cache(maxsize=4096)
+def update_digest(digest: str, round_num: int, bull: str, bear: str, max_chars: int = DIGEST_MAX_CHARS) -> str:
+    """The rolling digest with one more finished round folded in.
+
+    The new round enters as its arguments' leading sentences. While the
+    digest is over ``max_chars`` the oldest rounds are halved, then dropped,
+    so older rounds fade first and the digest never outgrows the cap.
+    Cached per (digest, round), so each round is folded in once.
+    """
+    lines = digest.splitlines() if digest else []
+    lines.append(f"Round {round_num} - Bull: {digest_argument(bull)} | Bear: {digest_argument(bear)}")
+    for i in range(len(lines) - 1):
+        if len("\n".join(lines)) <= max_chars:
+            break
+        lines[i] = _squeeze(lines[i])
+    while len(lines) > 1 and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def render_history(history: list, strategy: str = HISTORY_STRATEGY) -> str:
+    """Conversation history for the prompt, per the chosen memory strategy"""
+    if strategy not in HISTORY_STRATEGIES:
+        raise ValueError(f"Unknown history strategy '{strategy}', expected one of {HISTORY_STRATEGIES}")
+    if strategy == "full" or len(history) <= 1:
+        return json.dumps(history)
+
+    digest = ""
+    for item in history[:-1]:
+        digest = update_digest(digest, item["round"], item["bull"], item["bear"])
+    return f"""Digest of earlier rounds:
+{digest}
+
+Last exchange (verbatim):
+{json.dumps(history[-1])}"""
@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from batch_runner import load_reports
+from llm_metrics import collect_totals
+from main3 import DATA_FOLDER, REPORT_TYPES, combined_report_hash, content_hash, discover_tickers, get_debate_loop, run_debate
+from report_normalizer import normalize_cached
+from trader_agent import parse_proposal
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+SERVICE_HOST = os.getenv("DEBATE_SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("DEBATE_SERVICE_PORT", "8080"))
+# Debates in flight at once; they share llm_client's rate limiter, so this
+# (not the number of processes) sets throughput
+WORKERS = int(os.getenv("DEBATE_SERVICE_WORKERS", "8"))
+# Jobs waiting for a worker before new submissions get 429
+QUEUE_DEPTH = int(os.getenv("DEBATE_SERVICE_QUEUE", "64"))
+RETRY_AFTER_S = 30
+JOB_TTL_S = float(os.getenv("DEBATE_SERVICE_JOB_TTL_S", "3600"))  # finished jobs kept for polling
+KEEPALIVE_S = 15  # comment line on idle event streams
+MAX_BODY_BYTES = int(os.getenv("DEBATE_SERVICE_MAX_BODY", str(1 << 20)))
+# Tickers name output folders, so nothing that could leave OUTPUT_FOLDER
+TICKER_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9.\-]{0,11}$")
+
+# ----------------------------
+# JOBS
+# ----------------------------
+class Job:
+    """One requested debate: its status, result and the token events streamed so far"""
+
+    def __init__(self, ticker: str, reports: dict, combined_hash: str):
+        self.id = uuid.uuid4().hex
+        self.ticker = ticker
+        self.reports = reports
+        self.combined_hash = combined_hash
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def publish(self, event: dict):
+        """DebateStream subscriber: called with every token of every step"""
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def finish(self, status: str, result: dict = None, error: str = None):
+        with self._changed:
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    def wait_events(self, seen: int, timeout: float) -> list:
+        """Events after the first ``seen``, waiting up to ``timeout`` while there are none and the job runs"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > seen or self.done, timeout)
+            return self.events[seen:]
+
+    def describe(self) -> dict:
+        return {
+            "job_id": self.id,
+            "ticker": self.ticker,
+            "combined_hash": self.combined_hash,
+            "status": self.status,
+            "created": datetime.fromtimestamp(self.created).isoformat(),
+            "queued_s": round((self.started or time.time()) - self.created, 3),
+            "run_s": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            "events": len(self.events),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DebateService:
+    """Bounded pool of debate workers on main3's debate loop.
+
+    ``submit`` admits a job unless QUEUE_DEPTH jobs already wait (QueueFull);
+    a ticker's report set already queued or running returns its existing
+    job. Jobs of one ticker run one at a time, since they share its output
+    folder: workers take tickers, not jobs, from the ready queue, and a
+    ticker is only in it while none of its jobs runs.
+    """
+
+    def __init__(self, workers: int = WORKERS, queue_depth: int = QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.jobs = {}
+        self.completed = 0
+        self.failed = 0
+        self._active = {}  # (ticker, combined_hash) -> queued or running job
+        self._pending = {}  # ticker -> deque of its queued jobs
+        self._scheduled = set()  # tickers in the ready queue or running
+        self._lock = threading.Lock()
+        self._loop = get_debate_loop()
+        self._ready = None
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self):
+        self._ready = asyncio.Queue()
+        for n in range(self.workers):
+            self._loop.create_task(self._worker(n))
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def submit(self, ticker: str, reports: dict) -> tuple:
+        """(job, created) for a report set; raises QueueFull when QUEUE_DEPTH jobs wait"""
+        combined_hash = combined_report_hash(reports["fundamentals"], reports["market"], reports["news"], reports["sentiment"])
+        with self._lock:
+            self._prune()
+            active = self._active.get((ticker, combined_hash))
+            if active is not None:
+                return active, False
+            waiting = sum(job.status == "queued" for job in self.jobs.values())
+            if waiting >= self.queue_depth:
+                raise QueueFull(f"{waiting} debates already waiting")
+            job = Job(ticker, reports, combined_hash)
+            self.jobs[job.id] = job
+            self._active[(ticker, combined_hash)] = job
+            self._pending.setdefault(ticker, deque()).append(job)
+            if ticker in self._scheduled:
+                return job, True
+            self._scheduled.add(ticker)
+        self._loop.call_soon_threadsafe(self._ready.put_nowait, ticker)
+        return job, True
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_S
+        for job_id in [i for i, job in self.jobs.items() if job.done and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self, n: int):
+        while True:
+            ticker = await self._ready.get()
+            with self._lock:
+                job = self._pending[ticker].popleft()
+            await self._run(job)
+            with self._lock:
+                if self._pending[ticker]:
+                    # Back of the line, so a busy ticker doesn't starve the others
+                    self._ready.put_nowait(ticker)
+                else:
+                    del self._pending[ticker]
+                    self._scheduled.discard(ticker)
+
+    async def _run(self, job: Job):
+        job.status, job.started = "running", time.time()
+        print(f"🛎️  Job {job.id[:8]} started: {job.ticker} ({job.combined_hash[:12]}...)")
+        with collect_totals() as totals:
+            try:
+                results = await run_debate(
+                    ticker=job.ticker, subscriber=job.publish, echo=False,
+                    combined_hash=job.combined_hash, **job.reports
+                )
+                result = {
+                    "rounds": results["stop"]["rounds"],
+                    "stop_reason": results["stop"]["detail"],
+                    "bull_summary": results["bull_summary"],
+                    "bear_summary": results["bear_summary"],
+                    "decision": results["trader"],
+                    "proposal": parse_proposal(results["trader"]),
+                }
+                status, error = "done", None
+            except Exception as e:
+                result, status, error = None, "failed", str(e)
+        if result is not None:
+            result["metrics"] = totals
+        with self._lock:
+            self._active.pop((job.ticker, job.combined_hash), None)
+            if status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+        job.reports = None
+        job.finish(status, result, error)
+        print(f"{'✅' if status == 'done' else '❌'} Job {job.id[:8]} {status}: {job.ticker}"
+              f"{f' ({error})' if error else ''}")
+
+# ----------------------------
+# REQUESTS
+# ----------------------------
+def resolve_reports(body: dict) -> tuple:
+    """(ticker, the four normalized reports) for a POST /debates body.
+
+    Each report is text, {"path": "..."} inside DATA_FOLDER, or omitted to
+    use the ticker's own report file.
+    """
+    if not isinstance(body, dict):
+        raise ValueError(f"Body must be a JSON object, got {type(body).__name__}")
+    ticker = str(body.get("ticker", "")).strip().upper()
+    if not ticker:
+        raise ValueError("'ticker' is required")
+    if not TICKER_PATTERN.match(ticker):
+        raise ValueError(f"Invalid ticker {ticker!r}: expected 1-12 letters, digits, '.' or '-', starting with a letter or digit")
+    given = body.get("reports") or {}
+    if not isinstance(given, dict):
+        raise ValueError(f"'reports' must be an object mapping report type to report, got {type(given).__name__}")
+    unknown = set(given) - set(REPORT_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown report type(s): {', '.join(sorted(unknown))}; expected {REPORT_TYPES}")
+    root = Path(DATA_FOLDER).resolve()
+    folder = discover_tickers(DATA_FOLDER).get(ticker)
+    reports = {}
+    for kind in REPORT_TYPES:
+        value = given.get(kind)
+        if isinstance(value, dict):
+            if not isinstance(value.get("path"), str):
+                raise ValueError(f"{kind}: 'path' must be a string")
+            path = (root / value["path"]).resolve()
+            if root not in path.parents or not path.is_file():
+                raise ValueError(f"{kind}: {value.get('path')!r} is not a report file under {DATA_FOLDER}")
+            text = path.read_text()
+        elif isinstance(value, str) and value.strip():
+            text = value
+        elif value is not None and not isinstance(value, str):
+            raise ValueError(f"{kind}: expected report text or {{\"path\": ...}}, got {type(value).__name__}")
+        elif folder is not None:
+            reports[kind] = load_reports(folder)[kind]
+            continue
+        else:
+            raise ValueError(f"{kind}: no report given and no report files for {ticker} under {DATA_FOLDER}")
+        reports[kind] = normalize_cached(content_hash(text), text)
+    return ticker, reports
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/debates":
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            self._json(400, {"error": "invalid Content-Length"})
+            return
+        if not 0 <= length <= MAX_BODY_BYTES:
+            self.close_connection = True
+            self._json(413, {"error": f"body over {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            ticker, reports = resolve_reports(body)
+            job, created = self.service.submit(ticker, reports)
+        except QueueFull as e:
+            self._json(429, {"error": str(e), **self.service.stats()}, {"Retry-After": str(RETRY_AFTER_S)})
+            return
+        except (ValueError, json.JSONDecodeError) as e:
+            self._json(400, {"error": str(e)})
+            return
+        self._json(202 if created else 200, {
+            **job.describe(),
+            "poll": f"/debates/{job.id}",
+            "stream": f"/debates/{job.id}/events",
+        }, {"Location": f"/debates/{job.id}"})
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            self._json(200, self.service.stats())
+            return
+        job = self.service.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "debates" else None
+        if job is None:
+            self._json(404, {"error": "unknown job"})
+        elif len(parts) == 2:
+            self._json(200, job.describe())
+        elif parts[2:] == ["events"]:
+            self._stream(job)
+        else:
+            self._json(404, {"error": "not found"})
+
+    def _stream(self, job: Job):
+        """Server-sent events: one "token" event per streamed delta, then "done" with the job"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        seen = 0
+        try:
+            while True:
+                events = job.wait_events(seen, KEEPALIVE_S)
+                if events:
+                    self.wfile.write("".join(f"event: token\ndata: {json.dumps(e)}\n\n" for e in events).encode())
+                    seen += len(events)
+                elif job.done:
+                    self.wfile.write(f"event: done\ndata: {json.dumps(job.describe())}\n\n".encode())
+                    return
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_service(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = WORKERS,
+                  queue_depth: int = QUEUE_DEPTH) -> ThreadingHTTPServer:
+    """Serve the debate API in a daemon thread"""
+    handler = type("ServiceHandler", (_ServiceHandler,), {"service": DebateService(workers, queue_depth)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="debate-service", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service running debates on demand")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Debates in flight at once")
+    parser.add_argument("--queue", type=int, default=QUEUE_DEPTH, help="Waiting jobs before 429")
+    args = parser.parse_args()
+
+    server = start_service(SERVICE_HOST, args.port, args.workers, args.queue)
+    print("="*80)
+    print(f"🌐 DEBATE SERVICE on http://{SERVICE_HOST}:{args.port}")
+    print("="*80)
+    print(f"  ├─ POST /debates              {{\"ticker\", \"reports\"?}} -> 202 + job id (429 when {args.queue} wait)")
+    print(f"  ├─ GET  /debates/<id>         status and result")
+    print(f"  ├─ GET  /debates/<id>/events  token stream (server-sent events)")
+    print(f"  └─ GET  /health               workers ({args.workers}), queue and counters")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
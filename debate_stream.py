@@ -0,0 +1,91 @@
+import os
+import queue
+import sys
+import threading
+from pathlib import Path
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+STREAM_TO_CONSOLE = os.getenv("DEBATE_STREAM", "1") != "0"
+
+# ----------------------------
+# TOKEN FAN-OUT
+# ----------------------------
+class DebateStream:
+    """Fans streamed tokens out to the console, an append-only debate.md and a subscriber.
+
+    Debate turns are written to the transcript as they arrive, in the same
+    "Round N:\\nBull: ...\\nBear: ..." layout the finished transcript uses.
+    Parallel steps (summaries, trader) only go to the subscriber, so their
+    interleaved tokens never garble the console or the file.
+
+    ``subscriber(event)`` receives dicts with ticker, role, round and delta.
+    on_token callbacks run on llm_client's shared loop, so they only queue
+    the delta; a writer thread per stream does the file, console and
+    subscriber work, and a slow consumer delays this stream alone.
+    """
+
+    def __init__(self, path, ticker: str, header: str = "", echo: bool = STREAM_TO_CONSOLE, subscriber=None):
+        self.path = Path(path)
+        self.ticker = ticker
+        self.echo = echo
+        self.subscriber = subscriber
+        self._pending = queue.SimpleQueue()  # (transcript text, subscriber event), None to stop
+        self._file = open(self.path, "w")
+        self._writer = threading.Thread(target=self._drain, name=f"debate-stream-{ticker}", daemon=True)
+        self._writer.start()
+        self._write(header)
+
+    def _write(self, text: str, transcript: bool = True):
+        if text and transcript:
+            self._pending.put((text, None))
+
+    def _drain(self):
+        """Writer thread: deliver queued items in order, flushing once per burst"""
+        while True:
+            items = [self._pending.get()]
+            while not self._pending.empty():
+                items.append(self._pending.get())
+            for item in items:
+                if item is None:
+                    self._file.close()
+                    return
+                text, event = item
+                if text:
+                    self._file.write(text)
+                    if self.echo:
+                        sys.stdout.write(text)
+                if event is not None:
+                    try:
+                        self.subscriber(event)
+                    except Exception as e:
+                        print(f"⚠️  Stream subscriber failed for {self.ticker}: {e}")
+            self._file.flush()
+            if self.echo:
+                sys.stdout.flush()
+
+    def turn(self, role: str, round_num: int):
+        """Start a Bull/Bear turn in the transcript and return its on_token callback"""
+        if role == "bull":
+            separator = "" if round_num == 1 else "\n\n"
+            self._write(f"{separator}Round {round_num}:\nBull: ")
+        else:
+            self._write("\nBear: ")
+        return self.sink(role, round_num)
+
+    def sink(self, role: str, round_num: int = 0, transcript: bool = True):
+        """on_token callback for a step; transcript=False sends tokens to the subscriber only"""
+        def on_token(delta: str):
+            event = None
+            if self.subscriber is not None:
+                event = {"ticker": self.ticker, "role": role, "round": round_num, "delta": delta}
+            if event is not None or (delta and transcript):
+                self._pending.put((delta if transcript else "", event))
+        return on_token
+
+    def close(self):
+        """Deliver everything queued and close debate.md; blocks until the writer is done"""
+        self._write("\n")
+        self._pending.put(None)
+        self._writer.join()
@@ -0,0 +1,106 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+POLL_INTERVAL_S = 1.0  # fallback when inotify is unavailable
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    _libc.inotify_init1
+except (OSError, AttributeError):
+    _libc = None
+
+
+class FolderWatcher:
+    """Reports created, changed and removed files in one folder.
+
+    Uses inotify on Linux, so a saved file is seen within milliseconds; other
+    platforms fall back to an mtime scan every POLL_INTERVAL_S. ``changes``
+    yields batches of (kind, path) with kind "changed" or "removed".
+    """
+
+    def __init__(self, folder, pattern: str = "*"):
+        self.folder = Path(folder)
+        self.pattern = pattern
+        self._fd = None
+        self._mtimes = {}
+        if _libc is not None:
+            fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and _libc.inotify_add_watch(fd, os.fsencode(self.folder), WATCH_MASK) >= 0:
+                self._fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        if self._fd is None:
+            self._mtimes = self._scan()
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._fd is not None else f"polling every {POLL_INTERVAL_S:g}s"
+
+    def _matches(self, name: str) -> bool:
+        return fnmatch.fnmatch(name, self.pattern)
+
+    def _scan(self) -> dict:
+        return {p: p.stat().st_mtime for p in self.folder.iterdir() if p.is_file() and self._matches(p.name)}
+
+    def _read_inotify(self, timeout: float) -> list:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        changes, offset = {}, 0
+        while offset < len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0").decode()
+            offset += name_len
+            if mask & IN_DELETE_SELF:
+                raise FileNotFoundError(f"Watched folder '{self.folder}' was removed")
+            if not name or not self._matches(name):
+                continue
+            removed = mask & (IN_DELETE | IN_MOVED_FROM)
+            changes[self.folder / name] = "removed" if removed else "changed"
+        return [(kind, path) for path, kind in changes.items()]
+
+    def _read_polling(self, timeout: float) -> list:
+        time.sleep(min(timeout, POLL_INTERVAL_S))
+        current = self._scan()
+        changes = [("changed", p) for p, mtime in current.items() if self._mtimes.get(p) != mtime]
+        changes += [("removed", p) for p in self._mtimes if p not in current]
+        self._mtimes = current
+        return changes
+
+    def changes(self, timeout: float = 1.0):
+        """Yield a list of (kind, path) per batch of events; empty lists on idle timeouts"""
+        while True:
+            if self._fd is not None:
+                yield self._read_inotify(timeout)
+            else:
+                yield self._read_polling(timeout)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from debate_memory import estimate_tokens
+from main3 import DATA_FOLDER, STATE_FOLDER, discover_tickers
+from report_publisher import ReportWriter
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+STORE_PATH = os.getenv("FUNDAMENTALS_STORE", f"{STATE_FOLDER}/fundamentals.npz")
+TREND_PERIODS = 4  # periods shown in the rendered trend line
+
+# One row per filing: ticker, period_end (YYYY-MM-DD), period ("Q" or "FY"),
+# currency, then statement figures (any may be missing) and the share price
+KEYS = ["ticker", "period_end", "period", "currency"]
+KEY_WIDTHS = {"ticker": 12, "period_end": 10, "period": 2, "currency": 3}
+FIELDS = [
+    "revenue", "cost_of_revenue", "operating_income", "net_income", "ebitda", "interest_expense",
+    "eps", "shares_outstanding", "price",
+    "total_assets", "total_liabilities", "current_assets", "current_liabilities", "inventory", "cash",
+    "total_debt", "long_term_debt", "shareholders_equity",
+    "operating_cash_flow", "capex", "dividends_paid",
+]
+# Figures summed over the trailing four quarters for valuation ratios
+TTM_FIELDS = ["revenue", "net_income", "eps", "ebitda", "operating_cash_flow", "capex", "dividends_paid"]
+RATIOS = [
+    "gross_margin", "operating_margin", "net_margin", "roe", "roa",
+    "revenue_growth_yoy", "eps_growth_yoy",
+    "current_ratio", "quick_ratio", "debt_to_equity", "lt_debt_to_equity", "interest_coverage",
+    "market_cap", "pe", "ps", "pb", "ev_ebitda", "p_fcf",
+    "fcf_ttm", "fcf_margin", "dividend_yield", "payout_ratio",
+]
+
+# ----------------------------
+# RATIOS
+# ----------------------------
+def _div(a, b) -> np.ndarray:
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a / b
+    return np.where(np.isfinite(out) & (b != 0), out, np.nan)
+
+
+def compute_ratios(frame: pd.DataFrame) -> pd.DataFrame:
+    """The RATIOS columns for ``frame``'s filings, sorted by ticker, period and period_end.
+
+    Quarterly valuation ratios use trailing-four-quarter sums (TTM); an FY
+    filing is its own TTM. YoY growth compares with the filing four
+    quarters (or one year) earlier.
+    """
+    f = frame.sort_values(["ticker", "period", "period_end"]).reset_index(drop=True)
+    groups = f.groupby(["ticker", "period"], sort=False)
+    quarterly = (f["period"] == "Q").to_numpy()
+    ttm = {}
+    for field in TTM_FIELDS:
+        rolled = groups[field].rolling(4, min_periods=4).sum().reset_index(level=[0, 1], drop=True).sort_index()
+        ttm[field] = np.where(quarterly, rolled.to_numpy(), f[field].to_numpy())
+    year_ago = {
+        field: np.where(quarterly, groups[field].shift(4).to_numpy(), groups[field].shift(1).to_numpy())
+        for field in ("revenue", "eps")
+    }
+
+    market_cap = f["price"].to_numpy() * f["shares_outstanding"].to_numpy()
+    fcf_ttm = ttm["operating_cash_flow"] - np.abs(ttm["capex"])
+    ev = market_cap + np.nan_to_num(f["total_debt"].to_numpy()) - np.nan_to_num(f["cash"].to_numpy())
+    out = pd.DataFrame({
+        "gross_margin": _div(f["revenue"] - f["cost_of_revenue"], f["revenue"]),
+        "operating_margin": _div(f["operating_income"], f["revenue"]),
+        "net_margin": _div(f["net_income"], f["revenue"]),
+        "roe": _div(ttm["net_income"], f["shareholders_equity"]),
+        "roa": _div(ttm["net_income"], f["total_assets"]),
+        "revenue_growth_yoy": _div(f["revenue"], year_ago["revenue"]) - 1,
+        "eps_growth_yoy": _div(f["eps"] - year_ago["eps"], np.abs(year_ago["eps"])),
+        "current_ratio": _div(f["current_assets"], f["current_liabilities"]),
+        "quick_ratio": _div(f["current_assets"] - np.nan_to_num(f["inventory"].to_numpy()), f["current_liabilities"]),
+        "debt_to_equity": _div(f["total_debt"], f["shareholders_equity"]),
+        "lt_debt_to_equity": _div(f["long_term_debt"], f["shareholders_equity"]),
+        "interest_coverage": _div(f["operating_income"], np.abs(f["interest_expense"])),
+        "market_cap": market_cap,
+        "pe": _div(f["price"], ttm["eps"]),
+        "ps": _div(market_cap, ttm["revenue"]),
+        "pb": _div(market_cap, f["shareholders_equity"]),
+        "ev_ebitda": _div(ev, ttm["ebitda"]),
+        "p_fcf": _div(market_cap, fcf_ttm),
+        "fcf_ttm": fcf_ttm,
+        "fcf_margin": _div(fcf_ttm, ttm["revenue"]),
+        "dividend_yield": _div(np.abs(ttm["dividends_paid"]), market_cap),
+        "payout_ratio": _div(np.abs(ttm["dividends_paid"]), ttm["net_income"]),
+    })
+    return pd.concat([f, out], axis=1)
+
+# ----------------------------
+# LOADING
+# ----------------------------
+def read_filings(path: str) -> pd.DataFrame:
+    """Filings from a CSV, a JSON array / {"filings": [...]} or JSON lines, with KEYS + FIELDS columns"""
+    path = Path(path)
+    if path.suffix == ".csv":
+        frame = pd.read_csv(path, dtype={key: str for key in KEYS})
+    elif path.suffix in (".jsonl", ".jsonlines"):
+        frame = pd.read_json(path, lines=True, dtype={key: str for key in KEYS})
+    else:
+        data = json.loads(path.read_text())
+        frame = pd.DataFrame(data["filings"] if isinstance(data, dict) else data)
+    missing = [key for key in ("ticker", "period_end") if key not in frame]
+    if missing:
+        raise ValueError(f"{path}: filings need {', '.join(missing)} column(s)")
+    frame = frame.reindex(columns=KEYS + FIELDS)
+    frame["ticker"] = frame["ticker"].str.upper().str.strip()
+    frame["period_end"] = pd.to_datetime(frame["period_end"]).dt.strftime("%Y-%m-%d")
+    frame["period"] = frame["period"].fillna("FY").str.upper().replace({"ANNUAL": "FY", "QUARTER": "Q"})
+    frame["currency"] = frame["currency"].fillna("USD")
+    frame[FIELDS] = frame[FIELDS].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+    return frame
+
+
+def filing_hashes(frame: pd.DataFrame) -> np.ndarray:
+    """Content hash per filing row, so a re-delivered filing is recognised as unchanged"""
+    return pd.util.hash_pandas_object(frame[KEYS + FIELDS], index=False).to_numpy()
+
+
+class FundamentalsStore:
+    """Columnar store of filings and their precomputed ratios.
+
+    Every column (keys, statement figures, ratios, filing hash) is one NumPy
+    array over all filings, sorted by ticker, period and period_end, with a
+    ticker -> row-range index. Ratios are computed when filings are loaded,
+    only for the tickers the load touched, and saved with the store;
+    rendering reads them and never recomputes.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = Path(path)
+        self.columns = {}
+        self._index = {}
+        if self.path.exists():
+            with np.load(self.path) as data:
+                self.columns = {name: data[name] for name in data.files}
+            self._reindex()
+
+    def __len__(self) -> int:
+        return len(self.columns.get("ticker", ()))
+
+    @property
+    def tickers(self) -> list:
+        return list(self._index)
+
+    def _reindex(self):
+        tickers = self.columns["ticker"]
+        starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+        stops = np.r_[starts[1:], len(tickers)]
+        self._index = {str(tickers[start]): (start, stop) for start, stop in zip(starts, stops)}
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns)
+
+    def load(self, frame: pd.DataFrame) -> dict:
+        """Merge filings into the store; a filing for the same (ticker, period, period_end) replaces the old one.
+
+        Returns {"filings", "new", "changed", "tickers_recomputed"}.
+        """
+        frame = frame.drop_duplicates(["ticker", "period", "period_end"], keep="last")
+        incoming_hashes = filing_hashes(frame)
+        if len(self):
+            existing = self.frame()
+            known = dict(zip(zip(existing["ticker"], existing["period"], existing["period_end"]), existing["filing_hash"]))
+            keys = list(zip(frame["ticker"], frame["period"], frame["period_end"]))
+            previous = np.array([known.get(key, 0) for key in keys], dtype=np.uint64)
+            is_new = np.array([key not in known for key in keys], dtype=bool)
+            changed = ~is_new & (previous != incoming_hashes)
+            frame = frame[is_new | changed]
+            incoming_hashes = incoming_hashes[is_new | changed]
+        else:
+            existing = None
+            is_new = np.ones(len(frame), dtype=bool)
+            changed = np.zeros(len(frame), dtype=bool)
+        stats = {"filings": len(is_new), "new": int(is_new.sum()), "changed": int(changed.sum()), "tickers_recomputed": 0}
+        if frame.empty:
+            return stats
+
+        frame = frame.assign(filing_hash=incoming_hashes)
+        touched = set(frame["ticker"])
+        if existing is not None:
+            keep = existing[~existing["ticker"].isin(touched)]
+            history = existing[existing["ticker"].isin(touched)][KEYS + FIELDS + ["filing_hash"]]
+            frame = pd.concat([history, frame]).drop_duplicates(["ticker", "period", "period_end"], keep="last")
+        recomputed = compute_ratios(frame)
+        merged = recomputed if existing is None else pd.concat([keep, recomputed])
+        merged = merged.sort_values(["ticker", "period", "period_end"], kind="stable").reset_index(drop=True)
+        self.columns = {
+            name: merged[name].to_numpy().astype(f"<U{KEY_WIDTHS[name]}") if name in KEY_WIDTHS
+            else merged[name].to_numpy().astype(np.uint64 if name == "filing_hash" else np.float64)
+            for name in KEYS + FIELDS + RATIOS + ["filing_hash"]
+        }
+        self._reindex()
+        stats["tickers_recomputed"] = len(touched)
+        return stats
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.stem}.tmp.npz")
+        np.savez(tmp, **self.columns)
+        os.replace(tmp, self.path)
+
+    def rows(self, ticker: str) -> dict:
+        """The ticker's filings as {column: array}, or {} when it is not stored"""
+        if ticker not in self._index:
+            return {}
+        start, stop = self._index[ticker]
+        return {name: column[start:stop] for name, column in self.columns.items()}
+
+    def latest(self, ticker: str) -> dict:
+        """The ticker's most recent filing (quarterly preferred on the same date) with its ratios"""
+        rows = self.rows(ticker)
+        if not rows:
+            return {}
+        order = np.lexsort((rows["period"] == "Q", rows["period_end"]))
+        i = order[-1]
+        return {name: (str(column[i]) if name in KEY_WIDTHS else column[i].item()) for name, column in rows.items()}
+
+# ----------------------------
+# RENDERING
+# ----------------------------
+def _money(value: float) -> str:
+    if not np.isfinite(value):
+        return "n/a"
+    for unit, scale in (("T", 1e12), ("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(value) >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value:.2f}"
+
+
+def _pct(value: float) -> str:
+    return f"{100 * value:.1f}%" if np.isfinite(value) else "n/a"
+
+
+def _x(value: float) -> str:
+    return f"{value:.2f}" if np.isfinite(value) else "n/a"
+
+
+def render_fundamentals(store: FundamentalsStore, ticker: str) -> str:
+    """Dense fundamentals block for prompts: latest filing, its ratios and a short trend"""
+    f = store.latest(ticker)
+    if not f:
+        return ""
+    rows = store.rows(ticker)
+    same_period = rows["period"] == f["period"]
+    recent = np.flatnonzero(same_period)[-TREND_PERIODS:]
+    trend = " | ".join(
+        f"{rows['period_end'][i]}: rev {_money(rows['revenue'][i])}, GM {_pct(rows['gross_margin'][i])}, "
+        f"NM {_pct(rows['net_margin'][i])}, EPS {_x(rows['eps'][i])}"
+        for i in recent
+    )
+    period = "quarter" if f["period"] == "Q" else "fiscal year"
+    return f"""# Company Fundamentals: {ticker} ({period} ended {f['period_end']}, {f['currency']}; valuation on TTM)
+Size: revenue {_money(f['revenue'])} ({_pct(f['revenue_growth_yoy'])} YoY), net income {_money(f['net_income'])}, market cap {_money(f['market_cap'])} at price {_x(f['price'])}
+Profitability: gross margin {_pct(f['gross_margin'])}, operating margin {_pct(f['operating_margin'])}, net margin {_pct(f['net_margin'])}, ROE {_pct(f['roe'])}, ROA {_pct(f['roa'])}
+Growth: EPS {_x(f['eps'])} ({_pct(f['eps_growth_yoy'])} YoY)
+Valuation: P/E {_x(f['pe'])}, P/S {_x(f['ps'])}, P/B {_x(f['pb'])}, EV/EBITDA {_x(f['ev_ebitda'])}, P/FCF {_x(f['p_fcf'])}
+Balance sheet: current ratio {_x(f['current_ratio'])}, quick ratio {_x(f['quick_ratio'])}, debt/equity {_x(f['debt_to_equity'])} (long-term {_x(f['lt_debt_to_equity'])}), interest coverage {_x(f['interest_coverage'])}, cash {_money(f['cash'])}
+Cash flow: FCF TTM {_money(f['fcf_ttm'])} ({_pct(f['fcf_margin'])} margin), dividend yield {_pct(f['dividend_yield'])}, payout {_pct(f['payout_ratio'])}
+Trend ({period}s): {trend}
+"""
+
+
+def publish(store: FundamentalsStore, tickers: list) -> int:
+    """Write fundamentals_report.md for ``tickers``; returns how many changed"""
+    writer = ReportWriter("fundamentals", interval_s=0)
+    return sum(writer.write(t, render_fundamentals(store, t), store.latest(t)["period_end"]) is not None
+               for t in tickers if t in store.tickers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar fundamentals store with precomputed ratios")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load_cmd = commands.add_parser("load", help="Bulk-load filings (CSV, JSON or JSON lines)")
+    load_cmd.add_argument("files", nargs="+")
+    load_cmd.add_argument("--publish", action="store_true", help="Then publish reports for main3's tickers")
+    show_cmd = commands.add_parser("show", help="Print the rendered fundamentals block")
+    show_cmd.add_argument("ticker")
+    publish_cmd = commands.add_parser("publish", help="Write fundamentals_report.md (default: main3's tickers)")
+    publish_cmd.add_argument("tickers", nargs="*")
+    args = parser.parse_args()
+
+    store = FundamentalsStore()
+    if args.command == "load":
+        for path in args.files:
+            started = time.perf_counter()
+            frame = read_filings(path)
+            stats = store.load(frame)
+            store.save()
+            print(f"📥 {path}: {stats['filings']:,} filings ({stats['new']:,} new, {stats['changed']:,} changed), "
+                  f"ratios recomputed for {stats['tickers_recomputed']:,} tickers in {time.perf_counter() - started:.2f}s")
+        print(f"🗄️  Store: {len(store):,} filings, {len(store.tickers):,} tickers -> {store.path}")
+    if args.command == "show":
+        block = render_fundamentals(store, args.ticker.upper())
+        if not block:
+            raise SystemExit(f"❌ {args.ticker} not in {store.path}")
+        print(block)
+        print(f"🔤 {estimate_tokens(block)} tokens")
+    if args.command == "publish" or (args.command == "load" and args.publish):
+        tickers = [t.upper() for t in getattr(args, "tickers", [])] or list(discover_tickers(DATA_FOLDER))
+        print(f"📝 {publish(store, tickers)} fundamentals report(s) changed")
@@ -0,0 +1,480 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import openai
+from dotenv import load_dotenv
+
+# Before anything reads its configuration: these modules and the block below
+# read the environment at import time
+load_dotenv()
+
+from debate_memory import estimate_tokens
+from llm_metrics import record_call
+from model_router import DEFAULT_MODEL, DEFAULT_TEMPERATURE
+from rate_limiter import TokenBucketLimiter
+from response_cache import ResponseCache, make_key
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+REQUEST_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))  # per attempt
+DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "300"))  # per call, across retries
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+EXPECTED_COMPLETION_TOKENS = 700  # charged to the TPM bucket until usage is known
+# Hedging: a duplicate request once an attempt outlives the p95 latency;
+# streamed calls hedge only until their first token (p95 time to first token)
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+
+# Alternate OpenAI-compatible endpoint used while the primary is slow: once
+# the p95 time-to-first-response of the primary's recent attempts exceeds
+# FALLBACK_P95_S, calls go to the fallback for FALLBACK_COOLDOWN_S.
+FALLBACK_BASE_URL = os.getenv("LLM_FALLBACK_BASE_URL", "")
+FALLBACK_API_KEY = os.getenv("LLM_FALLBACK_API_KEY", "") or os.getenv("OPENAI_API_KEY")
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")  # empty: same model name as requested
+FALLBACK_P95_S = float(os.getenv("LLM_FALLBACK_P95_S", "20"))
+FALLBACK_COOLDOWN_S = float(os.getenv("LLM_FALLBACK_COOLDOWN_S", "60"))
+FALLBACK_WINDOW = 50
+FALLBACK_MIN_SAMPLES = 10
+
+# ----------------------------
+# SHARED CLIENT
+# ----------------------------
+# One AsyncOpenAI client per endpoint and one event loop per process. The
+# loop runs in a daemon thread so that synchronous callers (Pathway UDFs,
+# scripts) and async callers on other loops all reuse the same keep-alive
+# connection pool.
+_cache = None
+_loop = None
+_latencies = deque(maxlen=500)  # seconds per successful non-streamed attempt
+_first_token_latencies = deque(maxlen=500)  # seconds to the first token per streamed attempt
+_lock = threading.Lock()
+
+
+class Endpoint:
+    """An OpenAI-compatible endpoint with its own client, rate limiter and latency window"""
+
+    def __init__(self, name: str, base_url: str = None, api_key: str = None, model: str = "", limiter=None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.limiter = limiter or TokenBucketLimiter()
+        self.response_times = deque(maxlen=FALLBACK_WINDOW)  # seconds to first response per attempt
+        self._client = None
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        with _lock:
+            if self._client is None:
+                # The SDK's default async HTTP client keeps a keep-alive pool;
+                # base_url None falls back to OPENAI_BASE_URL, which lets
+                # benchmarks point the client at a local mock endpoint.
+                # Retries happen in _complete, where they can respect the
+                # rate limiter and the per-call deadline.
+                self._client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=REQUEST_TIMEOUT_S,
+                    max_retries=0,
+                )
+        return self._client
+
+    def p95(self):
+        """p95 time to first response, or None until enough samples exist"""
+        if len(self.response_times) < FALLBACK_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.response_times)
+        return ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)]
+
+
+_primary = Endpoint("primary", api_key=os.getenv("OPENAI_API_KEY"))
+_fallback = Endpoint(
+    "fallback", base_url=FALLBACK_BASE_URL, api_key=FALLBACK_API_KEY, model=FALLBACK_MODEL,
+    limiter=TokenBucketLimiter(rpm=0, tpm=0)
+) if FALLBACK_BASE_URL else None
+_fallback_until = 0.0
+
+
+def _choose_endpoint() -> Endpoint:
+    """The primary, unless its recent p95 is over FALLBACK_P95_S (then the fallback for a cooldown)"""
+    global _fallback_until
+    if _fallback is None:
+        return _primary
+    now = time.monotonic()
+    if now < _fallback_until:
+        return _fallback
+    p95 = _primary.p95()
+    if p95 is not None and p95 > FALLBACK_P95_S:
+        _fallback_until = now + FALLBACK_COOLDOWN_S
+        # Judge the primary afresh once the cooldown is over
+        _primary.response_times.clear()
+        print(f"↪️  Primary LLM endpoint p95 {p95:.1f}s > {FALLBACK_P95_S:g}s; "
+              f"using fallback {FALLBACK_BASE_URL} for {FALLBACK_COOLDOWN_S:g}s")
+        return _fallback
+    return _primary
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop that owns the HTTP connection pool"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client-loop", daemon=True).start()
+    return _loop
+
+
+def get_client() -> openai.AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client of the primary endpoint"""
+    return _primary.client
+
+
+def get_cache():
+    """Return the process-wide response cache, or None when LLM_CACHE=0"""
+    global _cache
+    with _lock:
+        if _cache is None and CACHE_ENABLED:
+            _cache = ResponseCache()
+    return _cache
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the response cache"""
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0}
+
+
+def limiter_stats() -> dict:
+    return _primary.limiter.stats()
+
+
+def hedge_delay(samples: deque = _latencies):
+    """p95 of recent attempt latencies (or times to first token), or None until enough samples exist"""
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, len(ordered) * HEDGE_PERCENTILE // 100)]
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, never shorter than a 429's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+async def _attempt(endpoint: Endpoint, messages: list, model: str, temperature: float, max_tokens, on_token, estimated_tokens: int) -> tuple:
+    """One request through the endpoint's limiter; returns (content, prompt_tokens, completion_tokens)"""
+    await endpoint.limiter.acquire(estimated_tokens)
+    started = time.monotonic()
+    completions = endpoint.client.chat.completions
+    options = {"max_tokens": max_tokens} if max_tokens else {}
+    usage = None
+    if on_token is None:
+        response = await completions.create(
+            model=endpoint.model or model,
+            messages=messages,
+            temperature=temperature,
+            **options,
+        )
+        content = response.choices[0].message.content or ""
+        usage = response.usage
+        _latencies.append(time.monotonic() - started)
+        endpoint.response_times.append(time.monotonic() - started)
+    else:
+        stream = await completions.create(
+            model=endpoint.model or model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options,
+        )
+        endpoint.response_times.append(time.monotonic() - started)
+        parts = []
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not parts:
+                    _first_token_latencies.append(time.monotonic() - started)
+                parts.append(delta)
+                on_token(delta)
+        content = "".join(parts)
+
+    if usage is None:
+        # Endpoints that do not report usage on streams
+        prompt_tokens = sum(estimate_tokens(str(m["content"])) for m in messages)
+        completion_tokens = estimate_tokens(content)
+    else:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    endpoint.limiter.settle(estimated_tokens, prompt_tokens + completion_tokens)
+    return content, prompt_tokens, completion_tokens
+
+
+async def _hedged_attempt(endpoint: Endpoint, messages: list, model: str, temperature: float, max_tokens, estimated_tokens: int) -> tuple:
+    """Send a duplicate request if the first outlives the p95 latency; first response wins.
+
+    Returns (result, hedge_usage): hedge_usage is None when no duplicate went
+    out, else the (prompt, completion) tokens billed for the cancelled loser,
+    taken as the winner's since it was generating the same completion.
+    """
+    delay = hedge_delay()
+    primary = asyncio.ensure_future(_attempt(endpoint, messages, model, temperature, max_tokens, None, estimated_tokens))
+    if delay is None:
+        return await primary, None
+    done, _ = await asyncio.wait([primary], timeout=delay)
+    if done:
+        return primary.result(), None
+
+    hedge = asyncio.ensure_future(_attempt(endpoint, messages, model, temperature, max_tokens, None, estimated_tokens))
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    _, prompt_tokens, completion_tokens = task.result()
+                    # A loser that failed outright isn't billed
+                    losers = sum(1 for other in (primary, hedge) if other is not task and not (other.done() and other.exception()))
+                    return task.result(), (prompt_tokens * losers, completion_tokens * losers)
+        # Both failed: surface the primary's error to the retry loop
+        return primary.result(), (0, 0)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _hedged_stream(endpoint: Endpoint, messages: list, model: str, temperature: float, max_tokens, on_token, estimated_tokens: int) -> tuple:
+    """Streamed counterpart of _hedged_attempt, hedging only until the first token.
+
+    A duplicate request goes out if no token arrives within the p95 time to
+    first token. The attempt that streams first wins and the other is
+    cancelled, so ``on_token`` sees exactly one completion. The loser is
+    billed its prompt plus whatever it streamed before the cancel.
+    """
+    delay = hedge_delay(_first_token_latencies)
+    if delay is None:
+        return await _attempt(endpoint, messages, model, temperature, max_tokens, on_token, estimated_tokens), None
+    winner = None
+    first_token = asyncio.Event()
+    dropped = {0: [], 1: []}
+
+    def sink(index):
+        def deliver(delta):
+            nonlocal winner
+            if winner is None:
+                winner = index
+                first_token.set()
+            if winner == index:
+                on_token(delta)
+            else:
+                dropped[index].append(delta)
+        return deliver
+
+    attempts = {0: asyncio.ensure_future(_attempt(endpoint, messages, model, temperature, max_tokens, sink(0), estimated_tokens))}
+    waiter = asyncio.ensure_future(first_token.wait())
+    failed = None
+    try:
+        done, _ = await asyncio.wait([attempts[0], waiter], timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+        if done:
+            return await attempts[0], None
+        attempts[1] = asyncio.ensure_future(_attempt(endpoint, messages, model, temperature, max_tokens, sink(1), estimated_tokens))
+        while winner is None and attempts:
+            done, _ = await asyncio.wait([*attempts.values(), waiter], return_when=asyncio.FIRST_COMPLETED)
+            for index, task in list(attempts.items()):
+                if task.done() and winner is None:
+                    if task.exception() is None:
+                        # Finished without streaming a token (empty completion)
+                        winner = index
+                    else:
+                        failed = attempts.pop(index)
+        if winner is None:
+            # Both failed before streaming: surface an error to the retry loop
+            return failed.result(), (0, 0)
+        result = await attempts[winner]
+        losers = [index for index in attempts if index != winner]
+        return result, (
+            result[1] * len(losers),
+            sum(estimate_tokens("".join(dropped[index])) for index in losers),
+        )
+    finally:
+        waiter.cancel()
+        for index, task in attempts.items():
+            if index != winner:
+                task.cancel()
+        if failed is not None and winner is not None:
+            failed.exception()  # retrieved, so asyncio doesn't log it
+
+
+async def _complete(messages: list, model: str, temperature: float, max_tokens, cache_parts, on_token, usage: dict) -> str:
+    """Run one chat completion on the client's own event loop; returns the content.
+
+    Transient failures (429, 5xx, timeouts, connection errors) are retried
+    with jittered exponential backoff until MAX_RETRIES or the DEADLINE_S
+    budget runs out. A streamed call is only retried if no token has been
+    delivered yet, so ``on_token`` never sees a turn twice. Each attempt
+    picks its endpoint, so retries move to the fallback once the primary
+    is slow. ``usage`` is filled in as the call goes (model, endpoint,
+    tokens, attempts, hedged duplicates), so a failed call can be recorded too.
+    """
+    cache = get_cache() if cache_parts is not None else None
+    if cache is not None:
+        key = make_key(model, temperature, messages[0]["content"], max_tokens=max_tokens, **cache_parts)
+        cached = cache.get(key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            usage.update(cache_hit=True, attempts=0)
+            return cached
+
+    estimated_tokens = sum(estimate_tokens(str(m["content"])) for m in messages) + EXPECTED_COMPLETION_TOKENS
+    deadline = time.monotonic() + DEADLINE_S
+    streamed = []
+    if on_token is not None:
+        def on_token(delta, _forward=on_token):
+            streamed.append(delta)
+            _forward(delta)
+
+    usage.update(model=model, attempts=0, hedged=False, hedge_prompt_tokens=0, hedge_completion_tokens=0)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"LLM call exceeded its {DEADLINE_S:g}s deadline")
+        endpoint = _choose_endpoint()
+        usage.update(model=endpoint.model or model, endpoint=endpoint.name, attempts=attempt + 1)
+        try:
+            if HEDGE_ENABLED and on_token is None:
+                (content, prompt_tokens, completion_tokens), hedge = await asyncio.wait_for(
+                    _hedged_attempt(endpoint, messages, model, temperature, max_tokens, estimated_tokens), remaining
+                )
+            elif HEDGE_ENABLED:
+                (content, prompt_tokens, completion_tokens), hedge = await asyncio.wait_for(
+                    _hedged_stream(endpoint, messages, model, temperature, max_tokens, on_token, estimated_tokens), remaining
+                )
+            else:
+                content, prompt_tokens, completion_tokens = await asyncio.wait_for(
+                    _attempt(endpoint, messages, model, temperature, max_tokens, on_token, estimated_tokens), remaining
+                )
+                hedge = None
+            break
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM call exceeded its {DEADLINE_S:g}s deadline") from None
+        except (openai.RateLimitError, openai.InternalServerError, openai.APITimeoutError, openai.APIConnectionError) as e:
+            if attempt >= MAX_RETRIES or streamed:
+                raise
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                endpoint.limiter.pause(delay)
+            if time.monotonic() + delay >= deadline:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    if hedge is not None:
+        usage["hedged"] = True
+        usage["hedge_prompt_tokens"] += hedge[0]
+        usage["hedge_completion_tokens"] += hedge[1]
+    if cache is not None:
+        cache.put(key, content)
+    usage.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, retries=attempt)
+    return content
+
+
+def _record(model: str, started: float, usage: dict, error: BaseException = None):
+    """Write the call's span; a failed call gets status "error" (or "cancelled") and the error"""
+    if error is not None:
+        usage["status"] = "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+        usage["error"] = repr(error)[:300]
+        usage.setdefault("retries", max(usage.get("attempts", 1) - 1, 0))
+    record_call(usage.pop("model", model), time.perf_counter() - started, **usage)
+
+
+# ----------------------------
+# PUBLIC API
+# ----------------------------
+# ``model``, ``temperature`` and ``max_tokens`` usually come from
+# model_router.route(role, round_num) so each role runs on its configured model.
+#
+# ``cache_parts`` holds the non-model part of the cache key (report_hashes,
+# history, role, round_num; see response_cache.make_key). Calls without it
+# always go to the API.
+#
+# With ``on_token`` the completion is streamed and ``on_token(delta)`` is
+# called for every text chunk as it arrives (on the client's loop thread, so
+# keep it short: print, append to a file, hand off to a queue). A cache hit
+# is delivered as a single chunk.
+#
+# Every call is recorded as a metrics span (llm_metrics.record_call) in the
+# caller's context, so labels set with llm_metrics.metric_labels apply;
+# failed and cancelled calls too, with their status, error and attempts.
+async def achat(messages: list, model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE, cache_parts: dict = None, on_token=None, max_tokens: int = None) -> str:
+    """Chat completion awaitable from any event loop"""
+    started, usage = time.perf_counter(), {}
+    future = asyncio.run_coroutine_threadsafe(_complete(messages, model, temperature, max_tokens, cache_parts, on_token, usage), _get_loop())
+    try:
+        content = await asyncio.wrap_future(future)
+    except BaseException as e:
+        _record(model, started, usage, e)
+        raise
+    _record(model, started, usage)
+    return content
+
+
+def chat(messages: list, model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE, cache_parts: dict = None, on_token=None, max_tokens: int = None) -> str:
+    """Blocking chat completion for synchronous code such as Pathway UDFs"""
+    started, usage = time.perf_counter(), {}
+    future = asyncio.run_coroutine_threadsafe(_complete(messages, model, temperature, max_tokens, cache_parts, on_token, usage), _get_loop())
+    try:
+        content = future.result()
+    except BaseException as e:
+        _record(model, started, usage, e)
+        raise
+    _record(model, started, usage)
+    return content
+
+
+def run_sync(coro):
+    """Run a coroutine on the client's loop and block for its result.
+
+    The blocking counterpart of awaiting it: unlike asyncio.run this works
+    from a thread whose own event loop is running, and the coroutine sees
+    the caller's context (metric_labels).
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync would deadlock on the LLM client's own loop; await the coroutine instead")
+    result = concurrent.futures.Future()
+
+    def transfer(task):
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    loop.call_soon_threadsafe(lambda: loop.create_task(coro).add_done_callback(transfer), context=contextvars.copy_context())
+    return result.result()
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+METRICS_ENABLED = os.getenv("LLM_METRICS", "1") != "0"
+METRICS_PATH = os.getenv("LLM_METRICS_PATH", "./metrics/llm_calls.jsonl")
+METRICS_PORT = int(os.getenv("LLM_METRICS_PORT", "0"))  # 0 = no Prometheus endpoint
+LATENCY_BUCKETS_S = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# USD per 1M (prompt, completion) tokens; unknown models are costed at 0
+PRICE_PER_1M_TOKENS = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+TOTAL_FIELDS = ("calls", "errors", "cache_hits", "retries", "hedges", "prompt_tokens", "completion_tokens", "cost_usd", "llm_seconds")
+
+# ----------------------------
+# SPAN CONTEXT
+# ----------------------------
+# Labels (ticker, role, round) and the per-debate totals travel with the
+# calling task, so concurrent debates and parallel graph nodes never mix.
+_labels = ContextVar("llm_metric_labels", default={})
+_totals = ContextVar("llm_metric_totals", default=())
+
+
+@contextmanager
+def metric_labels(**labels):
+    """Attach labels to every LLM call span made inside the block"""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+@contextmanager
+def collect_totals():
+    """Sum the spans recorded inside the block into the yielded dict (blocks may nest)"""
+    totals = dict.fromkeys(TOTAL_FIELDS, 0)
+    token = _totals.set(_totals.get() + (totals,))
+    try:
+        yield totals
+    finally:
+        _totals.reset(token)
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["llm_seconds"] = round(totals["llm_seconds"], 3)
+
+
+def merge_totals(*totals) -> dict:
+    """Field-wise sum of totals dicts, e.g. a debate's and its trader stage's"""
+    merged = {field: sum(t.get(field, 0) for t in totals) for field in TOTAL_FIELDS}
+    merged["cost_usd"] = round(merged["cost_usd"], 6)
+    merged["llm_seconds"] = round(merged["llm_seconds"], 3)
+    return merged
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = PRICE_PER_1M_TOKENS.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+# ----------------------------
+# RECORDER
+# ----------------------------
+class MetricsRecorder:
+    """Appends call spans to a JSONL file and keeps Prometheus-style aggregates"""
+
+    def __init__(self, path: str = METRICS_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a")
+        self._series = {}
+
+    def record(self, span: dict):
+        with self._lock:
+            self._file.write(json.dumps(span) + "\n")
+            self._file.flush()
+            key = (span.get("role", ""), span["model"])
+            series = self._series.setdefault(key, {
+                "calls": 0, "errors": 0, "cache_hits": 0, "retries": 0, "hedges": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cost_usd": 0.0, "latency_sum": 0.0, "buckets": [0] * len(LATENCY_BUCKETS_S),
+            })
+            for field in ("retries", "prompt_tokens", "completion_tokens", "cost_usd"):
+                series[field] += span[field]
+            series["calls"] += 1
+            series["errors"] += span["status"] != "ok"
+            series["cache_hits"] += span["cache_hit"]
+            series["hedges"] += span["hedged"]
+            series["latency_sum"] += span["latency_s"]
+            for i, bound in enumerate(LATENCY_BUCKETS_S):
+                if span["latency_s"] <= bound:
+                    series["buckets"][i] += 1
+
+    def render_prometheus(self) -> str:
+        """Text exposition format of the aggregates, labelled by role and model"""
+        lines = []
+        with self._lock:
+            series = {key: {**s, "buckets": list(s["buckets"])} for key, s in self._series.items()}
+
+        def label(role, model, **extra):
+            pairs = {"role": role, "model": model, **extra}
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs.items()) + "}"
+
+        for name, field, kind in (
+            ("llm_calls_total", "calls", "counter"),
+            ("llm_errors_total", "errors", "counter"),
+            ("llm_cache_hits_total", "cache_hits", "counter"),
+            ("llm_retries_total", "retries", "counter"),
+            ("llm_hedges_total", "hedges", "counter"),
+            ("llm_prompt_tokens_total", "prompt_tokens", "counter"),
+            ("llm_completion_tokens_total", "completion_tokens", "counter"),
+            ("llm_cost_usd_total", "cost_usd", "counter"),
+        ):
+            lines.append(f"# TYPE {name} {kind}")
+            lines += [f"{name}{label(*key)} {s[field]}" for key, s in series.items()]
+
+        lines.append("# TYPE llm_call_latency_seconds histogram")
+        for key, s in series.items():
+            for bound, count in zip(LATENCY_BUCKETS_S, s["buckets"]):
+                lines.append(f"llm_call_latency_seconds_bucket{label(*key, le=bound)} {count}")
+            lines.append(f"llm_call_latency_seconds_bucket{label(*key, le='+Inf')} {s['calls']}")
+            lines.append(f"llm_call_latency_seconds_sum{label(*key)} {s['latency_sum']:.6f}")
+            lines.append(f"llm_call_latency_seconds_count{label(*key)} {s['calls']}")
+        return "\n".join(lines) + "\n"
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Return the process-wide recorder, or None when LLM_METRICS=0"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None and METRICS_ENABLED:
+            _recorder = MetricsRecorder()
+    return _recorder
+
+
+def record_call(model: str, latency_s: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                retries: int = 0, cache_hit: bool = False, hedged: bool = False, endpoint: str = "primary",
+                attempts: int = 1, hedge_prompt_tokens: int = 0, hedge_completion_tokens: int = 0,
+                status: str = "ok", error: str = "") -> dict:
+    """Build the span for one LLM call, write it out and add it to the open totals.
+
+    ``status`` is "ok", "error" or "cancelled". The cost includes the tokens
+    billed for hedged duplicates that lost the race (hedge_*_tokens).
+    """
+    cost = 0.0 if cache_hit else estimate_cost(
+        model, prompt_tokens + hedge_prompt_tokens, completion_tokens + hedge_completion_tokens
+    )
+    span = {
+        "ts": time.time(),
+        **_labels.get(),
+        "model": model,
+        "endpoint": endpoint,
+        "status": status,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_s": round(latency_s, 4),
+        "attempts": attempts,
+        "retries": retries,
+        "hedged": hedged,
+        "hedge_prompt_tokens": hedge_prompt_tokens,
+        "hedge_completion_tokens": hedge_completion_tokens,
+        "cache_hit": cache_hit,
+        "cost_usd": round(cost, 8),
+    }
+    if error:
+        span["error"] = error
+    for totals in _totals.get():
+        totals["calls"] += 1
+        totals["errors"] += status != "ok"
+        totals["cache_hits"] += cache_hit
+        totals["retries"] += retries
+        totals["hedges"] += hedged
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["cost_usd"] += cost
+        totals["llm_seconds"] += latency_s
+    recorder = get_recorder()
+    if recorder is not None:
+        recorder.record(span)
+    return span
+
+# ----------------------------
+# PROMETHEUS ENDPOINT
+# ----------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        recorder = get_recorder()
+        if self.path.rstrip("/") != "/metrics" or recorder is None:
+            self.send_error(404)
+            return
+        body = recorder.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve GET /metrics in a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-metrics-server", daemon=True).start()
+    return server
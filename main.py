@@ -1,7 +1,12 @@
+import asyncio
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import openai
+from llm_client import achat, run_sync
+from llm_metrics import metric_labels
+from model_router import route
+from debate_convergence import ConvergenceTracker, describe_stop
+from debate_stream import STREAM_TO_CONSOLE, DebateStream
 
 # ----------------------------
 # CONFIGURATION
@@ -17,18 +22,18 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 # AGENT CLASS DEFINITIONS
 # ----------------------------
 class DebateAgent:
-    """Base class for debate agents using OpenAI API"""
+    """Base class for debate agents on the shared, rate-limited LLM client"""
     
-    def __init__(self, system_prompt: str, role: str, model: str = "gpt-4o-mini", temperature: float = 0.7):
+    def __init__(self, system_prompt: str, role: str, model: str = None, temperature: float = None):
+        """``model`` / ``temperature`` pin the agent; left unset, model_router picks them per round"""
         self.system_prompt = system_prompt
         self.role = role
         self.model = model
         self.temperature = temperature
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.memory = []
     
-    def generate_response(self, context: str, opponent_message: str, round_num: int) -> str:
-        """Generate a response based on context and opponent's message"""
+    async def agenerate_response(self, context: str, opponent_message: str, round_num: int, final_round: bool = False, on_token=None) -> str:
+        """Generate a response based on context and opponent's message, streaming it into ``on_token``"""
         
         # Build the full prompt with system instructions and context
         full_prompt = f"""{context}
@@ -39,17 +44,16 @@ Opponent ({self.get_opponent_role()}) said: {opponent_message}
 Your turn to argue as the {self.role}. Provide a compelling, well-reasoned response that directly engages with the opponent's points.
 """
         
-        # Generate response using OpenAI API
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": full_prompt}
-            ],
-            temperature=self.temperature
-        )
-        
-        response_text = response.choices[0].message.content
+        # Generate response (retries, backoff and rate limits live in llm_client)
+        with metric_labels(role=self.role.lower(), round=round_num):
+            response_text = await achat(
+                [
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": full_prompt}
+                ],
+                on_token=on_token,
+                **self.route(round_num, final_round)
+            )
         
         # Store in memory
         self.memory.append({
@@ -60,6 +64,18 @@ Your turn to argue as the {self.role}. Provide a compelling, well-reasoned respo
         
         return response_text
     
+    def generate_response(self, context: str, opponent_message: str, round_num: int, final_round: bool = False, on_token=None) -> str:
+        """Blocking wrapper around agenerate_response"""
+        return run_sync(self.agenerate_response(context, opponent_message, round_num, final_round, on_token))
+    
+    def route(self, round_num: int, final_round: bool = False) -> dict:
+        settings = route(self.role.lower(), round_num, final_round)
+        if self.model is not None:
+            settings["model"] = self.model
+        if self.temperature is not None:
+            settings["temperature"] = self.temperature
+        return settings
+    
     def get_opponent_role(self) -> str:
         return "Bull" if self.role == "Bear" else "Bear"
 
@@ -103,12 +119,13 @@ Be optimistic, thorough, and evidence-based in your analysis."""
 class SummarizerAgent:
     """Agent to summarize debate and provide final recommendation"""
     
-    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.7):
-        self.model = model
-        self.temperature = temperature
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, model: str = None, temperature: float = None):
+        settings = route("summarizer")
+        self.model = model or settings["model"]
+        self.temperature = settings["temperature"] if temperature is None else temperature
+        self.max_tokens = settings["max_tokens"]
     
-    def summarize_debate(self, debate_history: list, reports_context: str) -> str:
+    async def asummarize_debate(self, debate_history: list, reports_context: str, on_token=None) -> str:
         """Summarize the entire debate and provide BUY/HOLD/SELL recommendation"""
         
         # Compile debate transcript
@@ -133,23 +150,44 @@ Provide:
 
 Be objective and consider both perspectives before concluding."""
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an objective financial analyst who summarizes debates and provides clear investment recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
-        )
-        
-        return response.choices[0].message.content
+        with metric_labels(role="summarizer"):
+            return await achat(
+                [
+                    {"role": "system", "content": "You are an objective financial analyst who summarizes debates and provides clear investment recommendations."},
+                    {"role": "user", "content": prompt}
+                ],
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                on_token=on_token
+            )
+    
+    def summarize_debate(self, debate_history: list, reports_context: str, on_token=None) -> str:
+        """Blocking wrapper around asummarize_debate"""
+        return run_sync(self.asummarize_debate(debate_history, reports_context, on_token))
 
 
 # ----------------------------
 # DEBATE FUNCTION
 # ----------------------------
-def run_debate(reports, n_rounds=N_ROUNDS):
-    """Run the debate between Bull and Bear agents"""
+async def arun_debate(reports, n_rounds=N_ROUNDS, ticker: str = "", echo: bool = True, subscriber=None):
+    """Run the debate between Bull and Bear agents.
+
+    Awaitable from any event loop; every call goes through llm_client's
+    shared client and rate limiter, so many debates can be gathered at
+    once. Turns stream into OUTPUT_FOLDER/debate.md (debate_<ticker>.md
+    per ticker) and, with ``echo`` and DEBATE_STREAM on, the console;
+    ``subscriber`` gets every token. ``echo=False`` drops the per-turn
+    console output.
+    """
+    if ticker:
+        with metric_labels(ticker=ticker):
+            return await _arun_debate(reports, n_rounds, ticker, echo, subscriber)
+    return await _arun_debate(reports, n_rounds, ticker, echo, subscriber)
+
+
+async def _arun_debate(reports, n_rounds, ticker, echo, subscriber):
+    say = print if echo else (lambda *args, **kwargs: None)
     
     # Unpack the four reports
     fundamentals_report, market_report, news_report, sentiment_report = reports
@@ -169,7 +207,7 @@ Company Fundamentals Report:
 {fundamentals_report}
 """
     
-    print("🎭 Starting Stock Analysis Debate...\n")
+    say("🎭 Starting Stock Analysis Debate...\n")
     
     # Initialize agents
     bull_agent = BullAgent()
@@ -179,32 +217,77 @@ Company Fundamentals Report:
     history = []
     bear_message = "Let's begin the analysis. I believe there are significant risks that investors should be aware of."
     
-    # Run debate rounds
-    for round_num in range(1, n_rounds + 1):
-        print(f"📍 Round {round_num}")
-        print("-" * 50)
-        
-        # Bull's turn
-        print("🐂 Bull Analyst thinking...")
-        bull_reply = bull_agent.generate_response(base_context, bear_message, round_num)
-        print(f"Bull: {bull_reply[:200]}...\n")
-        
-        # Bear's turn
-        print("🐻 Bear Analyst thinking...")
-        bear_message = bear_agent.generate_response(base_context, bull_reply, round_num)
-        print(f"Bear: {bear_message[:200]}...\n")
-        
-        # Store round
-        history.append((bull_reply, bear_message))
+    # Stream the transcript into debate.md while the debate runs
+    debate_path = Path(OUTPUT_FOLDER) / (f"debate_{ticker}.md" if ticker else "debate.md")
+    stream = DebateStream(debate_path, ticker or "debate", header="# Stock Analysis Debate Transcript\n\n",
+                          echo=echo and STREAM_TO_CONSOLE, subscriber=subscriber)
+    
+    # An echoing stream prints each turn itself as it arrives
+    progress = (lambda *args, **kwargs: None) if stream.echo else say
     
-    # Generate final summary
-    print("📊 Generating final summary and recommendation...")
-    summarizer = SummarizerAgent()
-    summary = summarizer.summarize_debate(history, base_context)
+    try:
+        # Run debate rounds
+        tracker = ConvergenceTracker(n_rounds)
+        for round_num in range(1, tracker.max_rounds + 1):
+            progress(f"📍 Round {round_num}")
+            progress("-" * 50)
+            
+            # Bull's turn
+            progress("🐂 Bull Analyst thinking...")
+            final_round = round_num == tracker.max_rounds
+            bull_reply = await bull_agent.agenerate_response(
+                base_context, bear_message, round_num, final_round, stream.turn("bull", round_num)
+            )
+            progress(f"Bull: {bull_reply[:200]}...\n")
+            
+            # Bear's turn
+            progress("🐻 Bear Analyst thinking...")
+            bear_message = await bear_agent.agenerate_response(
+                base_context, bull_reply, round_num, final_round, stream.turn("bear", round_num)
+            )
+            progress(f"Bear: {bear_message[:200]}...\n")
+            
+            # Store round
+            history.append((bull_reply, bear_message))
+            
+            verdict = await asyncio.to_thread(tracker.observe, bull_reply, bear_message)
+            if verdict["stop"]:
+                say(f"\n🛑 Debate stopped: {describe_stop(round_num, verdict)}")
+                break
+        
+        # Generate final summary
+        say("\n📊 Generating final summary and recommendation...")
+        summarizer = SummarizerAgent()
+        summary = await summarizer.asummarize_debate(history, base_context, stream.sink("summarizer", transcript=False))
+    finally:
+        # Off the loop: close() waits for the writer thread to catch up
+        await asyncio.to_thread(stream.close)
     
+    say(f"✅ Debate saved: {debate_path.absolute()}")
     return summary
 
 
+async def arun_debates(reports_by_ticker: dict, n_rounds=N_ROUNDS) -> dict:
+    """Debate every ticker concurrently; maps ticker to its final summary.
+
+    A failed ticker maps to its exception instead, so one failure doesn't
+    discard the summaries of the others.
+    """
+    summaries = await asyncio.gather(*(
+        arun_debate(reports, n_rounds, ticker=ticker, echo=False)
+        for ticker, reports in reports_by_ticker.items()
+    ), return_exceptions=True)
+    for ticker, summary in zip(reports_by_ticker, summaries):
+        if isinstance(summary, BaseException):
+            print(f"❌ Debate failed for {ticker}: {summary}")
+    return dict(zip(reports_by_ticker, summaries))
+
+
+def run_debate(reports, n_rounds=N_ROUNDS):
+    """Blocking wrapper around arun_debate"""
+    return run_sync(arun_debate(reports, n_rounds))
+
+
 # ----------------------------
 # MAIN LOGIC
 # ----------------------------
@@ -3,10 +3,17 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from pathway.xpacks.llm import llms
-import json
 from datetime import datetime
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from functools import lru_cache
+from debate_memory import render_history
+from debate_convergence import ConvergenceTracker, describe_stop
+from change_coalescer import QUIET_WINDOW_S, Superseded
+from fs_watcher import FolderWatcher
+from model_router import route
 
 # ----------------------------
 # CONFIGURATION
@@ -14,6 +21,7 @@ import pandas as pd
 DATA_FOLDER = "data-source"
 OUTPUT_FOLDER = "./final_reports"
 N_ROUNDS = 3  
+REPORT_TYPES = ["fundamentals", "market", "news", "sentiment"]
 load_dotenv()
 
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -21,11 +29,17 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 # ----------------------------
 # MODEL SETUP
 # ----------------------------
-chat_model = llms.OpenAIChat(
-    model="gpt-4o-mini",
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+@lru_cache(maxsize=None)
+def chat_model_for(role: str, round_num: int = 0, final_round: bool = False):
+    """OpenAIChat configured with model_router's route for ``role`` in ``round_num``"""
+    settings = route(role, round_num, final_round)
+    extra = {"max_tokens": settings["max_tokens"]} if settings["max_tokens"] else {}
+    return llms.OpenAIChat(
+        model=settings["model"],
+        temperature=settings["temperature"],
+        api_key=os.getenv("OPENAI_API_KEY"),
+        **extra
+    )
 
 # ----------------------------
 # SYSTEM PROMPTS
@@ -58,8 +72,15 @@ SUMMARIZER_SYSTEM_PROMPT = """You are a summarizer AI. After reading the debate
 # ----------------------------
 # DEBATE EXECUTION
 # ----------------------------
-def execute_debate(fundamentals: str, market: str, news: str, sentiment: str) -> str:
-    """Execute the complete debate with all reports"""
+def execute_debate(fundamentals: str, market: str, news: str, sentiment: str, is_stale=None) -> str:
+    """Execute the complete debate with all reports.
+
+    ``is_stale()`` is checked before every LLM call; when it returns True the
+    debate stops with Superseded instead of paying for stale inputs.
+    """
+    def check_stale():
+        if is_stale is not None and is_stale():
+            raise Superseded("reports changed mid-debate")
     
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n{'='*60}")
@@ -71,11 +92,15 @@ def execute_debate(fundamentals: str, market: str, news: str, sentiment: str) ->
     bear_message = "Let's begin. I believe there are significant risks investors should be aware of."
     
     # Run debate rounds
-    for round_num in range(1, N_ROUNDS + 1):
+    tracker = ConvergenceTracker(N_ROUNDS)
+    for round_num in range(1, tracker.max_rounds + 1):
         print(f"\n📍 Round {round_num}")
         print("-" * 50)
         
+        final_round = round_num == tracker.max_rounds
+        
         # Bull's turn
+        check_stale()
         print("🐂 Bull Analyst thinking...")
         bull_prompt = [
             {"role": "system", "content": BULL_SYSTEM_PROMPT},
@@ -92,7 +117,7 @@ Company Fundamentals Report:
 {fundamentals}
 
 Conversation history of the debate:
-{json.dumps(history)}
+{render_history(history)}
 
 Round {round_num}:
 Last bear argument: {bear_message}
@@ -104,13 +129,14 @@ Your turn to argue as the Bull Analyst. Provide a compelling, well-reasoned resp
         bull_table = pw.debug.table_from_pandas(
             pd.DataFrame({"messages": [bull_prompt]})
         )
-        bull_response = bull_table.select(reply=chat_model(pw.this.messages))
+        bull_response = bull_table.select(reply=chat_model_for("bull", round_num, final_round)(pw.this.messages))
         bull_result = pw.debug.table_to_pandas(bull_response)
         bull_reply = bull_result["reply"].iloc[0] if not bull_result.empty else f"Bull argues for round {round_num}"
         
         print(f"Bull: {bull_reply[:150]}...")
         
         # Bear's turn
+        check_stale()
         print("🐻 Bear Analyst thinking...")
         bear_prompt = [
             {"role": "system", "content": BEAR_SYSTEM_PROMPT},
@@ -127,7 +153,7 @@ Company Fundamentals Report:
 {fundamentals}
 
 Conversation history of the debate:
-{json.dumps(history)}
+{render_history(history)}
 
 Round {round_num}:
 Last bull argument: {bull_reply}
@@ -138,7 +164,7 @@ Your turn to argue as the Bear Analyst. Respond critically with a compelling arg
         bear_table = pw.debug.table_from_pandas(
             pd.DataFrame({"messages": [bear_prompt]})
         )
-        bear_response = bear_table.select(reply=chat_model(pw.this.messages))
+        bear_response = bear_table.select(reply=chat_model_for("bear", round_num, final_round)(pw.this.messages))
         bear_result = pw.debug.table_to_pandas(bear_response)
         bear_reply = bear_result["reply"].iloc[0] if not bear_result.empty else f"Bear counters for round {round_num}"
         
@@ -146,8 +172,14 @@ Your turn to argue as the Bear Analyst. Respond critically with a compelling arg
         
         history.append({"round": round_num, "bull": bull_reply, "bear": bear_reply})
         bear_message = bear_reply
+        
+        verdict = tracker.observe(bull_reply, bear_reply)
+        if verdict["stop"]:
+            print(f"🛑 Debate stopped: {describe_stop(round_num, verdict)}")
+            break
     
     # Generate summary
+    check_stale()
     print("\n📊 Generating final summary...")
     debate_text = "\n\n".join([
         f"Round {item['round']}:\nBull: {item['bull']}\nBear: {item['bear']}" 
@@ -187,7 +219,7 @@ Be objective and consider both perspectives before concluding."""}
     summary_table = pw.debug.table_from_pandas(
         pd.DataFrame({"messages": [summary_prompt]})
     )
-    summary_response = summary_table.select(summary=chat_model(pw.this.messages))
+    summary_response = summary_table.select(summary=chat_model_for("summarizer")(pw.this.messages))
     summary_result = pw.debug.table_to_pandas(summary_response)
     summary = summary_result["summary"].iloc[0] if not summary_result.empty else "Summary completed"
     
@@ -216,6 +248,89 @@ DEBATE TRANSCRIPT
     
     return summary
 
+# ----------------------------
+# REPORT FILES
+# ----------------------------
+def report_files(folder: str = DATA_FOLDER) -> dict:
+    """Report type -> file, matched by name prefix (fundamentals*.md, market*.md, ...)"""
+    found = {}
+    for path in sorted(Path(folder).glob("*.md")):
+        for kind in REPORT_TYPES:
+            if path.stem.startswith(kind):
+                found.setdefault(kind, path)
+    return found
+
+# ----------------------------
+# BACKGROUND DEBATES
+# ----------------------------
+class DebateScheduler:
+    """Runs debates on one background worker so the watch loop never blocks.
+
+    Every change bumps a generation. A queued job starts once the reports
+    have been quiet for QUIET_WINDOW_S, and a running one stops with
+    Superseded as soon as a newer generation exists; only the latest state
+    is ever debated to the end.
+    """
+
+    def __init__(self, folder: str = DATA_FOLDER):
+        self.folder = folder
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debate")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._changed_at = float("-inf")
+
+    def notify_change(self, settle: bool = True):
+        """Queue a debate on the current reports; settle=False skips the quiet window"""
+        with self._lock:
+            self._generation += 1
+            if settle:
+                self._changed_at = time.monotonic()
+            generation = self._generation
+        self._executor.submit(self._run, generation)
+
+    def _is_stale(self, generation: int) -> bool:
+        with self._lock:
+            return generation != self._generation
+
+    def _wait_for_quiet(self, generation: int) -> bool:
+        """False if a newer change arrived while waiting"""
+        while not self._is_stale(generation):
+            with self._lock:
+                quiet_for = time.monotonic() - self._changed_at
+            if quiet_for >= QUIET_WINDOW_S:
+                return True
+            time.sleep(QUIET_WINDOW_S - quiet_for)
+        return False
+
+    def _run(self, generation: int):
+        if not self._wait_for_quiet(generation):
+            return
+        files = report_files(self.folder)
+        missing = [kind for kind in REPORT_TYPES if kind not in files]
+        if missing:
+            print(f"⚠️  Waiting for missing report(s): {', '.join(missing)}")
+            return
+        try:
+            reports = [files[kind].read_text() for kind in REPORT_TYPES]
+            summary = execute_debate(*reports, is_stale=lambda: self._is_stale(generation))
+        except Superseded:
+            print(f"\n⏭️  Reports changed mid-debate, waiting {QUIET_WINDOW_S:g}s of quiet before restarting...")
+            return
+        except Exception as e:
+            print(f"❌ Debate failed: {e}")
+            return
+
+        print("\n" + "="*60)
+        print("UPDATED SUMMARY" if generation > 1 else "INITIAL SUMMARY")
+        print("="*60)
+        print(summary)
+        print("="*60)
+
+    def shutdown(self):
+        with self._lock:
+            self._generation += 1  # supersede whatever is running
+        self._executor.shutdown(wait=True)
+
 # ----------------------------
 # MAIN EXECUTION
 # ----------------------------
@@ -224,65 +339,42 @@ if __name__ == "__main__":
     print("=" * 60)
     
     # Check for required files
-    txt_files = sorted(Path(DATA_FOLDER).glob("*.md"))
-    if len(txt_files) < 4:
+    files = report_files(DATA_FOLDER)
+    if len(files) < len(REPORT_TYPES):
         raise ValueError(
-            f"Expected at least 4 markdown files in '{DATA_FOLDER}' folder. "
-            f"Found {len(txt_files)}. Please ensure you have:\n"
+            f"Expected the 4 report files in '{DATA_FOLDER}' folder. "
+            f"Found {', '.join(p.name for p in files.values()) or 'none'}. Please ensure you have:\n"
             "1. fundamentals.md\n"
             "2. market_research.md\n"
             "3. news.md\n"
             "4. sentiment.md"
         )
     
-    print(f"📁 Found {len(txt_files)} report files")
+    watcher = FolderWatcher(DATA_FOLDER, pattern="*.md")
+    print(f"📁 Found {len(files)} report files")
     print(f"📊 Loading reports from {DATA_FOLDER}/")
-    print("⚡ Streaming mode with file monitoring")
+    print(f"⚡ Streaming mode with file monitoring ({watcher.backend})")
     print("=" * 60)
     
-    # Run initial debate
-    reports = [Path(f).read_text() for f in txt_files[:4]]
-    fundamentals, market, news, sentiment = reports
-    summary = execute_debate(fundamentals, market, news, sentiment)
-    
-    print("\n" + "="*60)
-    print("INITIAL SUMMARY")
-    print("="*60)
-    print(summary)
-    print("="*60)
+    # Run initial debate in the background; the watch loop starts right away
+    scheduler = DebateScheduler(DATA_FOLDER)
+    scheduler.notify_change(settle=False)
     
     # Monitor for file changes
     print("\n💡 System is now monitoring for file changes...")
     print("🛑 Press Ctrl+C to stop\n")
     
-    last_modified_times = {f: f.stat().st_mtime for f in txt_files[:4]}
-    
     try:
-        while True:
-            time.sleep(60)  # Check every 60 seconds
-            
-            # Check if any file has been modified
-            for file_path in txt_files[:4]:
-                current_mtime = file_path.stat().st_mtime
-                if current_mtime != last_modified_times[file_path]:
-                    print(f"\n🔔 File change detected: {file_path.name}")
-                    print("🔄 Re-running debate...")
-                    
-                    # Update all modification times
-                    last_modified_times = {f: f.stat().st_mtime for f in txt_files[:4]}
-                    
-                    # Re-read all files and run debate
-                    new_reports = [Path(f).read_text() for f in txt_files[:4]]
-                    summary = execute_debate(*new_reports)
-                    
-                    print("\n" + "="*60)
-                    print("UPDATED SUMMARY")
-                    print("="*60)
-                    print(summary)
-                    print("="*60)
-                    
-                    break  # Exit the for loop to restart monitoring
+        for changes in watcher.changes():
+            if not changes:
+                continue
+            for kind, path in changes:
+                print(f"\n🔔 File {'removed' if kind == 'removed' else 'change detected'}: {path.name}")
+            print(f"🔄 Re-running debate once reports are quiet for {QUIET_WINDOW_S:g}s...")
+            scheduler.notify_change()
                     
     except KeyboardInterrupt:
         print("\n\n🛑 Monitoring stopped by user")
-        print("✅ System shutdown complete")
\ No newline at end of file
+    finally:
+        watcher.close()
+        scheduler.shutdown()
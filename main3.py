@@ -2,10 +2,25 @@ import pathway as pw
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from pathway.xpacks.llm import llms
-import json
+import asyncio
+import hashlib
+import queue
+import threading
 from datetime import datetime
-import pandas as pd
+from llm_client import achat, cache_stats
+from model_router import route, router
+from llm_metrics import METRICS_PATH, METRICS_PORT, collect_totals, metric_labels, start_metrics_server
+from response_cache import hash_text
+from debate_memory import HISTORY_STRATEGY, render_history
+from debate_stream import STREAM_TO_CONSOLE, DebateStream
+from debate_graph import DebateGraph
+from debate_convergence import MAX_ROUNDS, MIN_ROUNDS, NOVELTY_THRESHOLD, ROUND_MODE, ConvergenceTracker, describe_stop
+from report_retrieval import RETRIEVAL_ENABLED, TOP_K, report_index
+from report_normalizer import NORMALIZE_ENABLED, normalization_stats, normalize_cached
+from trader_agent import decide, format_situation, parse_proposal, write_trader_report
+from processed_hashes import ProcessedHashes
+from change_coalescer import QUIET_WINDOW_S, ChangeCoalescer, Superseded
+from debate_checkpoint import CheckpointStore, resume_or_run
 
 # ----------------------------
 # CONFIGURATION
@@ -13,18 +28,38 @@ import pandas as pd
 DATA_FOLDER = "data-source"
 OUTPUT_FOLDER = "./final_reports"
 N_ROUNDS = 3  
+MAX_CONCURRENT_CALLS = int(os.getenv("DEBATE_MAX_CONCURRENCY", "4"))
+# Pathway persistence, processed hashes and checkpoints (benchmarks point this at a temp folder)
+STATE_FOLDER = os.getenv("DEBATE_STATE_FOLDER", "./pathway-state")
+PERSISTENCE_DIR = f"{STATE_FOLDER}/pathway"
+DEFAULT_TICKER = "AAPL"
+REPORT_TYPES = ["fundamentals", "market", "news", "sentiment"]
+# A debate ending in ERROR is re-run up to DEBATE_MAX_RETRIES times, waiting
+# DEBATE_RETRY_BACKOFF_S and doubling the wait after each failure
+MAX_DEBATE_RETRIES = int(os.getenv("DEBATE_MAX_RETRIES", "3"))
+RETRY_BACKOFF_S = float(os.getenv("DEBATE_RETRY_BACKOFF_S", "30"))
 load_dotenv()
 
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# ----------------------------
-# MODEL SETUP
-# ----------------------------
-chat_model = llms.OpenAIChat(
-    model="gpt-4o-mini",
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+# Combined hashes whose debate finished; survives restarts next to Pathway's own state
+processed_hashes = ProcessedHashes(f"{STATE_FOLDER}/processed_hashes.txt")
+
+# Per-ticker debounce: a debate starts once a ticker's reports sit still for
+# QUIET_WINDOW_S, and a newer combined hash cancels the ticker's running debate
+coalescer = ChangeCoalescer(QUIET_WINDOW_S)
+
+# Completed turns per ticker and combined hash, so a restarted debate resumes
+# where it stopped; keyed on every setting that shapes a prompt too, so changing
+# them starts afresh
+checkpoints = CheckpointStore(f"{STATE_FOLDER}/checkpoints")
+CHECKPOINT_CONFIG = {
+    "n_rounds": N_ROUNDS, "round_mode": ROUND_MODE, "min_rounds": MIN_ROUNDS,
+    "max_rounds": MAX_ROUNDS, "novelty_threshold": NOVELTY_THRESHOLD,
+    "routing": router.policy, "routes": router.layers[1],
+    "history": HISTORY_STRATEGY, "retrieval": RETRIEVAL_ENABLED, "top_k": TOP_K,
+    "normalize": NORMALIZE_ENABLED,
+}
 
 # ----------------------------
 # SYSTEM PROMPTS
@@ -111,14 +146,21 @@ Your report should include:
 Do NOT provide any investment recommendation (BUY/SELL/HOLD). Focus purely on analyzing and documenting the bull case."""
 
 # ----------------------------
-# PATHWAY UDF FOR LLM CALLS
+# LLM CALLS
 # ----------------------------
-def execute_debate_round(fundamentals, market, news, sentiment, history, bear_message, round_num):
-    """Execute a single debate round using Pathway"""
-    # Bull's turn
-    bull_prompt = [
-        {"role": "system", "content": BULL_SYSTEM_PROMPT},
-        {"role": "user", "content": f"""Market Research Report:
+def build_turn_prompt(side, fundamentals, market, news, sentiment, history, opponent_message, round_num, strategy=HISTORY_STRATEGY, context=None):
+    """Messages for one Bull or Bear turn.
+
+    With ``context`` (retrieved report excerpts) the turn gets those
+    instead of the four full reports.
+    """
+    system_prompt = BULL_SYSTEM_PROMPT if side == "Bull" else BEAR_SYSTEM_PROMPT
+    opponent = "bear" if side == "Bull" else "bull"
+    if context is not None:
+        evidence = f"""Report excerpts most relevant to the last {opponent} argument:
+{context}"""
+    else:
+        evidence = f"""Market Research Report:
 {market}
 
 Social Media Sentiment Report:
@@ -128,238 +170,615 @@ World Affairs News:
 {news}
 
 Company Fundamentals Report:
-{fundamentals}
+{fundamentals}"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"""{evidence}
 
 Conversation history of the debate:
-{json.dumps(history)}
+{render_history(history, strategy)}
 
 Round {round_num}:
-Last bear argument: {bear_message}
+Last {opponent} argument: {opponent_message}
 
-Your turn to argue as the Bull Analyst."""}
+Your turn to argue as the {side} Analyst."""}
     ]
-    
-    bull_table = pw.debug.table_from_pandas(pd.DataFrame({"messages": [bull_prompt]}))
-    bull_response = bull_table.select(reply=chat_model(pw.this.messages))
-    bull_result = pw.debug.table_to_pandas(bull_response)
-    bull_reply = bull_result["reply"].iloc[0] if not bull_result.empty else ""
+
+async def turn_context(fundamentals, market, news, sentiment, opponent_message):
+    """Top-k report excerpts for a turn answering ``opponent_message``; None sends the full reports.
+
+    The index is built once per report set (see report_retrieval), off the event loop.
+    """
+    if not RETRIEVAL_ENABLED:
+        return None
+    return await asyncio.to_thread(
+        lambda: report_index(fundamentals, market, news, sentiment).context(opponent_message, TOP_K)
+    )
+
+async def execute_debate_round(fundamentals, market, news, sentiment, history, bear_message, round_num, report_hashes=(), stream=None, checkpoint=None, final_round=False):
+    """Execute a single debate round on the shared LLM client, streaming turns into ``stream``.
+
+    Turns already in ``checkpoint`` are reused; new ones are added to it.
+    Each turn runs on its model_router route for the role and round.
+    """
+    # Bull's turn
+    bull_on_token = stream.turn("bull", round_num) if stream else None
+    async def bull_call():
+        context = await turn_context(fundamentals, market, news, sentiment, bear_message)
+        bull_prompt = build_turn_prompt("Bull", fundamentals, market, news, sentiment, history, bear_message, round_num, context=context)
+        return await achat(bull_prompt, cache_parts={
+            "report_hashes": report_hashes, "history": [HISTORY_STRATEGY, context, history, bear_message], "role": "bull", "round_num": round_num
+        }, on_token=bull_on_token, **route("bull", round_num, final_round))
+
+    with metric_labels(role="bull", round=round_num):
+        bull_reply = await resume_or_run(checkpoint, f"round_{round_num}.bull", bull_on_token, bull_call)
     
     # Bear's turn
-    bear_prompt = [
-        {"role": "system", "content": BEAR_SYSTEM_PROMPT},
-        {"role": "user", "content": f"""Market Research Report:
-{market}
+    bear_on_token = stream.turn("bear", round_num) if stream else None
+    async def bear_call():
+        context = await turn_context(fundamentals, market, news, sentiment, bull_reply)
+        bear_prompt = build_turn_prompt("Bear", fundamentals, market, news, sentiment, history, bull_reply, round_num, context=context)
+        return await achat(bear_prompt, cache_parts={
+            "report_hashes": report_hashes, "history": [HISTORY_STRATEGY, context, history, bull_reply], "role": "bear", "round_num": round_num
+        }, on_token=bear_on_token, **route("bear", round_num, final_round))
+
+    with metric_labels(role="bear", round=round_num):
+        bear_reply = await resume_or_run(checkpoint, f"round_{round_num}.bear", bear_on_token, bear_call)
+    
+    return bull_reply, bear_reply
 
-Social Media Sentiment Report:
-{sentiment}
+def debate_history(results) -> list:
+    """Rounds that actually ran, in order (adaptive debates skip the tail)"""
+    return sorted(
+        (value for name, value in results.items() if name.startswith("round_") and value),
+        key=lambda item: item["round"]
+    )
 
-World Affairs News:
-{news}
+def format_transcript(history) -> str:
+    """Render completed rounds as the plain-text debate transcript"""
+    return "\n\n".join([
+        f"Round {item['round']}:\nBull: {item['bull']}\nBear: {item['bear']}" 
+        for item in history
+    ])
 
-Company Fundamentals Report:
-{fundamentals}
+def build_summary_prompt(system_prompt, case, fundamentals, market, news, sentiment, debate_text):
+    """Summarizer messages for the bear or bull case"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"""Review the following debate and create a comprehensive {case} Case Summary Report.
 
-Conversation history of the debate:
-{json.dumps(history)}
+Available Research:
+Market Research Report: {market[:300]}...
+Social Media Sentiment Report: {sentiment[:300]}...
+World Affairs News: {news[:300]}...
+Company Fundamentals Report: {fundamentals[:300]}...
 
-Round {round_num}:
-Last bull argument: {bull_reply}
+Debate Transcript:
+{debate_text}
 
-Your turn to argue as the Bear Analyst."""}
+Create a detailed {case.lower()} case summary following the structured format provided in your instructions."""}
     ]
-    
-    bear_table = pw.debug.table_from_pandas(pd.DataFrame({"messages": [bear_prompt]}))
-    bear_response = bear_table.select(reply=chat_model(pw.this.messages))
-    bear_result = pw.debug.table_to_pandas(bear_response)
-    bear_reply = bear_result["reply"].iloc[0] if not bear_result.empty else ""
-    
-    return bull_reply, bear_reply
+
+def build_debate_graph(fundamentals, market, news, sentiment, n_rounds=N_ROUNDS, stream=None, checkpoint=None) -> DebateGraph:
+    """Debate as a DAG: round_1 -> ... -> round_N -> stop -> {bear,bull}_summary -> trader.
+
+    Every node resumes from / records into ``checkpoint`` when one is given.
+    In adaptive mode (see debate_convergence) rounds after convergence
+    return None without calling the LLM; "stop" records how many rounds ran
+    and why.
+    """
+    graph = DebateGraph()
+    opening = "Let's begin. I believe there are significant risks investors should be aware of."
+    tracker = ConvergenceTracker(n_rounds)
+    rounds = [f"round_{r}" for r in range(1, tracker.max_rounds + 1)]
+    report_hashes = [hash_text(report) for report in (fundamentals, market, news, sentiment)]
+
+    def round_node(round_num):
+        async def run(results):
+            if tracker.stopped:
+                return None
+            history = [results[name] for name in rounds[:round_num - 1]]
+            bear_message = history[-1]["bear"] if history else opening
+            print(f"\n📍 Round {round_num}")
+            print("-" * 50)
+            print("🐂 Bull Analyst thinking...")
+            print("🐻 Bear Analyst thinking...")
+            bull_reply, bear_reply = await execute_debate_round(
+                fundamentals, market, news, sentiment,
+                history, bear_message, round_num, report_hashes, stream, checkpoint,
+                final_round=round_num == tracker.max_rounds
+            )
+            if stream is None or not stream.echo:
+                print(f"Bull: {bull_reply[:100]}...")
+                print(f"Bear: {bear_reply[:100]}...")
+            verdict = await asyncio.to_thread(tracker.observe, bull_reply, bear_reply)
+            if round_num > 1:
+                print(f"🧭 Novelty: bull {verdict['novelty']['bull']:.2f}, bear {verdict['novelty']['bear']:.2f}")
+            return {"round": round_num, "bull": bull_reply, "bear": bear_reply}
+        return run
+
+    def summary_node(system_prompt, case):
+        async def run(results):
+            print(f"\n📊 Generating {case.lower()} case summary...")
+            debate_text = format_transcript(debate_history(results))
+            role = f"{case.lower()}_summarizer"
+            on_token = stream.sink(role, transcript=False) if stream else None
+            with metric_labels(role=role):
+                summary = await resume_or_run(checkpoint, f"{case.lower()}_summary", on_token, lambda: achat(build_summary_prompt(
+                    system_prompt, case, fundamentals, market, news, sentiment, debate_text
+                ), cache_parts={
+                    "report_hashes": report_hashes, "history": debate_text, "role": role
+                }, on_token=on_token, **route(role)))
+            print(f"✅ {case} summary generated ({len(summary)} characters)")
+            return summary
+        return run
+
+    async def trader_node(results):
+        print("\n💼 Trader Agent deciding...")
+        on_token = stream.sink("trader", transcript=False) if stream else None
+        decision = await decide(
+            results["bull_summary"], results["bear_summary"],
+            format_situation(market, sentiment, news, fundamentals),
+            checkpoint, on_token
+        )
+        print(f"✅ Trader decision generated ({len(decision)} characters)")
+        return decision
+
+    async def stop_node(results):
+        reason = describe_stop(tracker.rounds, tracker.verdict)
+        print(f"\n🛑 Debate stopped: {reason}")
+        return {"rounds": tracker.rounds, "reason": tracker.verdict["stop"], "detail": reason}
+
+    for i, name in enumerate(rounds):
+        graph.add(name, round_node(i + 1), deps=rounds[i - 1:i])
+    graph.add("stop", stop_node, deps=rounds[-1:])
+    graph.add("bear_summary", summary_node(BEAR_SUMMARIZER_PROMPT, "Bear"), deps=["stop"])
+    graph.add("bull_summary", summary_node(BULL_SUMMARIZER_PROMPT, "Bull"), deps=["stop"])
+    graph.add("trader", trader_node, deps=["bear_summary", "bull_summary"])
+    return graph
 
 # ----------------------------
 # PATHWAY TRANSFORMATION FUNCTIONS
 # ----------------------------
+def content_hash(data: str) -> str:
+    """md5 of a report's content, "" for an empty report"""
+    return hashlib.md5(data.encode()).hexdigest() if data else ""
+
+def read_report(path) -> str:
+    """A report file as plaintext_by_file reads it (surrounding whitespace stripped), so hashes match the pipeline's"""
+    return Path(path).read_text().strip()
+
+def combined_report_hash(fundamentals: str, market: str, news: str, sentiment: str) -> str:
+    """Same combined_hash the pipeline computes, for debates started outside it"""
+    return "-".join(content_hash(report) for report in (fundamentals, market, news, sentiment))
+
 @pw.udf
 def compute_hash(data: str) -> str:
     """Compute hash of file content to detect actual changes"""
-    import hashlib
-    return hashlib.md5(data.encode()).hexdigest() if data else ""
+    return content_hash(data)
 
 @pw.udf
-def has_four_files(filenames_tuple) -> bool:
-    """Check if we have all 4 required files"""
-    required = {"fundamentals_report.md", "market_report.md", "news_report.md", "sentiment_report.md"}
-    return required.issubset(set(filenames_tuple)) if filenames_tuple else False
+def report_ticker(path: str) -> str:
+    """Ticker of a report: its sub-folder name, or DEFAULT_TICKER for top-level files"""
+    parent = Path(path).parent.name
+    return DEFAULT_TICKER if parent == Path(DATA_FOLDER).name else parent
 
 @pw.udf
-def get_file_by_name(filenames_tuple, data_tuple, target_filename: str) -> str:
-    """Extract specific file content by filename"""
-    if not filenames_tuple or not data_tuple:
-        return ""
-    try:
-        file_dict = dict(zip(filenames_tuple, data_tuple))
-        return file_dict.get(target_filename, "")
-    except:
-        return ""
+def report_type(path: str) -> str:
+    """Report slot from a filename like market_report.md, or "" for other files (.txt, .bak, ...)"""
+    name = Path(path).name
+    kind = name[:-len("_report.md")] if name.endswith("_report.md") else ""
+    return kind if kind in REPORT_TYPES else ""
 
 @pw.udf
-def process_debate_data(fundamentals: str, market: str, news: str, sentiment: str) -> str:
-    """Main debate processing function that runs in Pathway pipeline"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    print(f"\n{'='*80}")
-    print(f"🔔 DEBATE TRIGGERED at {timestamp}")
-    print(f"{'='*80}")
-    
-    try:
-        # Execute debate
-        history = []
-        bear_message = "Let's begin. I believe there are significant risks investors should be aware of."
-        
-        for round_num in range(1, N_ROUNDS + 1):
-            print(f"\n📍 Round {round_num}")
-            print("-" * 50)
-            print("🐂 Bull Analyst thinking...")
-            print("🐻 Bear Analyst thinking...")
-            
-            bull_reply, bear_reply = execute_debate_round(
-                fundamentals, market, news, sentiment, 
-                history, bear_message, round_num
-            )
-            
-            print(f"Bull: {bull_reply[:100]}...")
-            print(f"Bear: {bear_reply[:100]}...")
-            
-            history.append({"round": round_num, "bull": bull_reply, "bear": bear_reply})
-            bear_message = bear_reply
-        
-        print("\n✅ Debate rounds completed!")
-        
-        # Create debate transcript
-        print("📝 Creating debate transcript...")
-        debate_text = "\n\n".join([
-            f"Round {item['round']}:\nBull: {item['bull']}\nBear: {item['bear']}" 
-            for item in history
-        ])
-        print(f"✅ Transcript created ({len(debate_text)} characters)")
-        
-        # Generate bear summary
-        print("\n📊 Generating bear case summary...")
-        
-        bear_summary_prompt = [
-            {"role": "system", "content": BEAR_SUMMARIZER_PROMPT},
-            {"role": "user", "content": f"""Review the following debate and create a comprehensive Bear Case Summary Report.
+def in_ticker_folder(path: str) -> int:
+    """1 for a file in a ticker sub-folder, 0 for a top-level file"""
+    return int(Path(path).parent.name != Path(DATA_FOLDER).name)
 
-Available Research:
-Market Research Report: {market[:300]}...
-Social Media Sentiment Report: {sentiment[:300]}...
-World Affairs News: {news[:300]}...
-Company Fundamentals Report: {fundamentals[:300]}...
+def warn_shadowed(key, row, time, is_addition):
+    if is_addition:
+        print(f"⚠️  {row['copies']} files fill {row['ticker']}/{row['report_type']}_report.md; "
+              f"using {row['path']}")
 
-Debate Transcript:
-{debate_text}
+@pw.udf(deterministic=True)
+def normalize_text(content_hash: str, data: str) -> str:
+    """Cleaned report text, computed once per content hash (see report_normalizer)"""
+    return normalize_cached(content_hash, data)
+
+@pw.udf
+def report_token_stats(ticker: str, report_type: str, content_hash: str, raw: str, cleaned: str) -> pw.Json:
+    """Tokens saved by normalizing one report version"""
+    stats = normalization_stats(raw, cleaned)
+    print(f"🧹 {ticker}/{report_type}_report.md: {stats['raw_tokens']:,} -> {stats['clean_tokens']:,} tokens "
+          f"(-{stats['tokens_saved']:,}, {stats['saved_pct']}%)")
+    return pw.Json(stats)
+
+def build_report_rows(files: pw.Table) -> pw.Table:
+    """One row per (ticker, report_type) slot, with cleaned text.
+
+    An edit re-hashes and re-normalizes only that file; ``data`` holds the
+    cleaned text every downstream prompt uses, ``raw`` the file as read.
+    """
+    files = files.select(
+        data=pw.this.data,
+        path=pw.this._metadata["path"].as_str()
+    ).select(
+        pw.this.data,
+        pw.this.path,
+        ticker=report_ticker(pw.this.path),
+        report_type=report_type(pw.this.path),
+        nested=in_ticker_folder(pw.this.path)
+    ).filter(pw.this.report_type != "")
+    # Top-level files and a data-source/<DEFAULT_TICKER>/ folder fill the same
+    # slots; keep one file per slot (the ticker folder's) and warn instead of
+    # letting the duplicate key stop the engine
+    slots = files.groupby(pw.this.ticker, pw.this.report_type).reduce(
+        pw.this.ticker,
+        pw.this.report_type,
+        chosen=pw.reducers.argmax(pw.this.nested),
+        copies=pw.reducers.count()
+    ).select(
+        pw.this.ticker,
+        pw.this.report_type,
+        pw.this.copies,
+        path=files.ix(pw.this.chosen).path,
+        data=files.ix(pw.this.chosen).data
+    )
+    pw.io.subscribe(slots.filter(pw.this.copies > 1), on_change=warn_shadowed)
+    reports = slots.select(
+        pw.this.ticker,
+        pw.this.report_type,
+        pw.this.data,
+        content_hash=compute_hash(pw.this.data)
+    )
+    return reports.select(
+        pw.this.ticker,
+        pw.this.report_type,
+        pw.this.content_hash,
+        raw=pw.this.data,
+        data=normalize_text(pw.this.content_hash, pw.this.data)
+    )
 
-Create a detailed bear case summary following the structured format provided in your instructions."""}
-        ]
-        
-        bear_summary_table = pw.debug.table_from_pandas(pd.DataFrame({"messages": [bear_summary_prompt]}))
-        bear_summary_response = bear_summary_table.select(summary=chat_model(pw.this.messages))
-        bear_summary_result = pw.debug.table_to_pandas(bear_summary_response)
-        bear_summary = bear_summary_result["summary"].iloc[0] if not bear_summary_result.empty else "Bear summary completed"
-        print(f"✅ Bear summary generated ({len(bear_summary)} characters)")
-        
-        print("\n📊 Generating bull case summary...")
-        
-        bull_summary_prompt = [
-            {"role": "system", "content": BULL_SUMMARIZER_PROMPT},
-            {"role": "user", "content": f"""Review the following debate and create a comprehensive Bull Case Summary Report.
+def build_normalization_stats(reports: pw.Table) -> pw.Table:
+    """Tokens before/after normalization for every report version"""
+    return reports.select(
+        pw.this.ticker,
+        pw.this.report_type,
+        pw.this.content_hash,
+        stats=report_token_stats(pw.this.ticker, pw.this.report_type, pw.this.content_hash, pw.this.raw, pw.this.data)
+    )
 
-Available Research:
-Market Research Report: {market[:300]}...
-Social Media Sentiment Report: {sentiment[:300]}...
-World Affairs News: {news[:300]}...
-Company Fundamentals Report: {fundamentals[:300]}...
+def build_report_state(reports: pw.Table) -> pw.Table:
+    """One row per ticker holding its four (cleaned) reports and their hashes.
+
+    Rows come from build_report_rows, so an edit updates only that ticker's
+    row. Hashes are of the raw files.
+    """
+    # One table per slot, keyed by ticker, joined on that key
+    slots = {
+        kind: reports.filter(pw.this.report_type == kind).with_id_from(pw.this.ticker)
+        for kind in REPORT_TYPES
+    }
+    state = slots[REPORT_TYPES[0]].select(
+        pw.this.ticker,
+        **{REPORT_TYPES[0]: pw.this.data, f"{REPORT_TYPES[0]}_hash": pw.this.content_hash}
+    )
+    for kind in REPORT_TYPES[1:]:
+        slot = slots[kind]
+        state = state.join(slot, state.id == slot.id, id=state.id).select(
+            *pw.left,
+            **{kind: pw.right.data, f"{kind}_hash": pw.right.content_hash}
+        )
+    return state.select(
+        pw.this.ticker,
+        pw.this.fundamentals,
+        pw.this.market,
+        pw.this.news,
+        pw.this.sentiment,
+        combined_hash=pw.this.fundamentals_hash + "-" + pw.this.market_hash + "-" + pw.this.news_hash + "-" + pw.this.sentiment_hash
+    )
 
-Debate Transcript:
-{debate_text}
+@pw.udf
+def is_unprocessed(combined_hash: str) -> bool:
+    """Gate: only report sets whose debate has not completed yet reach the LLM stage"""
+    if combined_hash in processed_hashes:
+        print(f"⏭️  Skipping debate, content already processed ({combined_hash[:12]}...)")
+        return False
+    return True
 
-Create a detailed bull case summary following the structured format provided in your instructions."""}
-        ]
-        
-        bull_summary_table = pw.debug.table_from_pandas(pd.DataFrame({"messages": [bull_summary_prompt]}))
-        bull_summary_response = bull_summary_table.select(summary=chat_model(pw.this.messages))
-        bull_summary_result = pw.debug.table_to_pandas(bull_summary_response)
-        bull_summary = bull_summary_result["summary"].iloc[0] if not bull_summary_result.empty else "Bull summary completed"
-        print(f"✅ Bull summary generated ({len(bull_summary)} characters)")
-        
-        # Save separate files
-        clean_timestamp = timestamp.replace(':', '-').replace(' ', '_')
-        
-        print(f"\n💾 Saving files with timestamp: {clean_timestamp}")
-        
-        # Save debate transcript
-        debate_path = Path(OUTPUT_FOLDER) / f"debate.md"
-        debate_content = f"""# Stock Analysis Debate Transcript
+# ----------------------------
+# DEBATE EXECUTION
+# ----------------------------
+def discover_tickers(data_folder: str = DATA_FOLDER) -> dict:
+    """Map ticker -> report folder for every folder holding all four reports.
+
+    Top-level reports count as DEFAULT_TICKER; each data-source/<TICKER>/
+    sub-folder is its own ticker.
+    """
+    root = Path(data_folder)
+    candidates = [(DEFAULT_TICKER, root)] + [(d.name, d) for d in sorted(root.iterdir()) if d.is_dir()]
+    return {
+        ticker: folder for ticker, folder in candidates
+        if all((folder / f"{kind}_report.md").exists() for kind in REPORT_TYPES)
+    }
+
+def ticker_output_folder(ticker: str) -> Path:
+    """Per-ticker output folder, OUTPUT_FOLDER/<ticker>"""
+    folder = Path(OUTPUT_FOLDER) / ticker
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+async def run_debate(fundamentals: str, market: str, news: str, sentiment: str, ticker: str = DEFAULT_TICKER, subscriber=None, echo: bool = STREAM_TO_CONSOLE, combined_hash: str = "") -> dict:
+    """Run the debate graph for one ticker and save its reports under OUTPUT_FOLDER/<ticker>.
+
+    Turns stream into debate.md (and the console when ``echo``) as they are
+    generated; ``subscriber`` gets every token of every step. Completed turns
+    are checkpointed under the combined hash, so a rerun after a crash or
+    API error resumes from the last completed turn; it is discarded once
+    the trader's decision is saved. Returns the graph results by step name.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    output_folder = ticker_output_folder(ticker)
+    
+    print(f"\n{'='*80}")
+    print(f"🔔 DEBATE TRIGGERED for {ticker} at {timestamp}")
+    print(f"{'='*80}")
+    
+    checkpoint = checkpoints.open(combined_hash or combined_report_hash(fundamentals, market, news, sentiment), ticker, CHECKPOINT_CONFIG)
+    if len(checkpoint):
+        print(f"♻️  Resuming from checkpoint: {len(checkpoint)} completed step(s)")
+    
+    # Stream the transcript into debate.md while the debate runs
+    debate_path = output_folder / f"debate.md"
+    stream = DebateStream(debate_path, ticker, header=f"""# Stock Analysis Debate Transcript
 *Generated:* {timestamp}
 
 ---
 
-{debate_text}
-"""
-        debate_path.write_text(debate_content)
-        print(f"✅ Debate saved: {debate_path.absolute()}")
-        
-        # Save bear report
-        bear_path = Path(OUTPUT_FOLDER) / f"bear_report.md"
-        bear_content = f"""# Bear Case Summary Report
+""", echo=echo, subscriber=subscriber)
+    
+    # Execute debate graph: rounds run in order, summaries in parallel, then (optionally) the trader
+    try:
+        with metric_labels(ticker=ticker), collect_totals() as totals:
+            graph = build_debate_graph(fundamentals, market, news, sentiment, stream=stream, checkpoint=checkpoint)
+            results = await graph.run(MAX_CONCURRENT_CALLS)
+    finally:
+        # Off the loop: close() waits for the writer thread to catch up
+        await asyncio.to_thread(stream.close)
+    
+    history = debate_history(results)
+    debate_text = format_transcript(history)
+    bear_summary = results["bear_summary"]
+    bull_summary = results["bull_summary"]
+    stats = cache_stats()
+    print("\n✅ Debate graph completed!")
+    print(f"💾 Response cache: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} entries)")
+    print(f"💰 LLM usage: {totals['calls']} calls, {totals['prompt_tokens']:,} prompt + "
+          f"{totals['completion_tokens']:,} completion tokens, ${totals['cost_usd']:.4f}, {totals['llm_seconds']}s")
+    
+    # Save separate files
+    clean_timestamp = timestamp.replace(':', '-').replace(' ', '_')
+    
+    print(f"\n💾 Saving files with timestamp: {clean_timestamp}")
+    
+    # Debate transcript was streamed into place
+    print(f"✅ Debate saved: {debate_path.absolute()}")
+    
+    # Save bear report
+    bear_path = output_folder / f"bear_report.md"
+    bear_content = f"""# Bear Case Summary Report
 *Generated:* {timestamp}
 
 ---
 
 {bear_summary}
 """
-        bear_path.write_text(bear_content)
-        print(f"✅ Bear report saved: {bear_path.absolute()}")
-        
-        # Save bull report
-        bull_path = Path(OUTPUT_FOLDER) / f"bull_report.md"
-        bull_content = f"""# Bull Case Summary Report
+    bear_path.write_text(bear_content)
+    print(f"✅ Bear report saved: {bear_path.absolute()}")
+    
+    # Save bull report
+    bull_path = output_folder / f"bull_report.md"
+    bull_content = f"""# Bull Case Summary Report
 *Generated:* {timestamp}
 
 ---
 
 {bull_summary}
 """
-        bull_path.write_text(bull_content)
-        print(f"✅ Bull report saved: {bull_path.absolute()}")
-        
-        print(f"\n🎉 All 3 files generated successfully!")
-        print(f"{'='*80}\n")
-        
-        return f"Reports generated: {debate_path.name}, {bear_path.name}, {bull_path.name}"
-        
-    except Exception as e:
-        error_msg = f"ERROR: {str(e)}"
-        print(f"❌ {error_msg}")
-        import traceback
-        traceback.print_exc()
-        return error_msg
+    bull_path.write_text(bull_content)
+    print(f"✅ Bull report saved: {bull_path.absolute()}")
+    
+    # Save trader decision
+    trader_path = write_trader_report(output_folder, results["trader"])
+    print(f"✅ Trader decision saved: {trader_path.absolute()}")
+    checkpoint.discard()
+    
+    print(f"\n🎉 All 4 files generated successfully!")
+    print(f"{'='*80}\n")
+    
+    return results
+
+async def process_debate_data(fundamentals: str, market: str, news: str, sentiment: str, combined_hash: str = "", ticker: str = DEFAULT_TICKER) -> dict:
+    """Debate one report set once its ticker is quiet; returns the debate_results row.
+
+    A newer combined hash for the same ticker cancels this run (see ``coalescer``).
+    The trader decides as soon as the summaries are in, inside the same run,
+    so it happens once per dispatched debate (never again when Pathway
+    replays persisted rows). The row carries the decision, how many rounds
+    ran and why the debate stopped, and the per-debate LLM totals under
+    "metrics". The combined hash counts as processed only once the decision
+    is saved, so a crash before that resumes from the checkpoint.
+    """
+    decision = stop = None
+    with collect_totals() as totals:
+        try:
+            results = await coalescer.run(
+                ticker, combined_hash,
+                lambda: run_debate(fundamentals, market, news, sentiment, ticker, combined_hash=combined_hash)
+            )
+            summary = "Reports generated: debate.md, bear_report.md, bull_report.md, Trader_agent_*.txt"
+            stop = {"rounds": results["stop"]["rounds"], "stop_reason": results["stop"]["detail"]}
+            decision = {"decision": results["trader"], "proposal": parse_proposal(results["trader"])}
+            if combined_hash:
+                processed_hashes.add(combined_hash)
+
+        except Superseded as e:
+            summary = f"SUPERSEDED: {e}"
+            print(f"⏭️  Debate superseded for {ticker} ({combined_hash[:12]}...)")
+
+        except Exception as e:
+            summary = f"ERROR: {str(e)}"
+            print(f"❌ {summary}")
+            import traceback
+            traceback.print_exc()
+    return debate_row(ticker, combined_hash, summary, decision, stop, totals)
+
+def debate_row(ticker: str, combined_hash: str, summary: str, decision: dict = None, stop: dict = None, totals: dict = None) -> dict:
+    """One debate_results row (see DebateResultSchema); defaults fill a failed debate's row"""
+    return {
+        "ticker": ticker,
+        "combined_hash": combined_hash,
+        "summary": summary,
+        **(decision or {"decision": "", "proposal": ""}),
+        **(stop or {"rounds": 0, "stop_reason": ""}),
+        "metrics": pw.Json(totals or {}),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+# ----------------------------
+# DEBATE DISPATCH
+# ----------------------------
+# Debates run on their own event loop thread instead of inside a blocking UDF,
+# so the engine keeps ingesting report changes while a debate is in flight and
+# a newer report state can supersede it.
+_debate_loop = None
+_debate_loop_lock = threading.Lock()
+# Combined hashes dispatched by this process whose debate hasn't finished yet
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+def get_debate_loop() -> asyncio.AbstractEventLoop:
+    global _debate_loop
+    with _debate_loop_lock:
+        if _debate_loop is None:
+            _debate_loop = asyncio.new_event_loop()
+            threading.Thread(target=_debate_loop.run_forever, name="debate-loop", daemon=True).start()
+    return _debate_loop
+
+class DebateResultSchema(pw.Schema):
+    ticker: str
+    combined_hash: str
+    summary: str
+    decision: str
+    proposal: str
+    rounds: int
+    stop_reason: str
+    metrics: pw.Json
+    timestamp: str
+
+class DebateResults(pw.io.python.ConnectorSubject):
+    """Feeds finished debates back into the pipeline as an append-only table"""
+
+    def __init__(self):
+        super().__init__()
+        self._rows = queue.Queue()
+
+    def put(self, row: dict):
+        self._rows.put(row)
+
+    def run(self):
+        while True:
+            self.next(**self._rows.get())
+
+async def debate_with_retries(fundamentals: str, market: str, news: str, sentiment: str, combined_hash: str, ticker: str) -> dict:
+    """process_debate_data, re-run with exponential backoff while it ends in ERROR.
+
+    Each retry resumes from the debate's checkpoint. Gives up after
+    MAX_DEBATE_RETRIES, or once the ticker has newer reports or the hash
+    got processed meanwhile; returns the last attempt's row.
+    """
+    attempt = 0
+    while True:
+        row = await process_debate_data(fundamentals, market, news, sentiment, combined_hash, ticker)
+        if not row["summary"].startswith("ERROR:") or attempt >= MAX_DEBATE_RETRIES:
+            return row
+        delay = RETRY_BACKOFF_S * 2 ** attempt
+        attempt += 1
+        print(f"🔁 Retrying debate for {ticker} in {delay:g}s (retry {attempt}/{MAX_DEBATE_RETRIES})")
+        await asyncio.sleep(delay)
+        if coalescer.is_stale(ticker, combined_hash) or combined_hash in processed_hashes:
+            return row
+
+def finished_row(future, ticker: str, combined_hash: str) -> dict:
+    """Row of a finished debate future; an ERROR row if it was cancelled or raised"""
+    if future.cancelled():
+        summary = "ERROR: debate cancelled"
+    elif future.exception() is not None:
+        summary = f"ERROR: {future.exception()!r}"
+    else:
+        return future.result()
+    print(f"❌ Debate for {ticker} ({combined_hash[:12]}...) ended without a result: {summary}")
+    return debate_row(ticker, combined_hash, summary)
+
+def start_debate(ticker: str, combined_hash: str, reports: dict, results: DebateResults):
+    """Debate ``reports`` on the debate loop unless this hash is processed or already in flight"""
+    with _in_flight_lock:
+        if combined_hash in _in_flight or combined_hash in processed_hashes:
+            return
+        _in_flight.add(combined_hash)
+    # Cancel the ticker's stale in-flight debate right away
+    coalescer.submit(ticker, combined_hash)
+    future = asyncio.run_coroutine_threadsafe(debate_with_retries(
+        reports["fundamentals"], reports["market"], reports["news"], reports["sentiment"],
+        combined_hash, ticker
+    ), get_debate_loop())
+
+    def done(f):
+        with _in_flight_lock:
+            _in_flight.discard(combined_hash)
+        results.put(finished_row(f, ticker, combined_hash))
+    future.add_done_callback(done)
+
+def dispatch_debates(pending: pw.Table, results: DebateResults):
+    """Start a debate for every new pending row; finished rows go to ``results``"""
+    def on_change(key, row, time, is_addition):
+        if not is_addition:
+            return
+        start_debate(row["ticker"], row["combined_hash"], row, results)
+
+    pw.io.subscribe(pending, on_change=on_change)
+
+def resume_pending(results: DebateResults, data_folder: str = DATA_FOLDER):
+    """Dispatch every complete report set on disk whose debate hasn't completed.
+
+    On restart Pathway restores ``pending`` from its persisted state without
+    calling on_change again, so a debate that crashed or never finished
+    would wait for the next edit. Each one resumes from its checkpoint;
+    hashes that on_change also emits are only dispatched once.
+    """
+    for ticker, folder in discover_tickers(data_folder).items():
+        raw = {kind: read_report(folder / f"{kind}_report.md") for kind in REPORT_TYPES}
+        combined_hash = combined_report_hash(*(raw[kind] for kind in REPORT_TYPES))
+        if combined_hash in processed_hashes:
+            continue
+        print(f"♻️  Dispatching unfinished debate for {ticker} ({combined_hash[:12]}...)")
+        reports = {kind: normalize_cached(content_hash(text), text) for kind, text in raw.items()}
+        start_debate(ticker, combined_hash, reports, results)
 
 # ----------------------------
 # MAIN PATHWAY PIPELINE
 # ----------------------------
-if _name_ == "_main_":
+if __name__ == "__main__":
     print("="*80)
     print("🚀 PATHWAY STOCK DEBATE SYSTEM - FILENAME-BASED")
     print("="*80)
     
     # Check for required files
-    required_files = ["fundamentals_report.md", "market_report.md", "news_report.md", "sentiment_report.md"]
-    txt_files = [Path(DATA_FOLDER) / f for f in required_files]
-    missing = [f.name for f in txt_files if not f.exists()]
+    tickers = discover_tickers(DATA_FOLDER)
     
-    if missing:
+    if not tickers:
         raise ValueError(
-            f"Missing required files in '{DATA_FOLDER}' folder: {', '.join(missing)}\n"
+            f"No complete report set in '{DATA_FOLDER}' folder (or its ticker sub-folders).\n"
             f"Please ensure you have:\n"
             "1. fundamentals_report.md\n"
             "2. market_report.md\n"
@@ -367,123 +786,84 @@ if _name_ == "_main_":
             "4. sentiment_report.md"
         )
     
-    print(f"📁 Found all required report files")
+    print(f"📁 Found complete report sets for: {', '.join(tickers)}")
     print(f"📊 Setting up Pathway streaming pipeline")
     print("="*80)
     
-    # PATHWAY STREAMING INPUT - Read each file separately and tag with filename
-    fundamentals_stream = pw.io.fs.read(
-        path=f"{DATA_FOLDER}/fundamentals_report.md",
-        format="plaintext",
-        mode="streaming",
-        autocommit_duration_ms=3000
-    ).select(
-        data=pw.this.data,
-        filename=pw.apply(lambda x: "fundamentals_report.md", pw.this.data),
-        content_hash=compute_hash(pw.this.data)
-    )
-    
-    market_stream = pw.io.fs.read(
-        path=f"{DATA_FOLDER}/market_report.md",
-        format="plaintext",
+    # PATHWAY STREAMING INPUT - One row per report file, updated in place on edits
+    files = pw.io.fs.read(
+        path=DATA_FOLDER,
+        format="plaintext_by_file",
         mode="streaming",
-        autocommit_duration_ms=3000
-    ).select(
-        data=pw.this.data,
-        filename=pw.apply(lambda x: "market_report.md", pw.this.data),
-        content_hash=compute_hash(pw.this.data)
-    )
-    
-    news_stream = pw.io.fs.read(
-        path=f"{DATA_FOLDER}/news_report.md",
-        format="plaintext",
-        mode="streaming",
-        autocommit_duration_ms=3000
-    ).select(
-        data=pw.this.data,
-        filename=pw.apply(lambda x: "news_report.md", pw.this.data),
-        content_hash=compute_hash(pw.this.data)
+        with_metadata=True,
+        autocommit_duration_ms=3000,
+        name="reports"
     )
     
-    sentiment_stream = pw.io.fs.read(
-        path=f"{DATA_FOLDER}/sentiment_report.md",
-        format="plaintext",
-        mode="streaming",
-        autocommit_duration_ms=3000
-    ).select(
-        data=pw.this.data,
-        filename=pw.apply(lambda x: "sentiment_report.md", pw.this.data),
-        content_hash=compute_hash(pw.this.data)
+    # PATHWAY NORMALIZE - Keyed per (ticker, report_type), cleaned once per content hash
+    reports = build_report_rows(files)
+    pw.io.jsonlines.write(
+        build_normalization_stats(reports),
+        f"{OUTPUT_FOLDER}/report_normalization.jsonlines"
     )
     
-    # Concatenate all streams
-    files = pw.Table.concat_reindex(fundamentals_stream, market_stream, news_stream, sentiment_stream)
-    
-    # PATHWAY GROUPBY - Group all files together by a constant key
-    files_with_key = files.select(
-        pw.this.data,
-        pw.this.filename,
-        pw.this.content_hash,
-        group_key=pw.apply(lambda x: "all_files", pw.this.data)
-    )
+    # PATHWAY STATE - Joined into one row per ticker
+    results = build_report_state(reports)
     
-    # PATHWAY REDUCE - Collect all file data together with filenames
-    grouped = files_with_key.groupby(pw.this.group_key).reduce(
-        pw.this.group_key,
-        filenames=pw.reducers.tuple(pw.this.filename),
-        files_data=pw.reducers.tuple(pw.this.data),
-        hashes=pw.reducers.tuple(pw.this.content_hash)
+    # PATHWAY DEDUPLICATE - One row per content hash, so re-saving a file
+    # with identical content nets out before the LLM stage
+    unique = results.groupby(pw.this.combined_hash).reduce(
+        pw.this.combined_hash,
+        ticker=pw.reducers.any(pw.this.ticker),
+        fundamentals=pw.reducers.any(pw.this.fundamentals),
+        market=pw.reducers.any(pw.this.market),
+        news=pw.reducers.any(pw.this.news),
+        sentiment=pw.reducers.any(pw.this.sentiment)
     )
     
-    # PATHWAY FILTER - Only process when we have all 4 required files
-    grouped = grouped.filter(has_four_files(pw.this.filenames))
+    # PATHWAY FILTER - Gate out hashes already debated (also across restarts)
+    pending = unique.filter(is_unprocessed(pw.this.combined_hash))
     
-    # PATHWAY SELECT - Extract individual reports by filename
-    results = grouped.select(
-        fundamentals=get_file_by_name(pw.this.filenames, pw.this.files_data, "fundamentals_report.md"),
-        market=get_file_by_name(pw.this.filenames, pw.this.files_data, "market_report.md"),
-        news=get_file_by_name(pw.this.filenames, pw.this.files_data, "news_report.md"),
-        sentiment=get_file_by_name(pw.this.filenames, pw.this.files_data, "sentiment_report.md"),
-        combined_hash=pw.apply(lambda h: "-".join(sorted(h)), pw.this.hashes)
-    )
+    # PATHWAY SUBSCRIBE - Run the debate (only for new content) off the engine thread
+    results_subject = DebateResults()
+    dispatch_debates(pending, results_subject)
+    resume_pending(results_subject)
     
-    # PATHWAY UDF - Run the debate (only when hash changes)
-    debate_results = results.select(
-        pw.this.combined_hash,
-        summary=process_debate_data(
-            pw.this.fundamentals,
-            pw.this.market,
-            pw.this.news,
-            pw.this.sentiment
-        ),
-        timestamp=pw.apply(lambda x: datetime.now().isoformat(), pw.this.combined_hash)
-    )
-    
-    # PATHWAY OUTPUT - Write results using deduplicate to prevent re-runs on same content
-    # Group by hash and keep only the first occurrence
-    deduplicated = debate_results.groupby(pw.this.combined_hash).reduce(
-        pw.this.combined_hash,
-        summary=pw.reducers.argmin(pw.this.timestamp, pw.this.summary),
-        timestamp=pw.reducers.min(pw.this.timestamp)
+    # Finished debates (with the trader's decision and per-debate LLM totals) come back as a table
+    debate_results = pw.io.python.read(
+        results_subject,
+        schema=DebateResultSchema,
+        autocommit_duration_ms=1000,
+        name="debate_results"
     )
     
     pw.io.jsonlines.write(
-        deduplicated,
+        debate_results,
         f"{OUTPUT_FOLDER}/debate_results.jsonlines"
     )
     
     print("\n💡 Pathway pipeline configured:")
-    print("  ├─ Input: 4 separate file streams (filename-tagged)")
-    print("  ├─ Transform: Content hashing for change detection")
-    print("  ├─ Concat: Merge all streams with reindexing")
-    print("  ├─ Group: Aggregate files by constant key")
-    print("  ├─ Filter: Only process when all 4 files present")
-    print("  ├─ Extract: Get files by explicit name matching")
-    print("  ├─ Process: Run debate via UDF")
-    print("  ├─ Deduplicate: Skip if content unchanged")
-    print("  └─ Output: Write results to JSONL")
+    print("  ├─ Input: One file stream, one row per report file")
+    print("  ├─ Key: Upsert rows by (ticker, report_type)")
+    print("  ├─ Transform: Content hashing and normalization per changed file")
+    print("  ├─ Join: One row per ticker once all 4 reports exist")
+    print("  ├─ Deduplicate: One row per combined hash")
+    print("  ├─ Gate: Skip hashes already debated (persisted)")
+    print("  ├─ Resume: Re-dispatch unfinished report sets found on disk at startup")
+    print(f"  ├─ Coalesce: Wait {QUIET_WINDOW_S:g}s of quiet per ticker, cancel stale debates")
+    print("  ├─ Process: Run debate on the debate loop, off the engine thread")
+    print("  ├─ Trader: Decide BUY/HOLD/SELL as soon as the summaries are in")
+    print("  └─ Output: Write results (with per-debate LLM totals) to JSONL")
+    print(f"📏 LLM call spans: {METRICS_PATH}")
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+        print(f"📈 Prometheus metrics: http://localhost:{METRICS_PORT}/metrics")
     print("\n🔄 Edit any required .md file to trigger debate")
     print("🛑 Press Ctrl+C to stop\n")
     
-    # RUN PATHWAY
-    pw.run()
+    # RUN PATHWAY - persistence keeps connector state across restarts
+    pw.run(
+        persistence_config=pw.persistence.Config(
+            pw.persistence.Backend.filesystem(PERSISTENCE_DIR)
+        )
+    )
@@ -0,0 +1,364 @@
+import argparse
+import json
+import os
+import queue
+import socketserver
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pathway as pw
+
+from main3 import OUTPUT_FOLDER
+from report_publisher import ReportWriter
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# OHLCV bars, one per line/row: ticker,timestamp,open,high,low,close,volume
+MARKET_DATA_FOLDER = os.getenv("MARKET_DATA_FOLDER", "market-data")
+MARKET_DATA_FORMAT = os.getenv("MARKET_DATA_FORMAT", "csv")  # "csv" or "json" (JSON lines)
+# Bars kept per ticker; every refresh works on this window only, so its cost
+# does not grow with the ticker's history. 256 bars leave a Wilder average
+# seeded at the window start within 1e-8 of one seeded at the first bar.
+WINDOW = int(os.getenv("MARKET_WINDOW", "256"))
+MIN_BARS = 30  # no snapshot until every indicator has a full look-back
+# market_report.md is rewritten at most this often per ticker (each rewrite
+# is a report change for main3)
+REPORT_INTERVAL_S = float(os.getenv("MARKET_REPORT_INTERVAL_S", "300"))
+
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+ADX_PERIOD = 14
+BB_PERIOD, BB_STD = 20, 2.0
+SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER = 10, 3.0
+VR_PERIOD = 26
+TREND_LOOKBACK = 5  # bars compared for "rising" / "falling"
+EMA_MAX_EXPONENT = 230  # ema() rebases before (1-a)^t drops below e^-230 (~1e-100)
+
+# ----------------------------
+# KERNELS
+# ----------------------------
+# Each kernel takes the window's columns as float64 arrays (oldest first)
+# and returns one value per bar.
+def ema(x: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential average seeded with the first value, as cumulative sums.
+
+    Within a chunk seeded with the previous output s,
+    y_t = (1-a)^(t+1) s + sum_{i=0..t} a (1-a)^(t-i) x_i. Chunks are short
+    enough that (1-a)^t stays far from underflow, so any MARKET_WINDOW works.
+    """
+    if alpha >= 1:
+        return x.astype(np.float64)
+    out = np.empty(len(x))
+    chunk = max(1, int(EMA_MAX_EXPONENT / -np.log1p(-alpha)))
+    seed = x[0] if len(x) else 0.0
+    for start in range(0, len(x), chunk):
+        part = x[start:start + chunk]
+        decay = (1 - alpha) ** np.arange(1, len(part) + 1)
+        out[start:start + len(part)] = (seed + np.cumsum(alpha * part / decay)) * decay
+        seed = out[start + len(part) - 1]
+    return out
+
+
+def wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's smoothing (RSI, ATR, ADX)"""
+    return ema(x, 1.0 / period)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    change = np.diff(close, prepend=close[0])
+    gain = wilder(np.clip(change, 0, None), period)
+    loss = wilder(np.clip(-change, 0, None), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + gain / loss)
+    return np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), out)
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD) -> np.ndarray:
+    return wilder(true_range(high, low, close), period)
+
+
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ADX_PERIOD) -> tuple:
+    """(ADX, +DI, -DI)"""
+    up = np.diff(high, prepend=high[0])
+    down = -np.diff(low, prepend=low[0])
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    tr = wilder(true_range(high, low, close), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = np.nan_to_num(100 * wilder(plus_dm, period) / tr)
+        minus_di = np.nan_to_num(100 * wilder(minus_dm, period) / tr)
+        dx = np.nan_to_num(100 * np.abs(plus_di - minus_di) / (plus_di + minus_di))
+    return wilder(dx, period), plus_di, minus_di
+
+
+def bollinger(close: np.ndarray, period: int = BB_PERIOD, n_std: float = BB_STD) -> tuple:
+    """(upper, middle, lower) from rolling mean and population std"""
+    windows = np.lib.stride_tricks.sliding_window_view(close, period)
+    middle, std = windows.mean(axis=1), windows.std(axis=1)
+    pad = np.full(period - 1, np.nan)
+    return (np.concatenate((pad, middle + n_std * std)), np.concatenate((pad, middle)),
+            np.concatenate((pad, middle - n_std * std)))
+
+
+def supertrend(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+               period: int = SUPERTREND_PERIOD, multiplier: float = SUPERTREND_MULTIPLIER) -> tuple:
+    """(line, direction) with direction +1 in an uptrend and -1 in a downtrend.
+
+    The bands are vectorized; carrying them forward depends on the previous
+    bar, so that last step is a loop over the (bounded) window.
+    """
+    mid = (high + low) / 2
+    band = multiplier * atr(high, low, close, period)
+    upper, lower = mid + band, mid - band
+    line = np.empty_like(close)
+    direction = np.ones(len(close), dtype=np.int8)
+    line[0] = lower[0]
+    for i in range(1, len(close)):
+        if close[i - 1] <= upper[i - 1]:
+            upper[i] = min(upper[i], upper[i - 1])
+        if close[i - 1] >= lower[i - 1]:
+            lower[i] = max(lower[i], lower[i - 1])
+        if direction[i - 1] == 1:
+            direction[i] = -1 if close[i] < lower[i] else 1
+        else:
+            direction[i] = 1 if close[i] > upper[i] else -1
+        line[i] = lower[i] if direction[i] == 1 else upper[i]
+    return line, direction
+
+
+def volume_ratio(close: np.ndarray, volume: np.ndarray, period: int = VR_PERIOD) -> np.ndarray:
+    """VR: volume on up bars plus half the unchanged volume, over the same for down bars, in %"""
+    change = np.diff(close, prepend=close[0])
+    kernel = np.ones(period)
+    up = np.convolve(np.where(change > 0, volume, 0.0), kernel)[:len(close)]
+    down = np.convolve(np.where(change < 0, volume, 0.0), kernel)[:len(close)]
+    flat = np.convolve(np.where(change == 0, volume, 0.0), kernel)[:len(close)] / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nan_to_num(100 * (up + flat) / (down + flat), nan=100.0, posinf=999.0)
+
+# ----------------------------
+# SNAPSHOTS
+# ----------------------------
+def _trend(values: np.ndarray) -> str:
+    if len(values) <= TREND_LOOKBACK:
+        return "flat"
+    change = values[-1] - values[-1 - TREND_LOOKBACK]
+    return "rising" if change > 0 else "falling" if change < 0 else "flat"
+
+
+def compute_snapshot(ticker: str, timestamps: list, bars: np.ndarray) -> dict:
+    """Latest indicator values of one ticker from its window (columns: open, high, low, close, volume)"""
+    _, high, low, close, volume = bars.T
+    adx_line, plus_di, minus_di = adx(high, low, close)
+    upper, middle, lower = bollinger(close)
+    st_line, st_direction = supertrend(high, low, close)
+    atr_line = atr(high, low, close)
+    rsi_line = rsi(close)
+    vr_line = volume_ratio(close, volume)
+    last = close[-1]
+    return {
+        "ticker": ticker,
+        "as_of": timestamps[-1],
+        "bars": len(close),
+        "close": round(float(last), 4),
+        "change_pct": round(float(100 * (last / close[-2] - 1)), 2),
+        "rsi": round(float(rsi_line[-1]), 2),
+        "rsi_trend": _trend(rsi_line),
+        "adx": round(float(adx_line[-1]), 2),
+        "adx_trend": _trend(adx_line),
+        "plus_di": round(float(plus_di[-1]), 2),
+        "minus_di": round(float(minus_di[-1]), 2),
+        "supertrend": round(float(st_line[-1]), 4),
+        "supertrend_direction": "up" if st_direction[-1] == 1 else "down",
+        "bb_upper": round(float(upper[-1]), 4),
+        "bb_middle": round(float(middle[-1]), 4),
+        "bb_lower": round(float(lower[-1]), 4),
+        "bb_percent_b": round(float((last - lower[-1]) / (upper[-1] - lower[-1])), 3) if upper[-1] > lower[-1] else 0.5,
+        "bb_width_pct": round(float(100 * (upper[-1] - lower[-1]) / middle[-1]), 2),
+        "atr": round(float(atr_line[-1]), 4),
+        "atr_pct": round(float(100 * atr_line[-1] / last), 2),
+        "atr_trend": _trend(atr_line),
+        "vr": round(float(vr_line[-1]), 1),
+    }
+
+
+def render_market_report(snapshot: dict) -> str:
+    """Compact market_report.md for one snapshot, sectioned like the analyst report it replaces"""
+    s = snapshot
+    rsi_zone = "overbought" if s["rsi"] >= 70 else "oversold" if s["rsi"] <= 30 else "neutral"
+    adx_zone = "strong trend" if s["adx"] >= 25 else "weak / no trend"
+    leader = "+DI" if s["plus_di"] >= s["minus_di"] else "-DI"
+    return f"""# Market Snapshot: {s['ticker']} as of {s['as_of']}
+Close {s['close']} ({s['change_pct']:+.2f}% on the bar), computed from the last {s['bars']} OHLCV bars.
+### Momentum Indicators
+- RSI({RSI_PERIOD}): {s['rsi']} ({rsi_zone}, {s['rsi_trend']} over {TREND_LOOKBACK} bars)
+### Trend Indicators
+- ADX({ADX_PERIOD}): {s['adx']} ({adx_zone}, {s['adx_trend']}); +DI {s['plus_di']} / -DI {s['minus_di']}, {leader} leads
+- Supertrend({SUPERTREND_PERIOD}, {SUPERTREND_MULTIPLIER:g}): {s['supertrend']}, {s['supertrend_direction']}trend
+### Volatility Indicators
+- Bollinger Bands({BB_PERIOD}, {BB_STD:g}): upper {s['bb_upper']}, middle {s['bb_middle']}, lower {s['bb_lower']}; %B {s['bb_percent_b']}, width {s['bb_width_pct']}%
+- ATR({ATR_PERIOD}): {s['atr']} ({s['atr_pct']}% of price, {s['atr_trend']})
+### Volume Indicators
+- VR({VR_PERIOD}): {s['vr']} (above 100: more volume on up bars)
+"""
+
+
+class IndicatorEngine:
+    """Per-ticker sliding windows of OHLCV bars and their latest snapshot.
+
+    ``update`` appends one bar and recomputes every indicator over the
+    ticker's last WINDOW bars. A bar with the ticker's latest timestamp
+    replaces it (a revised bar); older bars are dropped.
+    """
+
+    def __init__(self, window: int = WINDOW, min_bars: int = MIN_BARS):
+        self.window = window
+        self.min_bars = min_bars
+        self.dropped = 0
+        self.last_refresh_ms = 0.0
+        self._timestamps = {}
+        self._bars = {}
+
+    def update(self, ticker: str, timestamp: str, open: float, high: float, low: float, close: float, volume: float):
+        """Snapshot after adding the bar, or None while the window is still warming up"""
+        timestamps = self._timestamps.setdefault(ticker, deque(maxlen=self.window))
+        bars = self._bars.setdefault(ticker, deque(maxlen=self.window))
+        bar = (open, high, low, close, volume)
+        if timestamps and timestamp < timestamps[-1]:
+            self.dropped += 1
+            return None
+        if timestamps and timestamp == timestamps[-1]:
+            bars[-1] = bar
+        else:
+            timestamps.append(timestamp)
+            bars.append(bar)
+        if len(bars) < self.min_bars:
+            return None
+        started = time.perf_counter()
+        snapshot = compute_snapshot(ticker, list(timestamps), np.asarray(bars, dtype=np.float64))
+        self.last_refresh_ms = 1000 * (time.perf_counter() - started)
+        return snapshot
+
+# ----------------------------
+# PATHWAY PIPELINE
+# ----------------------------
+class BarSchema(pw.Schema):
+    ticker: str
+    timestamp: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class SnapshotSchema(pw.Schema):
+    ticker: str
+    as_of: str
+    snapshot: pw.Json
+    refresh_ms: float
+
+
+class Snapshots(pw.io.python.ConnectorSubject):
+    """Feeds computed snapshots back into the pipeline as an append-only table"""
+
+    def __init__(self):
+        super().__init__()
+        self._rows = queue.Queue()
+
+    def put(self, row: dict):
+        self._rows.put(row)
+
+    def run(self):
+        while True:
+            self.next(**self._rows.get())
+
+
+class BarSocket(pw.io.python.ConnectorSubject):
+    """Local stand-in for a market data feed: a TCP server taking one JSON bar per line"""
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        super().__init__()
+        self.host, self.port = host, port
+
+    def run(self):
+        subject = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        bar = json.loads(line)
+                        subject.next(**{name: bar[name] for name in BarSchema.column_names()})
+
+        with socketserver.ThreadingTCPServer((self.host, self.port), Handler) as server:
+            print(f"🔌 Listening for OHLCV bars on {self.host}:{self.port}")
+            server.serve_forever()
+
+
+def read_bars(socket_port: int = 0) -> pw.Table:
+    """Streaming OHLCV bars from MARKET_DATA_FOLDER, or from a local socket when ``socket_port`` is set"""
+    if socket_port:
+        return pw.io.python.read(BarSocket(socket_port), schema=BarSchema, autocommit_duration_ms=200, name="bars")
+    return pw.io.fs.read(
+        path=MARKET_DATA_FOLDER,
+        format=MARKET_DATA_FORMAT,
+        schema=BarSchema,
+        mode="streaming",
+        autocommit_duration_ms=1000,
+        name="bars"
+    )
+
+
+def compute_snapshots(bars: pw.Table, engine: IndicatorEngine, writer: ReportWriter, snapshots: Snapshots):
+    """Feed new bars to ``engine`` in timestamp order and publish each refreshed snapshot"""
+    batch = []
+
+    def on_change(key, row, time, is_addition):
+        if is_addition:
+            batch.append(row)
+
+    def on_time_end(time):
+        # A batch (e.g. a whole CSV file) arrives unordered; replay it in time order
+        batch.sort(key=lambda row: (row["ticker"], row["timestamp"]))
+        latest = {}
+        for row in batch:
+            snapshot = engine.update(**{name: row[name] for name in BarSchema.column_names()})
+            if snapshot is not None:
+                latest[row["ticker"]] = (snapshot, engine.last_refresh_ms)
+        batch.clear()
+        for ticker, (snapshot, refresh_ms) in latest.items():
+            writer.write(ticker, render_market_report(snapshot), snapshot["as_of"])
+            snapshots.put({"ticker": ticker, "as_of": snapshot["as_of"], "snapshot": snapshot, "refresh_ms": round(refresh_ms, 3)})
+
+    pw.io.subscribe(bars, on_change=on_change, on_time_end=on_time_end)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute market_report.md for every ticker from streaming OHLCV bars")
+    parser.add_argument("--socket", type=int, default=0, metavar="PORT",
+                        help=f"Read JSON bars from a local TCP port instead of {MARKET_DATA_FOLDER}/")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("📈 STREAMING MARKET INDICATORS")
+    print("="*80)
+    print(f"📁 Bars: {f'127.0.0.1:{args.socket}' if args.socket else f'{MARKET_DATA_FOLDER}/ ({MARKET_DATA_FORMAT})'}")
+    print(f"🪟 Window: last {WINDOW} bars per ticker, report refresh every {REPORT_INTERVAL_S:g}s")
+    Path(MARKET_DATA_FOLDER).mkdir(exist_ok=True)
+
+    snapshots = Snapshots()
+    compute_snapshots(read_bars(args.socket), IndicatorEngine(), ReportWriter("market", REPORT_INTERVAL_S), snapshots)
+    pw.io.jsonlines.write(
+        pw.io.python.read(snapshots, schema=SnapshotSchema, autocommit_duration_ms=1000, name="market_snapshots"),
+        f"{OUTPUT_FOLDER}/market_snapshots.jsonlines"
+    )
+    pw.run(monitoring_level=pw.MonitoringLevel.NONE)
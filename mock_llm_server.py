@@ -0,0 +1,302 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY_MS = 50
+COMPLETION_TOKENS = 12
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+FILLER = "The data points to sustained momentum but margin risk remains worth monitoring".split()
+
+# ----------------------------
+# BEHAVIOUR AND STATS
+# ----------------------------
+class MockBehaviour:
+    """Latency, token-rate, error-injection and rate-limit knobs of the mock endpoint.
+
+    latency_dist picks how the time to first token is drawn around latency_ms:
+    "fixed", "uniform" (latency_ms +/- jitter_ms) or "lognormal" (median
+    latency_ms, spread jitter_ms). tokens_per_s > 0 adds generation time per
+    completion token; 0 returns the whole completion at once.
+    """
+
+    def __init__(self, latency_ms: float = LATENCY_MS, latency_dist: str = "fixed", jitter_ms: float = 0.0,
+                 tokens_per_s: float = 0.0, completion_tokens: int = COMPLETION_TOKENS,
+                 error_rate: float = 0.0, rpm_limit: int = 0, seed=None):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_dist}', expected one of {LATENCY_DISTRIBUTIONS}")
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.jitter_ms = jitter_ms
+        self.tokens_per_s = tokens_per_s
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rpm_limit = rpm_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def first_token_delay(self) -> float:
+        """Seconds before the first token, drawn from the configured distribution"""
+        with self._lock:
+            if self.latency_dist == "uniform":
+                ms = self._random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.latency_dist == "lognormal" and self.latency_ms > 0:
+                ms = self._random.lognormvariate(math.log(self.latency_ms), self.jitter_ms / self.latency_ms)
+            else:
+                ms = self.latency_ms
+        return max(ms, 0.0) / 1000
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+
+    def inject_error(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def retry_after(self) -> float:
+        """0 if the request fits the sliding one-minute budget, else seconds until it would"""
+        if self.rpm_limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rpm_limit:
+                return 60 - (now - self._recent[0])
+            self._recent.append(now)
+            return 0.0
+
+
+class MockStats:
+    """Server-side counters, readable in-process or via GET /v1/stats"""
+
+    FIELDS = ("requests", "completed", "injected_errors", "rate_limited", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **deltas):
+        with self._lock:
+            for field, delta in deltas.items():
+                self._counts[field] += delta
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+# ----------------------------
+# OPENAI-COMPATIBLE HANDLER
+# ----------------------------
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions according to the server's MockBehaviour"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        behaviour, stats = self.server.behaviour, self.server.stats
+        stats.add(requests=1)
+
+        wait = behaviour.retry_after()
+        if wait:
+            stats.add(rate_limited=1)
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded",
+            }}, headers={"Retry-After": f"{wait:.1f}"})
+            return
+
+        time.sleep(behaviour.first_token_delay())
+        if behaviour.inject_error():
+            stats.add(injected_errors=1)
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        model = request.get("model", "mock")
+        prompt_text = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        words = completion_words(model, prompt_text, behaviour.completion_tokens)
+        prompt_tokens = len(prompt_text) // 4
+        stats.add(completed=1, prompt_tokens=prompt_tokens, completion_tokens=len(words))
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            try:
+                self._send_stream(model, words, behaviour.token_delay(), usage if include_usage else None)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled mid-stream
+            return
+
+        time.sleep(behaviour.token_delay() * len(words))
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_stream(self, model: str, words: list, token_delay: float, usage: dict = None):
+        """Server-sent events, one chunk per word, chunked transfer encoding"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk_id = f"chatcmpl-mock-{time.time_ns()}"
+        for i, word in enumerate(words):
+            if i and token_delay:
+                time.sleep(token_delay)
+            delta = {"content": word if i == 0 else " " + word}
+            self._write_event({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            })
+        self._write_event({
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        })
+        if usage is not None:
+            # stream_options.include_usage: final chunk with no choices
+            self._write_event({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload: dict):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def completion_words(model: str, prompt_text: str, n_tokens: int) -> list:
+    """About n_tokens words of filler; trader prompts also get a parseable final proposal"""
+    words = f"Mock analysis from {model} after reading {len(prompt_text)} characters.".split()
+    words += [FILLER[i % len(FILLER)] for i in range(max(n_tokens - len(words), 0))]
+    if "FINAL TRANSACTION PROPOSAL" in prompt_text:
+        words += "FINAL TRANSACTION PROPOSAL: **HOLD**".split()
+    return words
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 refuses bursts of concurrent debates
+
+
+def start_mock_server(host: str = HOST, port: int = 0, latency_ms: float = LATENCY_MS,
+                      behaviour: MockBehaviour = None) -> ThreadingHTTPServer:
+    """Start the mock server in a daemon thread; port=0 picks a free port"""
+    server = MockServer((host, port), MockChatHandler)
+    server.behaviour = behaviour or MockBehaviour(latency_ms=latency_ms)
+    server.stats = MockStats()
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    """OpenAI base_url for a running mock server"""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def add_behaviour_args(parser: argparse.ArgumentParser):
+    """CLI flags for MockBehaviour, shared with the benchmarks that embed the server"""
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS, help="Median time to first token")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Spread of the latency distribution")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Generation rate (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=COMPLETION_TOKENS)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected HTTP 500")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Requests per minute before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def behaviour_from_args(args) -> MockBehaviour:
+    return MockBehaviour(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        jitter_ms=args.jitter_ms,
+        tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rpm_limit=args.rpm_limit,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock endpoint")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    add_behaviour_args(parser)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.host, args.port, behaviour=behaviour_from_args(args))
+    print(f"🧪 Mock LLM server listening on {base_url(server)}")
+    print(f"💡 export OPENAI_BASE_URL={base_url(server)}")
+    print(f"📊 Request/token counters at {base_url(server)}/stats")
+    print("🛑 Press Ctrl+C to stop\n")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n🛑 Mock server stopped")
@@ -0,0 +1,96 @@
+import json
+import os
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+ROLES = ("bull", "bear", "bear_summarizer", "bull_summarizer", "trader", "summarizer")
+
+# "uniform": every role on DEFAULT_MODEL / DEFAULT_TEMPERATURE
+# "escalate": CHEAP_MODEL for the debate rounds, STRONG_MODEL for the final
+#             round, the summarizers and the trader. "Final" is the last
+#             scheduled round (DEBATE_MAX_ROUNDS / N_ROUNDS): a debate that
+#             converges earlier never reaches it, so the summarizers are what
+#             puts the strong model on every debate
+ROUTING_POLICY = os.getenv("LLM_ROUTING", "uniform")
+CHEAP_MODEL = os.getenv("LLM_CHEAP_MODEL", DEFAULT_MODEL)
+STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "gpt-4o")
+# Optional JSON overrides applied on top of the policy, e.g.
+# {"default": {"max_tokens": 900},
+#  "bull": {"temperature": 0.8, "rounds": {"1": {"model": "gpt-4.1-mini"}, "final": {"max_tokens": 1200}}},
+#  "trader": {"model": "gpt-4.1", "temperature": 0.2}}
+ROUTES_FILE = os.getenv("LLM_ROUTES_FILE", "")
+
+POLICIES = {
+    "uniform": {},
+    "escalate": {
+        "default": {"model": CHEAP_MODEL},
+        "bull": {"rounds": {"final": {"model": STRONG_MODEL}}},
+        "bear": {"rounds": {"final": {"model": STRONG_MODEL}}},
+        "trader": {"model": STRONG_MODEL, "temperature": 0.3},
+        "summarizer": {"model": STRONG_MODEL, "temperature": 0.3},
+        "bear_summarizer": {"model": STRONG_MODEL, "temperature": 0.3},
+        "bull_summarizer": {"model": STRONG_MODEL, "temperature": 0.3},
+    },
+}
+
+ROUTE_FIELDS = ("model", "temperature", "max_tokens")
+
+# ----------------------------
+# ROUTING
+# ----------------------------
+def _pick(settings: dict) -> dict:
+    return {field: settings[field] for field in ROUTE_FIELDS if field in settings}
+
+
+class ModelRouter:
+    """Model, temperature and max_tokens per role and round.
+
+    Settings are layered: built-in defaults, then the policy's "default",
+    the role's own settings and finally the role's entry for the round
+    (by number, or "final" for the last scheduled round, which adaptive
+    stopping may skip); each layer from
+    the policy first, then from the overrides.
+    """
+
+    def __init__(self, policy: str = ROUTING_POLICY, overrides: dict = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}', expected one of {tuple(POLICIES)}")
+        unknown = set(overrides or {}) - set(ROLES) - {"default"}
+        if unknown:
+            raise ValueError(f"Unknown role(s) in routes: {', '.join(sorted(unknown))}; expected {ROLES}")
+        self.policy = policy
+        self.layers = [POLICIES[policy], overrides or {}]
+
+    def route(self, role: str, round_num: int = 0, final_round: bool = False) -> dict:
+        """Keyword arguments (model, temperature, max_tokens) for llm_client.achat / chat"""
+        resolved = {"model": DEFAULT_MODEL, "temperature": DEFAULT_TEMPERATURE, "max_tokens": None}
+        for layer in self.layers:
+            resolved.update(_pick(layer.get("default", {})))
+        for layer in self.layers:
+            resolved.update(_pick(layer.get(role, {})))
+        for layer in self.layers:
+            rounds = layer.get(role, {}).get("rounds", {})
+            resolved.update(_pick(rounds.get(str(round_num), {})))
+            if final_round:
+                resolved.update(_pick(rounds.get("final", {})))
+        return resolved
+
+
+def load_router() -> ModelRouter:
+    """Router for LLM_ROUTING, with LLM_ROUTES_FILE overrides when set"""
+    overrides = None
+    if ROUTES_FILE:
+        with open(ROUTES_FILE) as f:
+            overrides = json.load(f)
+    return ModelRouter(ROUTING_POLICY, overrides)
+
+
+router = load_router()
+
+
+def route(role: str, round_num: int = 0, final_round: bool = False) -> dict:
+    """Route of ``role`` in ``round_num`` under the process-wide router"""
+    return router.route(role, round_num, final_round)
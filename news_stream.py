@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pathway as pw
+
+from main3 import DATA_FOLDER, DEFAULT_TICKER
+from report_publisher import ReportWriter
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# News items as JSON lines: {"title", "published_utc" (epoch seconds),
+# "summary"?, "source"?, "url"?, "id"?, "ticker"? (the feed's own tag)}
+NEWS_FOLDER = os.getenv("NEWS_FOLDER", "news-items")
+# Tickers are DEFAULT_TICKER, every data-source/<TICKER>/ folder (reports or
+# not) and ALIASES_FILE's keys, re-read this often so new tickers get news
+# without a restart.
+# Optional {"TICKER": ["alias", ...]} on top of DEFAULT_ALIASES and the symbol itself
+ALIASES_FILE = os.getenv("NEWS_ALIASES_FILE", "")
+ALIASES_REFRESH_S = float(os.getenv("NEWS_ALIASES_REFRESH_S", "60"))
+DEFAULT_ALIASES = {
+    "AAPL": ["apple", "iphone", "ipad", "macbook", "app store", "tim cook", "vision pro"],
+}
+# Stories that move every ticker; they count towards relevance up to MACRO_CAP,
+# and only for an item that already names the ticker (alias or feed tag), so a
+# Fed headline alone doesn't rewrite every ticker's report
+MACRO_TERMS = ["federal reserve", "fed", "inflation", "cpi", "interest rate", "rate cut", "rate hike",
+               "tariff", "tariffs", "recession", "treasury", "yields", "gdp", "jobs report", "unemployment"]
+MACRO_CAP = 3
+# Relevance: 3 per alias in the title, 1 per alias in the summary, 2 for the
+# feed's own ticker tag, plus macro terms (2 in the title, 1 in the summary)
+MIN_RELEVANCE = int(os.getenv("NEWS_MIN_RELEVANCE", "3"))
+MAX_STORIES = int(os.getenv("NEWS_MAX_STORIES", "15"))
+LOOKBACK_S = int(os.getenv("NEWS_LOOKBACK_S", str(7 * 24 * 3600)))
+# Two items are the same story from this estimated Jaccard similarity of
+# their word sets (reprints measure 0.75+, distinct stories 0.2 or less).
+# 32 LSH bands of 2 rows find a pair at 0.5 with 99.9% probability.
+MINHASH_THRESHOLD = float(os.getenv("NEWS_DUPLICATE_SIMILARITY", "0.5"))
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 32
+SUMMARY_CHARS = 600
+# news_report.md is rewritten at most this often per ticker, and only when
+# the selected story set changes
+REPORT_INTERVAL_S = float(os.getenv("NEWS_REPORT_INTERVAL_S", "60"))
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "as", "at", "by",
+             "from", "is", "are", "was", "were", "be", "its", "it", "this", "that", "after", "over", "says"}
+
+# ----------------------------
+# IDS AND RELEVANCE
+# ----------------------------
+def _normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+@pw.udf(deterministic=True)
+def stable_id(guid: str, url: str, source: str, title: str) -> str:
+    """The feed's id, else the URL, else source + normalized title"""
+    if guid:
+        return guid
+    key = url or f"{source.lower()}|{_normalize(title)}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def load_aliases() -> dict:
+    """Lower-case search terms per ticker: its symbol, DEFAULT_ALIASES and ALIASES_FILE"""
+    tickers = {DEFAULT_TICKER}
+    root = Path(DATA_FOLDER)
+    if root.is_dir():
+        tickers |= {d.name for d in root.iterdir() if d.is_dir() and d.name == d.name.upper()}
+    extra = {}
+    if ALIASES_FILE:
+        with open(ALIASES_FILE) as f:
+            extra = json.load(f)
+    tickers |= set(extra)
+    return {
+        ticker: sorted({ticker.lower(), *DEFAULT_ALIASES.get(ticker, []), *extra.get(ticker, [])})
+        for ticker in sorted(tickers)
+    }
+
+
+_aliases = (0.0, {})
+
+
+def ticker_aliases() -> dict:
+    """load_aliases(), re-read at most every ALIASES_REFRESH_S"""
+    global _aliases
+    loaded_at, aliases = _aliases
+    if time.monotonic() - loaded_at >= ALIASES_REFRESH_S or not aliases:
+        _aliases = (time.monotonic(), load_aliases())
+    return _aliases[1]
+
+
+def _mentions(terms: list, text: str) -> int:
+    padded = f" {_normalize(text)} "
+    return sum(padded.count(f" {_normalize(term)} ") for term in terms)
+
+
+def relevance(ticker: str, title: str, summary: str, tagged: str) -> int:
+    """How strongly an item concerns ``ticker`` (see MIN_RELEVANCE)"""
+    aliases = ticker_aliases().get(ticker, [ticker.lower()])
+    score = 3 * _mentions(aliases, title) + _mentions(aliases, summary)
+    if tagged.upper() == ticker:
+        score += 2
+    if not score:
+        return 0
+    macro = 2 * _mentions(MACRO_TERMS, title) + _mentions(MACRO_TERMS, summary)
+    return score + min(macro, MACRO_CAP)
+
+
+@pw.udf
+def relevant_tickers(title: str, summary: str, tagged: str) -> pw.Json:
+    """[{"ticker", "relevance"}] for every ticker the item clears MIN_RELEVANCE for.
+
+    Not deterministic: the ticker set grows, so Pathway keeps each item's
+    result to retract it exactly.
+    """
+    return pw.Json([
+        {"ticker": ticker, "relevance": score}
+        for ticker in ticker_aliases()
+        if (score := relevance(ticker, title, summary, tagged)) >= MIN_RELEVANCE
+    ])
+
+# ----------------------------
+# NEAR-DUPLICATES
+# ----------------------------
+def _story_words(text: str) -> list:
+    return sorted({w for w in _WORD.findall(text.lower()) if w not in STOPWORDS})
+
+
+def _word_hashes(words: list) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little") for w in words],
+        dtype=np.uint64
+    )
+
+
+_PERMUTATIONS = np.random.default_rng(0).integers(1, 2**63, size=(2, MINHASH_PERMUTATIONS), dtype=np.uint64) | np.uint64(1)
+
+
+def minhash(text: str) -> np.ndarray:
+    """MINHASH_PERMUTATIONS-value MinHash signature of a story's distinct words"""
+    words = _story_words(text)
+    if not words:
+        return np.zeros(MINHASH_PERMUTATIONS, dtype=np.uint64)
+    a, b = _PERMUTATIONS
+    # (a*h + b) mod 2^64 per word and permutation, minimum per permutation
+    return (_word_hashes(words)[:, None] * a + b).min(axis=0)
+
+
+def _bands(signature: np.ndarray) -> list:
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(MINHASH_BANDS)]
+
+
+class StoryIndex:
+    """One ticker's relevant items grouped into stories of near-duplicate reprints.
+
+    Two items are one story when the MinHash estimate of their word-set
+    Jaccard similarity reaches MINHASH_THRESHOLD, or when their normalized
+    titles are equal. Candidates come from LSH band buckets, so a new item
+    is compared with a handful of stories, not all of them. A story is told
+    by its earliest item, so reprints join it without changing the report.
+    """
+
+    def __init__(self):
+        self.items = {}  # item_id -> item dict, with "signature" and "story"
+        self.stories = {}  # story id -> set of item ids
+        self._buckets = {}  # band key or normalized title -> set of story ids
+        self._next_story = 0
+
+    def add(self, item: dict):
+        signature = minhash(f"{item['title']} {item['summary']}")
+        keys = _bands(signature) + [("title", _normalize(item["title"]))]
+        story = self._find_story(signature, keys)
+        if story is None:
+            story, self._next_story = self._next_story, self._next_story + 1
+            self.stories[story] = set()
+        self.items[item["item_id"]] = {**item, "signature": signature, "story": story}
+        self.stories[story].add(item["item_id"])
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(story)
+
+    def remove(self, item_id: str):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        members = self.stories[item["story"]]
+        members.discard(item_id)
+        if not members:
+            del self.stories[item["story"]]
+        # Stale bucket entries are skipped in _find_story
+
+    def prune(self, before: float):
+        """Forget items published before ``before``, keeping the index bounded"""
+        for item_id in [i for i, item in self.items.items() if item["published_utc"] < before]:
+            self.remove(item_id)
+        live = set(self.stories)
+        self._buckets = {key: stories & live for key, stories in self._buckets.items() if stories & live}
+
+    def _find_story(self, signature: np.ndarray, keys: list):
+        title_key = keys[-1]
+        title_match = self._buckets.get(title_key, set()) & self.stories.keys()
+        if title_match:
+            return min(title_match)
+        candidates = set()
+        for key in keys[:-1]:
+            candidates |= self._buckets.get(key, set())
+        best, best_similarity = None, MINHASH_THRESHOLD
+        for story in candidates:
+            for item_id in self.stories.get(story, ()):
+                similarity = float(np.mean(signature == self.items[item_id]["signature"]))
+                if similarity >= best_similarity:
+                    best, best_similarity = story, similarity
+        return best
+
+    def headline_items(self) -> list:
+        """The item telling each story: its earliest one (ties broken by id)"""
+        return [
+            min((self.items[i] for i in members), key=lambda item: (item["published_utc"], item["item_id"]))
+            for members in self.stories.values()
+        ]
+
+    def selected(self, lookback_s: int = LOOKBACK_S, max_stories: int = MAX_STORIES) -> list:
+        """The stories a debate sees: the most relevant (then newest) within ``lookback_s`` of the newest item"""
+        heads = self.headline_items()
+        if not heads:
+            return []
+        newest = max(item["published_utc"] for item in self.items.values())
+        recent = [item for item in heads if item["published_utc"] > newest - lookback_s]
+        recent.sort(key=lambda item: (-item["relevance"], -item["published_utc"], item["item_id"]))
+        return sorted(recent[:max_stories], key=lambda item: (-item["published_utc"], item["item_id"]))
+
+
+def _story_text(item: dict) -> str:
+    summary = item["summary"]
+    if len(summary) > SUMMARY_CHARS:
+        summary = summary[:SUMMARY_CHARS].rsplit(" ", 1)[0] + " ..."
+    date = datetime.fromtimestamp(item["published_utc"], tz=timezone.utc).strftime("%Y-%m-%d")
+    source = f" ({item['source']})" if item["source"] else ""
+    return f"- **{date}: {item['title']}**{source}" + (f"\n  {summary}" if summary else "")
+
+
+def render_news_report(ticker: str, stories: list) -> str:
+    """news_report.md for one ticker, company stories first, then macro ones touching it"""
+    macro = [s for s in stories if _mentions(MACRO_TERMS, f"{s['title']} {s['summary']}")]
+    company = [s for s in stories if s not in macro]
+    lines = [
+        f"# World Affairs News: {ticker}",
+        f"{len(stories)} distinct stories most relevant to {ticker}, newest first; reprints of the same story are collapsed.",
+    ]
+    if company:
+        lines += [f"### {ticker} and Its Markets"] + [_story_text(s) for s in company]
+    if macro:
+        lines += ["### Macro and Policy"] + [_story_text(s) for s in macro]
+    return "\n".join(lines) + "\n"
+
+# ----------------------------
+# PATHWAY PIPELINE
+# ----------------------------
+class NewsSchema(pw.Schema):
+    title: str
+    published_utc: float
+    summary: str = pw.column_definition(default_value="")
+    source: str = pw.column_definition(default_value="")
+    url: str = pw.column_definition(default_value="")
+    guid: str = pw.column_definition(default_value="")  # the item's "id"
+    ticker: str = pw.column_definition(default_value="")
+
+
+def read_news() -> pw.Table:
+    """Streaming news items from the JSON-lines files in NEWS_FOLDER"""
+    return pw.io.fs.read(
+        path=NEWS_FOLDER,
+        format="json",
+        schema=NewsSchema,
+        json_field_paths={"guid": "/id"},
+        mode="streaming",
+        autocommit_duration_ms=1000,
+        name="news"
+    )
+
+
+def build_relevant_items(news: pw.Table) -> pw.Table:
+    """One row per (ticker, item) the item is relevant to, keyed by the item's stable id.
+
+    The same id seen twice (two feeds, a re-fetched file) is one item; an
+    edited item replaces its earlier version.
+    """
+    items = news.select(
+        *pw.this,
+        item_id=stable_id(pw.this.guid, pw.this.url, pw.this.source, pw.this.title)
+    ).groupby(pw.this.item_id).reduce(
+        pw.this.item_id,
+        title=pw.reducers.max(pw.this.title),
+        summary=pw.reducers.max(pw.this.summary),
+        source=pw.reducers.max(pw.this.source),
+        tagged=pw.reducers.max(pw.this.ticker),
+        published_utc=pw.reducers.min(pw.this.published_utc)
+    )
+    matches = items.select(
+        *pw.this,
+        match=relevant_tickers(pw.this.title, pw.this.summary, pw.this.tagged)
+    ).flatten(pw.this.match)
+    return matches.select(
+        pw.this.item_id,
+        pw.this.title,
+        pw.this.summary,
+        pw.this.source,
+        pw.this.tagged,
+        pw.this.published_utc,
+        ticker=pw.this.match["ticker"].as_str(),
+        relevance=pw.this.match["relevance"].as_int()
+    )
+
+
+def publish_stories(items: pw.Table, writer: ReportWriter):
+    """Keep a StoryIndex per ticker and rewrite news_report.md when its selected stories change"""
+    indexes = {}
+    batch = []
+
+    def on_change(key, row, time, is_addition):
+        batch.append((row, is_addition))
+
+    def on_time_end(time):
+        # Removals first, so an edited item is replaced rather than duplicated
+        batch.sort(key=lambda change: (change[1], change[0]["published_utc"]))
+        touched = set()
+        for row, is_addition in batch:
+            index = indexes.setdefault(row["ticker"], StoryIndex())
+            if is_addition:
+                index.add(row)
+            else:
+                index.remove(row["item_id"])
+            touched.add(row["ticker"])
+        batch.clear()
+        for ticker in sorted(touched):
+            index = indexes[ticker]
+            if index.items:
+                index.prune(max(item["published_utc"] for item in index.items.values()) - LOOKBACK_S)
+            stories = index.selected()
+            print(f"📰 {ticker}: {len(index.items)} relevant items, {len(index.stories)} stories, {len(stories)} selected")
+            newest = max((s["published_utc"] for s in stories), default=0)
+            as_of = datetime.fromtimestamp(newest, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if stories else ""
+            writer.write(ticker, render_news_report(ticker, stories), as_of)
+
+    pw.io.subscribe(items, on_change=on_change, on_time_end=on_time_end)
+
+
+if __name__ == "__main__":
+    print("="*80)
+    print("📰 STREAMING NEWS INGESTION")
+    print("="*80)
+    print(f"📁 Items: {NEWS_FOLDER}/ (JSON lines)")
+    print(f"🎯 Tickers: {', '.join(ticker_aliases())} (relevance >= {MIN_RELEVANCE}), "
+          f"top {MAX_STORIES} stories over {LOOKBACK_S // 3600}h")
+    Path(NEWS_FOLDER).mkdir(exist_ok=True)
+
+    publish_stories(build_relevant_items(read_news()), ReportWriter("news", REPORT_INTERVAL_S))
+    pw.run(monitoring_level=pw.MonitoringLevel.NONE)
@@ -0,0 +1,34 @@
+import os
+import threading
+from pathlib import Path
+
+
+class ProcessedHashes:
+    """Append-only on-disk set of combined report hashes whose debate has completed"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hashes = set()
+        if self.path.exists():
+            self._hashes = {line.strip() for line in self.path.read_text().splitlines() if line.strip()}
+
+    def __contains__(self, combined_hash: str) -> bool:
+        with self._lock:
+            return combined_hash in self._hashes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._hashes)
+
+    def add(self, combined_hash: str):
+        """Record a hash durably so restarts skip it"""
+        with self._lock:
+            if combined_hash in self._hashes:
+                return
+            with open(self.path, "a") as f:
+                f.write(combined_hash + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._hashes.add(combined_hash)
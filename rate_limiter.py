@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# Defaults sit a little under the gpt-4o-mini tier-1 limits; set them to your
+# organisation's limits (0 disables a bucket).
+RPM_LIMIT = int(os.getenv("LLM_RPM", "450"))
+TPM_LIMIT = int(os.getenv("LLM_TPM", "180000"))
+
+
+class TokenBucketLimiter:
+    """Process-wide request and token budget for LLM calls.
+
+    Two continuously refilled buckets, one per minute-limit (RPM and TPM).
+    ``acquire(tokens)`` waits until both can pay; waiters are served in
+    arrival order so large prompts are not starved by small ones. Tokens
+    are charged up front from an estimate and ``settle`` corrects the TPM
+    bucket with the usage the API reports. ``pause`` stops all callers,
+    e.g. for a 429's Retry-After.
+
+    Not thread-safe: use it from a single event loop (llm_client's).
+    """
+
+    def __init__(self, rpm: int = RPM_LIMIT, tpm: int = TPM_LIMIT):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._turnstile = None
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        """Seconds until a call of ``tokens`` fits; 0 if it fits now"""
+        self._refill()
+        waits = [self._paused_until - time.monotonic()]
+        if self.rpm and self._requests < 1:
+            waits.append((1 - self._requests) * 60 / self.rpm)
+        if self.tpm:
+            # A prompt larger than the whole bucket waits for a full bucket
+            needed = min(tokens, self.tpm)
+            if self._tokens < needed:
+                waits.append((needed - self._tokens) * 60 / self.tpm)
+        return max(waits)
+
+    async def acquire(self, tokens: int = 0):
+        if self._turnstile is None:
+            self._turnstile = asyncio.Lock()
+        async with self._turnstile:
+            while (wait := self._wait_time(tokens)) > 0:
+                await asyncio.sleep(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the TPM bucket once the real token usage is known"""
+        if self.tpm:
+            self._refill()
+            self._tokens = min(self.tpm, self._tokens + estimated - actual)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(self._requests, 1),
+            "tokens_available": round(self._tokens),
+        }
@@ -0,0 +1,100 @@
+import os
+import re
+from functools import lru_cache
+
+from debate_memory import estimate_tokens
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# Set REPORT_NORMALIZE=0 to send the reports to the LLM exactly as extracted
+NORMALIZE_ENABLED = os.getenv("REPORT_NORMALIZE", "1") != "0"
+
+# Agent banners the report generator puts on top of every report, e.g.
+# "[ Market Analyst ]:" followed by "==== Report ====". The report type
+# already says which analyst wrote it, so they only cost tokens.
+BOILERPLATE_LINES = [
+    re.compile(r"^\[\s*[\w ]+\s*\]\s*:?$"),
+    re.compile(r"^=+\s*Report\s*=+$"),
+]
+
+# The agent's tool-call log appended after the report body, e.g.
+# "==== Tool Calls ====" then call IDs and arguments; everything from here on is dropped
+TRAILER_START = re.compile(r"^=+\s*Tool Calls\s*=+$")
+
+# A line starting with one of these is its own markdown block, never a wrapped
+# continuation; "====" separator lines also end the block before them
+_BLOCK_START = re.compile(r"^(#{1,6}\s|[-*+]\s|[-*+]$|\d+[.)]\s|>|\||```|=+)")
+
+# Tokenizer artefacts from the PDF extraction, applied in order
+_FIXES = [
+    (re.compile(r"[’‘]"), "'"),
+    (re.compile(r"[“”]"), '"'),
+    (re.compile(r"\s*'\s*(s|t|re|ve|ll|d|m)\b"), r"'\1"),   # "Apple ’ s" -> "Apple's"
+    (re.compile(r"\*\*\s*([^*\n]+?)\s*\*\*"), r"**\1**"),   # "** RSI **" -> "**RSI**"
+    (re.compile(r"([(\[])\s+"), r"\1"),                     # "( ROE" -> "(ROE"
+    (re.compile(r"[ \t]+([.,;:!?%)\]])"), r"\1"),           # "Inc . ( AAPL )" -> "Inc. (AAPL)", "$3 .55" -> "$3.55"
+    (re.compile(r"(?<=\w) ?/ ?(?=\w)"), "/"),               # "P / E" -> "P/E"
+    (re.compile(r"\b([A-Z]) & ([A-Z])\b"), r"\1&\2"),       # "S & P" -> "S&P"
+    (re.compile(r"[ \t]{2,}"), " "),
+]
+
+
+def _is_boilerplate(line: str) -> bool:
+    return any(pattern.match(line) for pattern in BOILERPLATE_LINES)
+
+
+def _strip_trailer(lines: list) -> list:
+    """Lines before the tool-call trailer (all of them when there is none)"""
+    for i, line in enumerate(lines):
+        if TRAILER_START.match(line):
+            return lines[:i]
+    return lines
+
+
+def _unwrap(lines: list) -> list:
+    """Join hard-wrapped lines back into their paragraph or list item"""
+    joined = []
+    for line in lines:
+        continues = (
+            joined and line and joined[-1]
+            and not _BLOCK_START.match(line)
+            and not joined[-1].startswith(("#", "="))
+        )
+        if continues:
+            joined[-1] = f"{joined[-1]} {line}"
+        else:
+            joined.append(line)
+    return joined
+
+
+def normalize_report(text: str) -> str:
+    """Report text with extraction artefacts, banners and hard wraps removed.
+
+    Only whitespace, quotes, banner lines and the trailing tool-call log
+    change; the report's words and numbers are kept, so the debate sees
+    the same facts in fewer tokens.
+    """
+    lines = _strip_trailer([line.strip() for line in text.splitlines()])
+    lines = [line for line in lines if not _is_boilerplate(line)]
+    cleaned = "\n".join(_unwrap(lines))
+    for pattern, replacement in _FIXES:
+        cleaned = pattern.sub(replacement, cleaned)
+    return re.sub(r"\n{3,}", "\n\n", cleaned).strip()
+
+
+@lru_cache(maxsize=256)
+def normalize_cached(content_hash: str, text: str) -> str:
+    """normalize_report memoized per content hash, so an unchanged report is never redone"""
+    return normalize_report(text) if NORMALIZE_ENABLED else text
+
+
+def normalization_stats(raw: str, cleaned: str) -> dict:
+    """Estimated tokens before and after normalization"""
+    raw_tokens, clean_tokens = estimate_tokens(raw), estimate_tokens(cleaned)
+    return {
+        "raw_tokens": raw_tokens,
+        "clean_tokens": clean_tokens,
+        "tokens_saved": raw_tokens - clean_tokens,
+        "saved_pct": round(100 * (raw_tokens - clean_tokens) / raw_tokens, 1) if raw_tokens else 0.0,
+    }
@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from main3 import DATA_FOLDER, DEFAULT_TICKER
+
+# ----------------------------
+# REPORT FILES
+# ----------------------------
+# Stages that generate a report (market_indicators, sentiment_stream) publish
+# it where main3 reads hand-delivered ones, so the debate pipeline picks it up
+# like any other report edit.
+def report_path(ticker: str, report_type: str, data_folder: str = DATA_FOLDER) -> Path:
+    """<data_folder>/<report_type>_report.md for DEFAULT_TICKER, <data_folder>/<ticker>/... otherwise"""
+    folder = Path(data_folder) if ticker == DEFAULT_TICKER else Path(data_folder) / ticker
+    return folder / f"{report_type}_report.md"
+
+
+class ReportWriter:
+    """Rewrites each ticker's <report_type>_report.md, at most once per ``interval_s``.
+
+    Every rewrite is a report change for main3 (and so a new debate), hence
+    the throttle. Text identical to the last write is skipped; a write that
+    falls inside the interval is held back and the newest held text written
+    when the interval ends.
+    """
+
+    def __init__(self, report_type: str, interval_s: float):
+        self.report_type = report_type
+        self.interval_s = interval_s
+        self._written = {}
+        self._texts = {}
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def write(self, ticker: str, text: str, as_of: str = "", force: bool = False):
+        """Path written, or None when the text is unchanged or held back"""
+        with self._lock:
+            if text == self._texts.get(ticker):
+                self._held.pop(ticker, None)
+                return None
+            wait = self._written.get(ticker, -self.interval_s) + self.interval_s - time.monotonic()
+            if not force and wait > 0:
+                if ticker not in self._held:
+                    timer = threading.Timer(wait, self._flush, args=(ticker,))
+                    timer.daemon = True
+                    timer.start()
+                self._held[ticker] = (text, as_of)
+                return None
+            self._held.pop(ticker, None)
+            return self._write(ticker, text, as_of)
+
+    def _flush(self, ticker: str):
+        with self._lock:
+            held = self._held.pop(ticker, None)
+            if held is not None:
+                self._write(ticker, *held)
+
+    def _write(self, ticker: str, text: str, as_of: str) -> Path:
+        path = report_path(ticker, self.report_type)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename, so the report stream never sees half a file
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(text)
+        os.replace(tmp, path)
+        self._written[ticker] = time.monotonic()
+        self._texts[ticker] = text
+        print(f"📝 {ticker}: {path.name} refreshed{f' (data up to {as_of})' if as_of else ''}")
+        return path
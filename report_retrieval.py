@@ -0,0 +1,179 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from debate_memory import estimate_tokens
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# Set DEBATE_RETRIEVAL=0 to give every turn the four full reports again
+RETRIEVAL_ENABLED = os.getenv("DEBATE_RETRIEVAL", "1") != "0"
+TOP_K = int(os.getenv("DEBATE_TOP_K", "8"))
+CHUNK_TOKENS = int(os.getenv("DEBATE_CHUNK_TOKENS", "160"))
+# Local sentence-transformers model (the one pathway's SentenceTransformerEmbedder
+# wraps); without sentence-transformers installed, chunks are ranked with BM25
+EMBEDDING_MODEL = os.getenv("DEBATE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+REPORT_TITLES = {
+    "market": "Market Research Report",
+    "sentiment": "Social Media Sentiment Report",
+    "news": "World Affairs News",
+    "fundamentals": "Company Fundamentals Report",
+}
+
+_WORD = re.compile(r"[a-z]+|\d+")
+_HEADING = re.compile(r"^#{1,6}\s")
+
+_model = None
+_model_lock = threading.Lock()
+_model_failed = False
+
+# ----------------------------
+# CHUNKING
+# ----------------------------
+def chunk_report(text: str, max_tokens: int = CHUNK_TOKENS) -> list:
+    """Split a report into chunks of whole lines, each under its section heading.
+
+    A chunk never spans two sections; a chunk continuing a long section
+    repeats the heading so it still reads on its own.
+    """
+    chunks, heading, lines = [], "", []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            chunks.append(f"{heading}\n{body}" if heading else body)
+        lines.clear()
+
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            flush()
+            heading = line.strip()
+            continue
+        if lines and estimate_tokens("\n".join(lines + [line])) > max_tokens:
+            flush()
+        lines.append(line)
+    flush()
+    return chunks
+
+# ----------------------------
+# SCORING
+# ----------------------------
+def _get_model():
+    """The local embedding model, or None when it is unavailable (BM25 is used instead)"""
+    global _model, _model_failed
+    with _model_lock:
+        if _model is None and not _model_failed:
+            try:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+            except Exception as e:
+                _model_failed = True
+                if not isinstance(e, ImportError):
+                    print(f"⚠️  Embedding model '{EMBEDDING_MODEL}' unavailable ({e}); ranking chunks with BM25")
+        return _model
+
+
+def embed_texts(texts: list):
+    """Unit-length embeddings of ``texts``, or None when no local model is available"""
+    model = _get_model()
+    if model is None:
+        return None
+    return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def _terms(text: str) -> list:
+    return _WORD.findall(text.lower())
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of chunks"""
+
+    def __init__(self, docs: list, k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.tfs = [Counter(_terms(doc)) for doc in docs]
+        self.lengths = [sum(tf.values()) for tf in self.tfs]
+        self.avg_length = sum(self.lengths) / len(docs) if docs else 0.0
+        df = Counter(term for tf in self.tfs for term in tf)
+        n = len(docs)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def scores(self, query: str) -> np.ndarray:
+        terms = set(_terms(query)) & self.idf.keys()
+        out = np.zeros(len(self.tfs), dtype=np.float32)
+        for i, (tf, length) in enumerate(zip(self.tfs, self.lengths)):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+            out[i] = sum(self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf)
+        return out
+
+# ----------------------------
+# INDEX
+# ----------------------------
+@lru_cache(maxsize=64)
+def _indexed_report(kind: str, text: str) -> tuple:
+    """Chunks of one report version and their embeddings (None without a model).
+
+    Cached per report content, so an edit re-chunks and re-embeds only the
+    report that changed.
+    """
+    chunks = chunk_report(text)
+    return chunks, embed_texts(chunks) if chunks else None
+
+
+class ReportIndex:
+    """The chunks of one ticker's four reports, searchable by an argument"""
+
+    def __init__(self, reports: dict):
+        self.chunks, vectors = [], []
+        for kind, text in reports.items():
+            chunks, embedded = _indexed_report(kind, text)
+            self.chunks += [(kind, i, chunk) for i, chunk in enumerate(chunks)]
+            vectors.append(embedded)
+        if vectors and all(v is not None for v in vectors):
+            self.backend = "embeddings"
+            self._vectors = np.vstack(vectors)
+        else:
+            self.backend = "bm25"
+            self._bm25 = BM25([chunk for _, _, chunk in self.chunks])
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        """Top-k (report_type, position, chunk) for ``query``, best first.
+
+        The best chunk of every report is always included (when k allows),
+        so one report with many near-duplicate hits cannot crowd out the rest.
+        """
+        if not self.chunks:
+            return []
+        if self.backend == "embeddings":
+            scores = self._vectors @ embed_texts([query])[0]
+        else:
+            scores = self._bm25.scores(query)
+        ranked = [int(i) for i in np.argsort(-scores, kind="stable")]
+        best_per_report = {}
+        for i in ranked:
+            best_per_report.setdefault(self.chunks[i][0], i)
+        picked = sorted(best_per_report.values(), key=ranked.index)[:k]
+        picked += [i for i in ranked if i not in picked][:k - len(picked)]
+        return [self.chunks[i] for i in sorted(picked, key=ranked.index)]
+
+    def context(self, query: str, k: int = TOP_K) -> str:
+        """Top-k chunks for ``query``, grouped by report in document order"""
+        hits = sorted(self.search(query, k), key=lambda hit: (list(REPORT_TITLES).index(hit[0]), hit[1]))
+        sections = []
+        for kind in REPORT_TITLES:
+            excerpts = [chunk for hit_kind, _, chunk in hits if hit_kind == kind]
+            if excerpts:
+                sections.append(f"{REPORT_TITLES[kind]} (excerpts):\n" + "\n...\n".join(excerpts))
+        return "\n\n".join(sections)
+
+
+@lru_cache(maxsize=16)
+def report_index(fundamentals: str, market: str, news: str, sentiment: str) -> ReportIndex:
+    """ReportIndex for one report set, built once per change"""
+    return ReportIndex({"market": market, "sentiment": sentiment, "news": news, "fundamentals": fundamentals})
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_responses.sqlite")
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+# ----------------------------
+# KEYS
+# ----------------------------
+def hash_text(text: str) -> str:
+    """Stable content hash used for report, prompt and history components"""
+    return hashlib.sha256((text or "").encode()).hexdigest()
+
+
+def make_key(model: str, temperature: float, system_prompt: str, report_hashes, history, role: str, round_num: int = 0, max_tokens: int = None) -> str:
+    """Content-addressed key for one LLM call.
+
+    Two calls share a key only if they use the same model settings, system
+    prompt, input reports, conversation state, role and round, so a hit can
+    be returned in place of a new completion.
+    """
+    payload = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "system": hash_text(system_prompt),
+        "reports": list(report_hashes),
+        "history": hash_text(json.dumps(history, sort_keys=True)),
+        "role": role,
+        "round": round_num,
+        # Only present when capped, so uncapped keys stay as they were
+        **({"max_tokens": max_tokens} if max_tokens else {}),
+    }, sort_keys=True)
+    return hash_text(payload)
+
+# ----------------------------
+# SQLITE STORE
+# ----------------------------
+class ResponseCache:
+    """Persistent LLM response cache with LRU and TTL eviction"""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES, ttl_s: float = TTL_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Cached response for ``key`` or None; expired entries count as misses"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_s:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response and evict least-recently-used entries beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the current entry count"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": size,
+        }
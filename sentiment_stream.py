@@ -0,0 +1,295 @@
+import math
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pathway as pw
+
+from main3 import OUTPUT_FOLDER
+from report_publisher import ReportWriter
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+# Raw posts as JSON lines: {"ticker", "created_utc" (epoch seconds), "text", "engagement"?}
+POSTS_FOLDER = os.getenv("SENTIMENT_POSTS_FOLDER", "social-posts")
+BUCKET_S = 60  # tumbling window every aggregate is built from
+# Trailing windows reported per ticker, in seconds
+WINDOWS_S = [int(s) for s in os.getenv("SENTIMENT_WINDOWS_S", "900,3600,86400").split(",")]
+# Posts arriving later than this behind the newest one no longer change a bucket;
+# buckets older than the longest window plus this are dropped
+LATENESS_S = int(os.getenv("SENTIMENT_LATENESS_S", "300"))
+# sentiment_report.md is rewritten at most this often per ticker
+REPORT_INTERVAL_S = float(os.getenv("SENTIMENT_REPORT_INTERVAL_S", "60"))
+SCORE_BATCH = 256
+# VADER's cut-offs for a positive / negative post
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+# ----------------------------
+# SCORING
+# ----------------------------
+# Market-specific terms on VADER's -4..4 scale; used on top of VADER when
+# vaderSentiment is installed, on their own otherwise
+LEXICON = {
+    "bullish": 2.5, "bearish": -2.5, "buy": 1.5, "buying": 1.5, "sell": -1.5, "selling": -1.5,
+    "long": 1.0, "short": -1.0, "calls": 1.0, "puts": -1.0, "moon": 2.5, "mooning": 2.5,
+    "rally": 2.0, "rallying": 2.0, "surge": 2.0, "surging": 2.0, "soar": 2.5, "soaring": 2.5,
+    "breakout": 1.8, "beat": 1.8, "beats": 1.8, "upgrade": 2.0, "upgraded": 2.0, "outperform": 2.0,
+    "strong": 1.5, "growth": 1.5, "record": 1.5, "profit": 1.5, "profitable": 1.8, "undervalued": 1.8,
+    "gain": 1.5, "gains": 1.5, "green": 1.0, "up": 0.5, "higher": 1.0, "love": 2.0, "great": 2.0, "good": 1.5,
+    "crash": -3.0, "crashing": -3.0, "dump": -2.5, "dumping": -2.5, "plunge": -2.5, "plunging": -2.5,
+    "drop": -1.5, "drops": -1.5, "falling": -1.5, "miss": -1.8, "missed": -1.8, "downgrade": -2.0,
+    "downgraded": -2.0, "underperform": -2.0, "weak": -1.5, "loss": -1.8, "losses": -1.8, "lawsuit": -1.8,
+    "overvalued": -1.8, "bubble": -2.0, "recall": -1.5, "red": -1.0, "down": -0.5, "lower": -1.0,
+    "bagholder": -2.0, "bagholders": -2.0, "fraud": -3.0, "bankrupt": -3.0, "hate": -2.0, "bad": -1.5,
+    "🚀": 2.5, "📈": 2.0, "💎": 1.0, "🔥": 1.0, "📉": -2.0, "💩": -2.0, "🩸": -2.0,
+}
+NEGATIONS = {"not", "no", "never", "isn't", "aren't", "wasn't", "don't", "doesn't", "didn't", "won't", "can't", "cannot"}
+BOOSTERS = {"very": 0.3, "really": 0.3, "extremely": 0.5, "super": 0.4, "so": 0.2, "hugely": 0.5,
+            "slightly": -0.3, "somewhat": -0.2, "barely": -0.4}
+NEGATION_SPAN = 3
+NEGATION_SCALAR = -0.74
+
+# Clause punctuation is kept as tokens: negation and boosters don't reach across it
+_TOKEN = re.compile(r"[a-z']+|[\U0001F300-\U0001FAFF]|[.,;:!?]+")
+
+_vader = None
+_vader_failed = False
+
+
+def _get_vader():
+    """VADER analyzer with LEXICON added, or None when vaderSentiment is not installed"""
+    global _vader, _vader_failed
+    if _vader is None and not _vader_failed:
+        try:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            _vader = SentimentIntensityAnalyzer()
+            _vader.lexicon.update(LEXICON)
+        except ImportError:
+            _vader_failed = True
+    return _vader
+
+
+def lexicon_score(text: str) -> float:
+    """VADER-style compound score in [-1, 1] from LEXICON, with negation and boosters"""
+    tokens = _TOKEN.findall(text.lower())
+    total = 0.0
+    for i, token in enumerate(tokens):
+        valence = LEXICON.get(token)
+        if valence is None:
+            continue
+        # Modifiers in scope: up to NEGATION_SPAN words back, stopping at
+        # clause punctuation and at the previous sentiment word
+        start = i
+        while start > max(0, i - NEGATION_SPAN) and tokens[start - 1] not in LEXICON and tokens[start - 1][0] not in ".,;:!?":
+            start -= 1
+        before = tokens[start:i]
+        if before and before[-1] in BOOSTERS:
+            valence += math.copysign(BOOSTERS[before[-1]], valence)
+        if any(word in NEGATIONS for word in before):
+            valence *= NEGATION_SCALAR
+        total += valence
+    return total / math.sqrt(total * total + 15)
+
+
+def score_text(text: str) -> float:
+    vader = _get_vader()
+    return vader.polarity_scores(text)["compound"] if vader is not None else lexicon_score(text)
+
+
+def scorer_name() -> str:
+    return "VADER + market lexicon" if _get_vader() is not None else "market lexicon"
+
+
+@pw.udf(max_batch_size=SCORE_BATCH, deterministic=True)
+def score_posts(texts: list[str]) -> list[float]:
+    """Sentiment of a batch of posts"""
+    return [round(score_text(text), 4) for text in texts]
+
+
+@pw.udf(deterministic=True)
+def engagement_weight(engagement: int) -> float:
+    """Weight of a post in the engagement-weighted mean: 1 + ln(1 + likes/replies/shares)"""
+    return 1.0 + math.log1p(max(engagement, 0))
+
+# ----------------------------
+# WINDOWS
+# ----------------------------
+class PostSchema(pw.Schema):
+    ticker: str
+    created_utc: float
+    text: str
+    engagement: int = pw.column_definition(default_value=0)
+
+
+def read_posts() -> pw.Table:
+    """Streaming posts from the JSON-lines files in POSTS_FOLDER"""
+    return pw.io.fs.read(
+        path=POSTS_FOLDER,
+        format="json",
+        schema=PostSchema,
+        mode="streaming",
+        autocommit_duration_ms=1000,
+        name="posts"
+    )
+
+
+def build_buckets(posts: pw.Table) -> pw.Table:
+    """Per-ticker BUCKET_S tumbling windows of scored posts.
+
+    Buckets older than the longest trailing window (plus LATENESS_S) are
+    forgotten, so state stays bounded however long the stream runs.
+    """
+    scored = posts.select(
+        pw.this.ticker,
+        pw.this.created_utc,
+        score=score_posts(pw.this.text),
+        weight=engagement_weight(pw.this.engagement)
+    )
+    return scored.windowby(
+        pw.this.created_utc,
+        window=pw.temporal.tumbling(float(BUCKET_S)),
+        instance=pw.this.ticker,
+        behavior=pw.temporal.common_behavior(cutoff=float(max(WINDOWS_S) + LATENESS_S), keep_results=False)
+    ).reduce(
+        ticker=pw.this._pw_instance,
+        bucket_start=pw.this._pw_window_start,
+        posts=pw.reducers.count(),
+        score_sum=pw.reducers.sum(pw.this.score),
+        weighted_sum=pw.reducers.sum(pw.this.score * pw.this.weight),
+        weight_sum=pw.reducers.sum(pw.this.weight),
+        positive=pw.reducers.sum(pw.if_else(pw.this.score >= POSITIVE_THRESHOLD, 1, 0)),
+        negative=pw.reducers.sum(pw.if_else(pw.this.score <= NEGATIVE_THRESHOLD, 1, 0))
+    )
+
+
+@pw.udf
+def window_stats(window_s: int, posts: int, score_sum: float, weighted_sum: float, weight_sum: float,
+                 positive: int, negative: int) -> pw.Json:
+    return pw.Json({
+        "window_s": window_s,
+        "posts": posts,
+        "mean": round(score_sum / posts, 4) if posts else 0.0,
+        "weighted_mean": round(weighted_sum / weight_sum, 4) if weight_sum else 0.0,
+        "positive_pct": round(100 * positive / posts, 1) if posts else 0.0,
+        "negative_pct": round(100 * negative / posts, 1) if posts else 0.0,
+        "posts_per_min": round(60 * posts / window_s, 2),
+    })
+
+
+def trailing_window(buckets: pw.Table, latest: pw.Table, window_s: int) -> pw.Table:
+    """Aggregate of each ticker's buckets within ``window_s`` of its newest bucket"""
+    recent = buckets.join(latest, pw.left.ticker == pw.right.ticker).select(
+        *pw.left,
+        latest=pw.right.latest
+    ).filter(pw.this.bucket_start > pw.this.latest - window_s)
+    return recent.groupby(pw.this.ticker).reduce(
+        pw.this.ticker,
+        stats=window_stats(
+            window_s,
+            pw.reducers.sum(pw.this.posts),
+            pw.reducers.sum(pw.this.score_sum),
+            pw.reducers.sum(pw.this.weighted_sum),
+            pw.reducers.sum(pw.this.weight_sum),
+            pw.reducers.sum(pw.this.positive),
+            pw.reducers.sum(pw.this.negative)
+        )
+    )
+
+
+def _window_label(seconds: int) -> str:
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    return f"{seconds // 60} min" if seconds % 60 == 0 else f"{seconds} s"
+
+
+@pw.udf
+def render_sentiment_report(ticker: str, as_of: str, windows: pw.Json) -> str:
+    """sentiment_report.md for one ticker, sectioned like the analyst report it replaces"""
+    stats = sorted(windows.value, key=lambda w: w["window_s"])
+    lines = [
+        f"# Social Media Sentiment: {ticker} as of {as_of}",
+        f"Scored post by post with the {scorer_name()} scorer, from -1 (bearish) to +1 (bullish); "
+        f"posts are positive at >= {POSITIVE_THRESHOLD} and negative at <= {NEGATIVE_THRESHOLD}.",
+        "### Sentiment by Window",
+    ]
+    for w in stats:
+        lines.append(
+            f"- Last {_window_label(w['window_s'])}: {w['posts']} posts, mean {w['mean']:+.3f} "
+            f"(engagement-weighted {w['weighted_mean']:+.3f}); "
+            f"{w['positive_pct']:.0f}% positive / {w['negative_pct']:.0f}% negative"
+        )
+    if len(stats) > 1:
+        short, long = stats[0], stats[-1]
+        shift = short["mean"] - long["mean"]
+        direction = "improving" if shift > 0.05 else "deteriorating" if shift < -0.05 else "steady"
+        # From the raw counts: the rounded posts_per_min of a long, quiet window is often 0.0
+        short_rate, long_rate = (60 * w["posts"] / w["window_s"] for w in (short, long))
+        ratio = short_rate / long_rate if long_rate else 0.0
+        lines += [
+            "### Momentum and Activity",
+            f"- Mean sentiment last {_window_label(short['window_s'])} vs last {_window_label(long['window_s'])}: "
+            f"{shift:+.3f} ({direction})",
+            f"- Post rate {short_rate:.3g}/min vs {long_rate:.3g}/min ({ratio:.1f}x)",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+@pw.udf
+def bucket_time(bucket_start: float) -> str:
+    """UTC end of a bucket, the "as of" of the aggregates built from it"""
+    return datetime.fromtimestamp(bucket_start + BUCKET_S, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@pw.udf
+def json_list(items: tuple) -> pw.Json:
+    return pw.Json([item.value for item in items])
+
+
+def build_sentiment_reports(posts: pw.Table) -> pw.Table:
+    """One row per ticker: every trailing window's aggregates and the rendered report"""
+    buckets = build_buckets(posts)
+    latest = buckets.groupby(pw.this.ticker).reduce(pw.this.ticker, latest=pw.reducers.max(pw.this.bucket_start))
+    windows = pw.Table.concat_reindex(*(trailing_window(buckets, latest, w) for w in WINDOWS_S))
+    per_ticker = windows.groupby(pw.this.ticker).reduce(
+        pw.this.ticker,
+        windows=pw.reducers.tuple(pw.this.stats)
+    ).with_id_from(pw.this.ticker)
+    per_ticker = per_ticker.join(latest.with_id_from(pw.this.ticker), pw.left.id == pw.right.id).select(
+        pw.left.ticker,
+        as_of=bucket_time(pw.right.latest),
+        windows=json_list(pw.left.windows)
+    )
+    return per_ticker.select(
+        *pw.this,
+        report=render_sentiment_report(pw.this.ticker, pw.this.as_of, pw.this.windows)
+    )
+
+
+def publish_reports(reports: pw.Table, writer: ReportWriter):
+    """Write each ticker's refreshed sentiment_report.md"""
+    def on_change(key, row, time, is_addition):
+        if is_addition:
+            writer.write(row["ticker"], row["report"], row["as_of"])
+
+    pw.io.subscribe(reports, on_change=on_change)
+
+
+if __name__ == "__main__":
+    print("="*80)
+    print("💬 STREAMING SOCIAL SENTIMENT")
+    print("="*80)
+    print(f"📁 Posts: {POSTS_FOLDER}/ (JSON lines), scored with the {scorer_name()} scorer")
+    print(f"🪟 Windows: {', '.join(_window_label(w) for w in WINDOWS_S)} over {BUCKET_S}s buckets, "
+          f"report refresh every {REPORT_INTERVAL_S:g}s")
+    Path(POSTS_FOLDER).mkdir(exist_ok=True)
+
+    reports = build_sentiment_reports(read_posts())
+    publish_reports(reports, ReportWriter("sentiment", REPORT_INTERVAL_S))
+    pw.io.jsonlines.write(
+        reports.select(pw.this.ticker, pw.this.as_of, pw.this.windows),
+        f"{OUTPUT_FOLDER}/sentiment_windows.jsonlines"
+    )
+    pw.run(monitoring_level=pw.MonitoringLevel.NONE)
@@ -1,17 +1,20 @@
 import pathway as pw
-from pathway.xpacks.llm import llms
 from dotenv import load_dotenv
 import os
+import re
 from datetime import datetime
-import pandas as pd
 from pathlib import Path
+from llm_client import achat
+from llm_metrics import metric_labels
+from model_router import route
+from response_cache import hash_text
+from debate_checkpoint import resume_or_run
 
 load_dotenv()
 
 # === Config ===
 DATA_FOLDER = "data-source"
 OUTPUT_FOLDER = "./final_reports"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 files = [
     "bear_report.md",
@@ -22,18 +25,6 @@ files = [
     "sentiment_report.md",
 ]
 
-# ✅ Check if all required files exist
-missing_files = [f for f in files if not os.path.exists(os.path.join(DATA_FOLDER, f))]
-if missing_files:
-    raise FileNotFoundError(f"Missing files: {', '.join(missing_files)}")
-
-
-chat_model = llms.OpenAIChat(
-    model="gpt-4o-mini",
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
 TRADER_SYSTEM_PROMPT = """
 You are a Trader Agent responsible for making the final investment decision after reviewing 
 detailed analyses from both the Bull and Bear Analysts. Your role is to synthesize their arguments, 
@@ -58,23 +49,16 @@ Always end your response with:
 to confirm your final investment decision.
 """
 
-# === Read markdown reports using Pathway ===
-bear_report = pw.io.fs.read(f"{DATA_FOLDER}/bear_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300, with_metadata=True)
-bull_report = pw.io.fs.read(f"{DATA_FOLDER}/bull_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300, with_metadata=True)
-fundamental_report = pw.io.fs.read(f"{DATA_FOLDER}/fundamental_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300, with_metadata=True)
-news_report = pw.io.fs.read(f"{DATA_FOLDER}/news_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300,with_metadata=True)
-market_report = pw.io.fs.read(f"{DATA_FOLDER}/market_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300, with_metadata=True)
-sentiment_report = pw.io.fs.read(f"{DATA_FOLDER}/sentiment_report.md",mode="streaming", format="plaintext_by_file", autocommit_duration_ms=300, with_metadata=True)
-
-@pw.udf
-def combine_reports(market, sentiment, news, fundamentals):
+def format_situation(market: str, sentiment: str, news: str, fundamentals: str) -> str:
+    """Join the four research reports into the trader's market situation"""
     return f"{market}\n\n{sentiment}\n\n{news}\n\n{fundamentals}"
 
-curr_situation = combine_reports(market_report, sentiment_report, news_report, fundamental_report)
 
-trader_prompt = [
-    {"role": "system", "content": TRADER_SYSTEM_PROMPT},
-    {"role": "system", "content": f"""Bull Report:
+def build_trader_prompt(bull_report, bear_report, curr_situation) -> list:
+    """Trader messages for the given bull/bear summaries and market situation"""
+    return [
+        {"role": "system", "content": TRADER_SYSTEM_PROMPT},
+        {"role": "system", "content": f"""Bull Report:
         {bull_report}
 
         Bear Report:
@@ -83,31 +67,129 @@ trader_prompt = [
         Market Situation:
         {curr_situation}
     """}
-]
+    ]
+
+
+PROPOSAL_PATTERN = re.compile(r"FINAL TRANSACTION PROPOSAL:\s*\**\s*(BUY|HOLD|SELL)", re.IGNORECASE)
+
+
+def parse_proposal(decision: str) -> str:
+    """BUY, HOLD or SELL from the trader's closing line, "" if it has none"""
+    matches = PROPOSAL_PATTERN.findall(decision or "")
+    return matches[-1].upper() if matches else ""
+
+
+async def decide(bull_summary: str, bear_summary: str, situation: str, checkpoint=None, on_token=None) -> str:
+    """Trader decision for the given summaries, resumed from ``checkpoint`` when it has one"""
+    with metric_labels(role="trader"):
+        return await resume_or_run(checkpoint, "trader", on_token, lambda: achat(
+            build_trader_prompt(bull_summary, bear_summary, situation),
+            cache_parts={
+                "report_hashes": [hash_text(situation)],
+                "history": [bull_summary, bear_summary],
+                "role": "trader",
+            },
+            on_token=on_token,
+            **route("trader"),
+        ))
+
 
-# Create a Pathway table with the message
-trader_table = pw.debug.table_from_pandas(
-    pd.DataFrame({"messages": [trader_prompt]})
-)
+def write_trader_report(output_folder, decision: str, generated: datetime = None) -> Path:
+    """Save one decision as Trader_agent_<timestamp>.txt; earlier decisions are kept"""
+    generated = generated or datetime.now()
+    path = Path(output_folder) / f"Trader_agent_{generated.strftime('%Y%m%dT%H%M%S')}.txt"
+    path.write_text(f"""Trader agent Analysis
+Generated: {generated.strftime('%Y-%m-%d %H:%M:%S')}
+Proposal: {parse_proposal(decision) or "N/A"}
 
-# Pass through the model — this is the key Pathway call
-trader_response = trader_table.select(reply=chat_model(pw.this.messages))
+{decision}
+""")
+    return path
 
-# Convert back to pandas so you can print / inspect
-trader_result = pw.debug.table_to_pandas(trader_response)
-trader_reply = trader_result["reply"].iloc[0] if not trader_result.empty else ""
 
-# === Write results out ===
-timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-output_path = Path(OUTPUT_FOLDER) / f"Trader_agent.txt"
-full_report = f"""Trader agent Analysis 
-    Generated: {timestamp}
-   {trader_reply}
-    """
+@pw.udf
+def combine_reports(market: str, sentiment: str, news: str, fundamentals: str) -> str:
+    return format_situation(market, sentiment, news, fundamentals)
+
+
+@pw.udf
+async def trade(bull_report: str, bear_report: str, curr_situation: str) -> str:
+    """Decide and save a timestamped report every time the inputs change"""
+    print("\n💼 Trader Agent deciding...")
+    decision = await decide(bull_report, bear_report, curr_situation)
+    path = write_trader_report(OUTPUT_FOLDER, decision)
+    print(f"✅ Trader decision saved: {path.absolute()} ({parse_proposal(decision) or 'no proposal'})")
+    return decision
+
+
+@pw.udf
+def file_name(path: str) -> str:
+    return Path(path).name
+
+
+@pw.udf
+def is_trader_input(path: str) -> bool:
+    """A trader report sitting directly in DATA_FOLDER (the recursive read also yields ticker folders)"""
+    p = Path(path)
+    return p.name in files and p.parent.resolve() == Path(DATA_FOLDER).resolve()
+
+
+def report_slot(name: str):
+    """Content of the report file ``name``, "" for every other file (for max-reducing)"""
+    return pw.reducers.max(pw.if_else(pw.this.name == name, pw.this.data, ""))
 
-output_path.write_text(full_report)
 
 if __name__ == "__main__":
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+    # ✅ Check if all required files exist
+    missing_files = [f for f in files if not os.path.exists(os.path.join(DATA_FOLDER, f))]
+    if missing_files:
+        raise FileNotFoundError(f"Missing files: {', '.join(missing_files)}")
+
+    # === Read markdown reports using Pathway: one row per file, updated on edits ===
+    reports = pw.io.fs.read(
+        DATA_FOLDER,
+        mode="streaming",
+        format="plaintext_by_file",
+        autocommit_duration_ms=300,
+        with_metadata=True,
+    ).select(
+        pw.this.data,
+        path=pw.this._metadata["path"].as_str(),
+    ).filter(is_trader_input(pw.this.path)).select(
+        pw.this.data,
+        name=file_name(pw.this.path),
+    )
+
+    # One row holding every report's content
+    inputs = reports.reduce(
+        bull=report_slot("bull_report.md"),
+        bear=report_slot("bear_report.md"),
+        fundamentals=report_slot("fundamentals_report.md"),
+        news=report_slot("news_report.md"),
+        market=report_slot("market_report.md"),
+        sentiment=report_slot("sentiment_report.md"),
+    )
+    # Wait until every report has been read
+    inputs = inputs.filter(
+        (pw.this.bull != "") & (pw.this.bear != "") & (pw.this.fundamentals != "")
+        & (pw.this.news != "") & (pw.this.market != "") & (pw.this.sentiment != "")
+    )
+
+    curr_situation = inputs.select(
+        pw.this.bull,
+        pw.this.bear,
+        situation=combine_reports(pw.this.market, pw.this.sentiment, pw.this.news, pw.this.fundamentals),
+    )
+
+    # Re-decide whenever any report changes
+    decisions = curr_situation.select(decision=trade(pw.this.bull, pw.this.bear, pw.this.situation))
+    pw.io.jsonlines.write(
+        decisions.select(pw.this.decision, proposal=pw.apply(parse_proposal, pw.this.decision)),
+        f"{OUTPUT_FOLDER}/trader_decisions.jsonlines",
+    )
+
     print("="*80)
     print("🚀 PATHWAY Trader Agent - FULL INTEGRATION")
     print("="*80)